@@ -1,8 +1,13 @@
 import os
+import threading
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 from .extensions import db
+from .services.jobs import jobs
+from .services.media_store import media_store
+from .services.maintenance import db_maintenance
+from .services.metrics import metricas, registrar_medidores
 
 def create_app():
     load_dotenv()
@@ -34,18 +39,36 @@ def create_app():
 
     CORS(app)
     db.init_app(app)
+    jobs.init_app(app)
+    media_store.init_app(app)
+    metricas.init_app(app)
 
     # Blueprints (tus rutas)
     from .routes.api import api_bp
     from .routes.auth import auth_bp
     from .routes.media import media_bp
+    from .routes.live import live_bp
+    from .routes.history import history_bp
 
     app.register_blueprint(api_bp, url_prefix="/api")
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(media_bp, url_prefix="/media")
+    app.register_blueprint(live_bp, url_prefix="/api/live")
+    app.register_blueprint(history_bp, url_prefix="/api/history")
 
     with app.app_context():
-        from .models import User, SessionToken, PasswordResetToken  # noqa
+        from .models import User, SessionToken, PasswordResetToken, Analysis, AnalysisFrames, UserExerciseStats  # noqa
         db.create_all()
+    # Índices que falten en tablas ya existentes + purga periódica de tokens caducados
+    db_maintenance.init_app(app)
+
+    # Medidores de /api/metrics leídos de los servicios en cada scrape
+    from .services.analyzer import analyzer_pool
+    from .services.auth_cache import token_cache
+    from .services.live import live_sessions
+    registrar_medidores(jobs, media_store, token_cache, analyzer_pool, live_sessions)
+
+    # Precalentar los grafos de MediaPipe de los niveles de calidad configurados (POSE_PREWARM)
+    threading.Thread(target=analyzer_pool.precalentar, name='pose-prewarm', daemon=True).start()
 
     return app
\ No newline at end of file
@@ -13,12 +13,54 @@ class SessionToken(db.Model):
     __tablename__ = 'sessions'
     token = db.Column(db.String(255), primary_key=True)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
-    exp = db.Column(db.Integer, nullable=False)
+    exp = db.Column(db.Integer, nullable=False, index=True)  # purga de sesiones caducadas
     user = db.relationship('User', backref='sessions', lazy=True)
 
 class PasswordResetToken(db.Model):
     __tablename__ = 'password_reset_tokens'
     token = db.Column(db.String(255), primary_key=True)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.Integer, default=lambda: int(time.time()), nullable=False, index=True)  # TTL
+    user = db.relationship('User', backref='reset_tokens', lazy=True)
+
+class Analysis(db.Model):
+    """Resumen de un análisis guardado (UC5). Solo escalares: listar el histórico no toca las series."""
+    __tablename__ = 'analyses'
+    id = db.Column(db.String(36), primary_key=True)  # id del trabajo
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    exercise_type = db.Column(db.String(32), nullable=False)
     created_at = db.Column(db.Integer, default=lambda: int(time.time()), nullable=False)
-    user = db.relationship('User', backref='reset_tokens', lazy=True)
\ No newline at end of file
+    quality = db.Column(db.String(16))
+    duracion_segundos = db.Column(db.Float, nullable=False, default=0.0)
+    repeticiones = db.Column(db.Integer, nullable=False, default=0)
+    score_promedio = db.Column(db.Float, nullable=False, default=0.0)
+    num_errores = db.Column(db.Integer, nullable=False, default=0)
+    resumen = db.Column(db.Text)  # JSON pequeño: segmentación (sin serie), recomendaciones, errores frecuentes
+    user = db.relationship('User', backref=db.backref('analyses', lazy='dynamic'), lazy=True)
+    frames = db.relationship('AnalysisFrames', uselist=False, lazy=True, cascade='all, delete-orphan')
+    __table_args__ = (
+        # Histórico paginado por usuario (y por ejercicio), del más reciente al más antiguo
+        db.Index('ix_analyses_user_created', 'user_id', 'created_at'),
+        db.Index('ix_analyses_user_exercise_created', 'user_id', 'exercise_type', 'created_at'),
+    )
+
+class AnalysisFrames(db.Model):
+    """Series por frame empaquetadas (binario comprimido), en tabla aparte para no leerlas al listar."""
+    __tablename__ = 'analysis_frames'
+    analysis_id = db.Column(db.String(36), db.ForeignKey('analyses.id'), primary_key=True)
+    scores = db.Column(db.LargeBinary, nullable=False)   # timeline reducida de scores (uint8 por tramo), zlib
+    errores = db.Column(db.LargeBinary, nullable=False)  # intervalos de error (ms, uint32) + índice de mensaje (uint16), zlib; ver app/services/history.py
+
+class UserExerciseStats(db.Model):
+    """Agregados por usuario y ejercicio, actualizados al guardar cada análisis."""
+    __tablename__ = 'user_exercise_stats'
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    exercise_type = db.Column(db.String(32), primary_key=True)
+    sesiones = db.Column(db.Integer, nullable=False, default=0)
+    repeticiones_total = db.Column(db.Integer, nullable=False, default=0)
+    duracion_total = db.Column(db.Float, nullable=False, default=0.0)
+    errores_total = db.Column(db.Integer, nullable=False, default=0)
+    score_suma = db.Column(db.Float, nullable=False, default=0.0)
+    mejor_score = db.Column(db.Float, nullable=False, default=0.0)
+    ultimo_score = db.Column(db.Float)
+    ultimo_at = db.Column(db.Integer)
@@ -1,27 +1,154 @@
 import os
+import json
 import time
 import tempfile
 import shutil
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from werkzeug.utils import secure_filename
-from app.services.analyzer import analyzer
+from app.services.analyzer import analyzer_pool, resolver_calidad, AnalizadorEjercicios
+from app.services.track_cache import track_cache, hash_archivo
+from app.services.sharding import analisis_particionado
+from app.services.track_export import serializar_track
+from app.services.jobs import jobs, QueueFullError
+from app.services.uploads import uploads, UploadError
+from app.services.maintenance import db_maintenance
+from app.services.history import guardar_analisis
+from app.services.metrics import metricas, tiempo_trabajo, clase_resolucion
+from app.utils.auth import get_current_user
 from app.routes.media import put_in_cache
 
 api_bp = Blueprint('api', __name__)
 
-LAST_PROGRESS = 0  # progreso global simple (1 usuario/proceso)
+TIPOS_VALIDOS = ['sentadilla', 'desplantes', 'press_banca']
+
+def _parse_inference_options(form):
+    """Lee inference_stride / inference_fps opcionales del formulario. Lanza ValueError si son inválidos."""
+    opts = {}
+    stride = form.get('inference_stride')
+    if stride not in (None, ''):
+        stride = int(stride)
+        if not 1 <= stride <= 10:
+            raise ValueError('inference_stride debe estar entre 1 y 10')
+        opts['inference_stride'] = stride
+    inf_fps = form.get('inference_fps')
+    if inf_fps not in (None, ''):
+        inf_fps = float(inf_fps)
+        if not 1 <= inf_fps <= 240:
+            raise ValueError('inference_fps debe estar entre 1 y 240')
+        opts['inference_fps'] = inf_fps
+    return opts
+
+def _guardar_historial(job, user_id, exercise_type, stats, quality):
+    """Guarda el análisis en el histórico del usuario; un fallo aquí no invalida el resultado."""
+    try:
+        guardar_analisis(job.id, user_id, exercise_type, stats, quality)
+        return job.id
+    except Exception as e:
+        print(f"[HISTORY][ERROR] No se pudo guardar el análisis {job.id}: {e}")
+        return None
+
+def _run_analysis_job(job, video_path, exercise_type, options=None, quality=None, output='video', user_id=None):
+    """Ejecuta el análisis en un worker y deja el resultado en la caché de /media.
+    Con sesión iniciada (user_id) el resumen queda además en el histórico del usuario."""
+    try:
+        # Hash del contenido: permite reutilizar el track de landmarks de una subida previa
+        video_hash = hash_archivo(video_path)
+        kwargs = dict(
+            tipo_ejercicio=exercise_type,
+            on_progress=lambda pct: job.update(progress=pct),
+            on_frame=lambda idx, total, reps: job.update(frames=idx, total_frames=total, repeticiones=reps),
+            track_cache=track_cache,
+            video_hash=video_hash,
+            salida=output,
+            **(options or {})
+        )
+        if analisis_particionado.aplicable(video_path, output):
+            # Video largo: pose y render repartidos entre procesos
+            output_path, stats = analisis_particionado.analizar(video_path, calidad=quality, **kwargs)
+        else:
+            with analyzer_pool.checkout(quality) as analyzer:
+                output_path, stats = analyzer.analizar_video_completo(video_path, **kwargs)
+        # Conteo final (segmentación offline) en el progreso y el evento 'done'
+        job.update(repeticiones=stats['repeticiones'])
+        # Duración por ejercicio y resolución (desde que el worker tomó el trabajo)
+        tiempo_trabajo.observe(time.time() - (job.started_at or job.created_at), exercise_type,
+                               clase_resolucion(*stats['inferencia'].get('resolucion_video', (0, 0))), output)
+
+        ttl = int(os.environ.get('ANALYSIS_CACHE_TTL', '600'))
+        ts = int(time.time())
+        analysis_id = _guardar_historial(job, user_id, exercise_type, stats, quality) if user_id else None
+        if output == 'track':
+            # Track compacto (JSON + gzip): el cliente dibuja sobre el video original
+            out_name = f"track_{exercise_type}_{ts}_{job.id[:8]}.json"
+            put_in_cache(out_name, serializar_track(output_path), mime='application/json', ttl=ttl, encoding='gzip')
+            return {'track_path': f'/media/{out_name}', 'stats': stats, 'track_id': stats['inferencia'].get('track_id'),
+                    'analysis_id': analysis_id}
+
+        # Preparar respuesta vía almacén de media (no persistente)
+        ext = os.path.splitext(output_path)[1] or '.mp4'
+        out_name = f"analyzed_{exercise_type}_{ts}_{job.id[:8]}{ext}"
+        mimetype = 'video/mp4' if ext.lower() == '.mp4' else 'video/x-msvideo'
+
+        # Registrar en el almacén de media con TTL configurable: el archivo se mueve (grandes)
+        # o se carga en memoria y se elimina (pequeños)
+        try:
+            put_in_cache(out_name, path=output_path, mime=mimetype, ttl=ttl)
+        except Exception:
+            try:
+                os.unlink(output_path)
+            except Exception:
+                pass
+            raise
+        return {'video_path': f'/media/{out_name}', 'stats': stats, 'track_id': stats['inferencia'].get('track_id'),
+                'analysis_id': analysis_id}
+    finally:
+        # Limpieza del archivo temporal de entrada
+        try:
+            os.unlink(video_path)
+        except Exception:
+            pass
 
 # Añade alias para evitar /api/api/progress si usas url_prefix='/api'
 @api_bp.route('/progress', methods=['GET'])
 @api_bp.route('/api/progress', methods=['GET'])
 def get_progress():
-    return jsonify({'progress': LAST_PROGRESS})
+    # Compatibilidad: sin job_id se reporta el último trabajo encolado
+    job_id = request.args.get('job_id')
+    job = jobs.get(job_id) if job_id else jobs.latest()
+    return jsonify({'progress': job.progress if job else 0})
+
+def _parse_analysis_params(form):
+    """Parámetros comunes de un análisis (exercise_type, output, inferencia, calidad).
+    Devuelve (params, None) o (None, (respuesta_error, status))."""
+    exercise_type = form.get('exercise_type', 'sentadilla')
+    if exercise_type not in TIPOS_VALIDOS:
+        return None, (jsonify({'message': f'Tipo inválido. Opciones: {TIPOS_VALIDOS}'}), 400)
+    output = form.get('output') or 'video'
+    if output not in ('video', 'track'):
+        return None, (jsonify({'message': "Parámetro inválido: output debe ser 'video' o 'track'"}), 400)
+    try:
+        options = _parse_inference_options(form)
+        quality = resolver_calidad(form.get('quality') or None)
+    except ValueError as e:
+        return None, (jsonify({'message': f'Parámetro inválido: {e}'}), 400)
+    return {'exercise_type': exercise_type, 'output': output, 'options': options, 'quality': quality}, None
+
+def _submit_analysis(video_path, params):
+    """Encola el análisis de un video ya en disco (el worker lo elimina al terminar). Respuesta 202."""
+    # El usuario se resuelve aquí: el worker no tiene acceso a la petición
+    user = get_current_user()
+    job = jobs.submit(_run_analysis_job, video_path, params['exercise_type'], params['options'],
+                      params['quality'], params['output'], user['id'] if user else None,
+                      meta={'exercise_type': params['exercise_type'], 'quality': params['quality'], 'output': params['output']})
+    return jsonify({
+        'job_id': job.id,
+        'state': job.state,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
 
 @api_bp.route('/analyze', methods=['POST'])
 def api_analyze():
-    global LAST_PROGRESS
-    LAST_PROGRESS = 0
-
+    tmp_name = None
     try:
         if 'video' not in request.files:
             return jsonify({'message': 'Falta video'}), 400
@@ -29,61 +156,213 @@ def api_analyze():
         if not f.filename:
             return jsonify({'message': 'Archivo inválido'}), 400
 
-        exercise_type = request.form.get('exercise_type', 'sentadilla')
-        tipos_validos = ['sentadilla', 'desplantes', 'press_banca']
-        if exercise_type not in tipos_validos:
-            return jsonify({'message': f'Tipo inválido. Opciones: {tipos_validos}'}), 400
+        params, error = _parse_analysis_params(request.form)
+        if error:
+            return error
 
-        # Guardar upload a archivo temporal
+        # Guardar upload a archivo temporal (el worker lo elimina al terminar)
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        f.save(tmp.name)
+        tmp.close()
+        tmp_name = tmp.name
+        f.save(tmp_name)
+
+        response = _submit_analysis(tmp_name, params)
+        tmp_name = None
+        return response
+    except QueueFullError:
+        return jsonify({'message': 'Servidor ocupado, intenta de nuevo en unos minutos'}), 503
+    except Exception as e:
+        print(f"Error procesando video (api): {e}")
+        return jsonify({'message': 'Error al analizar el video'}), 500
+    finally:
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except Exception:
+                pass
 
-        # Callback para ir actualizando el progreso
-        def on_progress(pct: int):
-            global LAST_PROGRESS           # FIX: usar global, no nonlocal
-            pct = max(0, min(100, int(pct)))
-            LAST_PROGRESS = pct
+def _parse_content_range(header, size):
+    """'bytes START-END/TOTAL' -> (start, length). ValueError si no es válido."""
+    units, rng = header.strip().split(' ', 1)
+    if units != 'bytes':
+        raise ValueError('Unidad no soportada')
+    span, total = rng.split('/')
+    start_str, end_str = span.split('-')
+    start, end = int(start_str), int(end_str)
+    if total != '*' and int(total) != size:
+        raise ValueError('El total no coincide con el tamaño de la subida')
+    if end < start:
+        raise ValueError('Rango vacío')
+    return start, end - start + 1
 
-        # Ejecutar análisis (bloqueante)
-        output_path, stats = analyzer.analizar_video_completo(
-            tmp.name,
-            tipo_ejercicio=exercise_type,
-            on_progress=on_progress
-        )
+@api_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """Inicia una subida reanudable: {size, filename?} -> upload_id."""
+    data = request.get_json(silent=True) or request.form
+    try:
+        upload = uploads.create(data.get('size'), secure_filename(data.get('filename') or '') or None)
+    except UploadError as e:
+        return jsonify({'message': str(e)}), e.status
+    body = upload.to_dict()
+    body['upload_url'] = f'/api/uploads/{upload.id}'
+    return jsonify(body), 201
 
-        # Forzar 100% al terminar
-        LAST_PROGRESS = 100
+@api_bp.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Bytes recibidos y huecos pendientes (para reanudar tras un corte)."""
+    upload = uploads.get(upload_id)
+    if not upload:
+        return jsonify({'message': 'Subida no encontrada o expirada'}), 404
+    return jsonify(upload.to_dict())
 
-        # Preparar respuesta vía caché en memoria (no persistente)
-        ts = int(time.time())
-        ext = os.path.splitext(output_path)[1] or '.mp4'
-        out_name = f"analyzed_{exercise_type}_{ts}{ext}"
-        mimetype = 'video/mp4' if ext.lower() == '.mp4' else 'video/x-msvideo'
+@api_bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Recibe un trozo: cuerpo binario + Content-Range: bytes START-END/TOTAL."""
+    upload = uploads.get(upload_id)
+    if not upload:
+        return jsonify({'message': 'Subida no encontrada o expirada'}), 404
+    header = request.headers.get('Content-Range')
+    if not header:
+        return jsonify({'message': 'Falta la cabecera Content-Range'}), 400
+    try:
+        start, length = _parse_content_range(header, upload.size)
+    except ValueError as e:
+        return jsonify({'message': f'Content-Range inválido: {e}'}), 400
+    if request.content_length is not None and request.content_length != length:
+        return jsonify({'message': 'Content-Length no coincide con Content-Range'}), 400
+    try:
+        uploads.write(upload, start, request.stream, length)
+    except UploadError as e:
+        return jsonify(dict(upload.to_dict(), message=str(e))), e.status
+    return jsonify(upload.to_dict())
 
-        # Leer bytes del archivo procesado y eliminarlo
-        try:
-            with open(output_path, 'rb') as f_out:
-                video_bytes = f_out.read()
-        finally:
+@api_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Cierra la subida y encola su análisis con los mismos parámetros que /analyze."""
+    upload = uploads.get(upload_id)
+    if not upload:
+        return jsonify({'message': 'Subida no encontrada o expirada'}), 404
+    params, error = _parse_analysis_params(request.get_json(silent=True) or request.form)
+    if error:
+        return error
+    try:
+        video_path = uploads.finalize(upload)
+    except UploadError as e:
+        return jsonify(dict(upload.to_dict(), message=str(e))), e.status
+    try:
+        response = _submit_analysis(video_path, params)
+        video_path = None
+        return response
+    except QueueFullError:
+        return jsonify({'message': 'Servidor ocupado, intenta de nuevo en unos minutos'}), 503
+    except Exception as e:
+        print(f"Error encolando subida {upload_id}: {e}")
+        return jsonify({'message': 'Error al analizar el video'}), 500
+    finally:
+        # Si el trabajo no quedó encolado nadie más va a borrar el archivo ensamblado
+        if video_path:
             try:
-                os.unlink(output_path)
+                os.unlink(video_path)
             except Exception:
                 pass
 
-        # Cargar en caché en memoria con TTL configurable
-        ttl = int(os.environ.get('ANALYSIS_CACHE_TTL', '600'))
-        put_in_cache(out_name, video_bytes, mime=mimetype, ttl=ttl)
+@api_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    upload = uploads.get(upload_id)
+    if not upload:
+        return jsonify({'message': 'Subida no encontrada o expirada'}), 404
+    try:
+        uploads.discard(upload)
+    except UploadError as e:
+        return jsonify(dict(upload.to_dict(), message=str(e))), e.status
+    return jsonify({'message': 'Subida cancelada'})
 
-        # Limpieza del archivo temporal de entrada
-        try:
-            os.unlink(tmp.name)
-        except Exception:
-            pass
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'message': 'Trabajo no encontrado'}), 404
+    return jsonify(job.to_dict())
 
-        return jsonify({'video_path': f'/media/{out_name}', 'stats': stats})
-    except Exception as e:
-        print(f"Error procesando video (api): {e}")
-        return jsonify({'message': 'Error al analizar el video'}), 500
+# Intervalo mínimo entre eventos de progreso y entre comentarios keep-alive (segundos)
+SSE_MIN_INTERVAL = float(os.environ.get('SSE_MIN_INTERVAL', '0.25'))
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', '15'))
+
+CAMPOS_PROGRESO = ('state', 'progress', 'frames', 'total_frames', 'fps', 'eta_seconds', 'repeticiones')
+
+def _evento_sse(evento, data):
+    return f"event: {evento}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _eventos_trabajo(job):
+    """Genera eventos SSE: 'progress' (limitado a SSE_MIN_INTERVAL) y un 'done'/'error' final."""
+    version, ultimo, enviado = -1, None, 0.0
+    while True:
+        espera = SSE_KEEPALIVE
+        if ultimo is not None:
+            # Respetar el intervalo mínimo: no despertar antes de que toque enviar
+            espera = max(0.0, SSE_MIN_INTERVAL - (time.time() - enviado))
+            if espera > 0:
+                time.sleep(espera)
+            espera = SSE_KEEPALIVE
+        nueva = job.wait(version, timeout=espera)
+        if nueva == version:
+            yield ': keep-alive\n\n'
+            continue
+        version = nueva
+        data = job.to_dict()
+        progreso = {k: data.get(k) for k in CAMPOS_PROGRESO}
+        if progreso != ultimo:
+            yield _evento_sse('progress', progreso)
+            ultimo, enviado = progreso, time.time()
+        if data['state'] == 'done':
+            # Solo la referencia al resultado; las estadísticas completas están en status_url
+            final = {'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}
+            for k in ('video_path', 'track_path', 'track_id', 'analysis_id'):
+                if k in data:
+                    final[k] = data[k]
+            yield _evento_sse('done', final)
+            return
+        if data['state'] == 'error':
+            yield _evento_sse('error', {'job_id': job.id, 'message': data.get('message')})
+            return
+
+@api_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Progreso del trabajo como Server-Sent Events (text/event-stream)."""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'message': 'Trabajo no encontrado'}), 404
+    rv = Response(_eventos_trabajo(job), mimetype='text/event-stream')
+    rv.headers['Cache-Control'] = 'no-cache'
+    # Evitar que un proxy (nginx) acumule el stream
+    rv.headers['X-Accel-Buffering'] = 'no'
+    return rv
+
+@api_bp.route('/rescore', methods=['POST'])
+def api_rescore():
+    """Re-evalúa un track de landmarks en caché con otro ejercicio o umbrales, sin re-analizar el video."""
+    if not get_current_user():
+        return jsonify({'message': 'No autorizado'}), 401
+    data = request.get_json(silent=True) or {}
+    track_id = data.get('track_id')
+    exercise_type = data.get('exercise_type', 'sentadilla')
+    if not track_id:
+        return jsonify({'message': 'track_id es requerido'}), 400
+    if exercise_type not in TIPOS_VALIDOS:
+        return jsonify({'message': f'Tipo inválido. Opciones: {TIPOS_VALIDOS}'}), 400
+    umbrales = data.get('umbrales') or None
+    if umbrales is not None and not isinstance(umbrales, dict):
+        return jsonify({'message': 'umbrales debe ser un objeto'}), 400
+
+    hit = track_cache.get(track_id)
+    if hit is None:
+        return jsonify({'message': 'Track no encontrado o expirado; vuelve a subir el video'}), 404
+    landmarks, meta = hit
+    try:
+        stats = AnalizadorEjercicios(cargar_pose=False).reevaluar_track(landmarks, meta, exercise_type, umbrales)
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f'Parámetro inválido: {e}'}), 400
+    return jsonify({'track_id': track_id, 'exercise_type': exercise_type, 'stats': stats})
 
 @api_bp.route('/health', methods=['GET'])
 @api_bp.route('/api/health', methods=['GET'])
@@ -91,5 +370,11 @@ def health_check():
     # Devuelve un OK simple; puedes exponer versión o estado de servicios dependientes aquí
     return jsonify({
         'status': 'ok',
-        'version': current_app.config.get('VERSION', 'dev')
-    }), 200
\ No newline at end of file
+        'version': current_app.config.get('VERSION', 'dev'),
+        'maintenance': db_maintenance.stats()
+    }), 200
+
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    return Response(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -3,7 +3,7 @@ from flask import Blueprint, jsonify, request
 from app.utils.auth import (
     find_user_by_email, create_user, generate_token, get_current_user,
     create_reset_token, pop_reset_token, hash_password, verify_password,
-    invalidate_user_sessions
+    invalidate_user_sessions, get_bearer_token, revoke_token
 )
 from app.extensions import db
 from app.models import User
@@ -77,6 +77,14 @@ def api_reset_password():
     invalidate_user_sessions(user_id)
     return jsonify({'message': 'Contraseña actualizada'})
 
+@auth_bp.route('/logout', methods=['POST'])
+def api_logout():
+    token = get_bearer_token()
+    if not token:
+        return jsonify({'message': 'No autorizado'}), 401
+    revoke_token(token)
+    return jsonify({'message': 'Sesión cerrada'})
+
 @auth_bp.route('/me', methods=['GET'])
 def api_me():
     user = get_current_user()
@@ -0,0 +1,54 @@
+from flask import Blueprint, request, jsonify
+from app.models import Analysis
+from app.utils.auth import get_current_user
+from app.services.history import listar_analisis, progreso_usuario, analisis_a_dict
+from app.routes.api import TIPOS_VALIDOS
+
+history_bp = Blueprint('history', __name__)
+
+def _filtros():
+    """exercise_type y limit opcionales. Devuelve (exercise_type, limit, None) o (.., .., error)."""
+    exercise_type = request.args.get('exercise_type') or None
+    if exercise_type is not None and exercise_type not in TIPOS_VALIDOS:
+        return None, None, (jsonify({'message': f'Tipo inválido. Opciones: {TIPOS_VALIDOS}'}), 400)
+    limit = request.args.get('limit', 20, type=int)
+    if limit is None or not 1 <= limit <= 100:
+        return None, None, (jsonify({'message': 'limit debe estar entre 1 y 100'}), 400)
+    return exercise_type, limit, None
+
+@history_bp.route('/analyses', methods=['GET'])
+def list_analyses():
+    """Histórico del usuario, del más reciente al más antiguo (paginado con ?cursor=next_cursor)."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'message': 'No autorizado'}), 401
+    exercise_type, limit, error = _filtros()
+    if error:
+        return error
+    try:
+        items, next_cursor = listar_analisis(user['id'], exercise_type, limit, request.args.get('cursor') or None)
+    except ValueError:
+        return jsonify({'message': 'cursor inválido'}), 400
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+@history_bp.route('/analyses/<analysis_id>', methods=['GET'])
+def get_analysis(analysis_id):
+    """Detalle de un análisis con las series por frame desempaquetadas."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'message': 'No autorizado'}), 401
+    analysis = Analysis.query.filter_by(id=analysis_id, user_id=user['id']).first()
+    if not analysis:
+        return jsonify({'message': 'Análisis no encontrado'}), 404
+    return jsonify(analisis_a_dict(analysis, con_series=True))
+
+@history_bp.route('/progress', methods=['GET'])
+def get_progress():
+    """Agregados por ejercicio (precalculados) y tendencia de los últimos `limit` análisis."""
+    user = get_current_user()
+    if not user:
+        return jsonify({'message': 'No autorizado'}), 401
+    exercise_type, limit, error = _filtros()
+    if error:
+        return error
+    return jsonify(progreso_usuario(user['id'], exercise_type, limit))
@@ -0,0 +1,94 @@
+from flask import Blueprint, request, jsonify, Response
+from app.services.live import live_sessions, LiveSessionError
+from app.routes.api import TIPOS_VALIDOS, SSE_KEEPALIVE, _evento_sse
+
+live_bp = Blueprint('live', __name__)
+
+def _sesion_o_404(session_id):
+    session = live_sessions.get(session_id)
+    if session is None:
+        return None, (jsonify({'message': 'Sesión no encontrada o cerrada'}), 404)
+    return session, None
+
+@live_bp.route('/sessions', methods=['POST'])
+def create_session():
+    data = request.get_json(silent=True) or {}
+    exercise_type = data.get('exercise_type', 'sentadilla')
+    if exercise_type not in TIPOS_VALIDOS:
+        return jsonify({'message': f'Tipo inválido. Opciones: {TIPOS_VALIDOS}'}), 400
+    umbrales = data.get('umbrales') or None
+    if umbrales is not None and not isinstance(umbrales, dict):
+        return jsonify({'message': 'umbrales debe ser un objeto'}), 400
+    try:
+        session = live_sessions.create(exercise_type, data.get('quality') or None, umbrales)
+    except LiveSessionError as e:
+        return jsonify({'message': str(e)}), e.status
+    return jsonify({
+        'session_id': session.id,
+        'frames_url': f'/api/live/sessions/{session.id}/frames',
+        'events_url': f'/api/live/sessions/{session.id}/events',
+        'objetivo_latencia_ms': session.objetivo_ms,
+    }), 201
+
+@live_bp.route('/sessions/<session_id>/frames', methods=['POST'])
+def send_frame(session_id):
+    """Un frame por petición: image/jpeg, image/png o BGR crudo (application/octet-stream + width/height)."""
+    session, error = _sesion_o_404(session_id)
+    if error:
+        return error
+    data = request.get_data(cache=False)
+    if not data:
+        return jsonify({'message': 'Falta el frame en el cuerpo de la petición'}), 400
+    try:
+        width = request.args.get('width', type=int)
+        height = request.args.get('height', type=int)
+        timestamp = request.headers.get('X-Frame-Timestamp')
+        timestamp = float(timestamp) if timestamp not in (None, '') else None
+    except ValueError:
+        return jsonify({'message': 'X-Frame-Timestamp debe ser un número (segundos)'}), 400
+    try:
+        seq = session.enviar(data, request.mimetype, width, height, timestamp,
+                             client_ts=request.headers.get('X-Client-Timestamp'))
+    except LiveSessionError as e:
+        return jsonify({'message': str(e)}), e.status
+    return jsonify({'seq': seq, 'descartados': session.descartados}), 202
+
+def _resultados(session):
+    """Último resultado cada vez que cambia (los intermedios que el cliente no alcanzó a leer se omiten)."""
+    version = 0
+    while True:
+        nueva = session.wait(version, timeout=SSE_KEEPALIVE)
+        if nueva == version and not session.cerrada:
+            yield ': keep-alive\n\n'
+            continue
+        version = nueva
+        if session.ultimo is not None and not session.cerrada:
+            yield _evento_sse('feedback', session.ultimo)
+        if session.cerrada:
+            yield _evento_sse('closed', session.stats())
+            return
+
+@live_bp.route('/sessions/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    session, error = _sesion_o_404(session_id)
+    if error:
+        return error
+    rv = Response(_resultados(session), mimetype='text/event-stream')
+    rv.headers['Cache-Control'] = 'no-cache'
+    rv.headers['X-Accel-Buffering'] = 'no'
+    return rv
+
+@live_bp.route('/sessions/<session_id>', methods=['GET'])
+def session_stats(session_id):
+    session, error = _sesion_o_404(session_id)
+    if error:
+        return error
+    return jsonify(session.stats())
+
+@live_bp.route('/sessions/<session_id>', methods=['DELETE'])
+def close_session(session_id):
+    session, error = _sesion_o_404(session_id)
+    if error:
+        return error
+    session.close()
+    return jsonify(session.stats())
@@ -1,60 +1,38 @@
-import time
-import io
-from flask import Blueprint, abort, request, Response
+import os
+from flask import Blueprint, abort, request, Response, send_file
+from app.services.media_store import media_store
 
 media_bp = Blueprint('media', __name__)
 
-# Caché en memoria para videos analizados (no persistentes)
-VIDEO_CACHE = {}
-
-def put_in_cache(filename: str, data: bytes, mime: str = 'video/mp4', ttl: int = 600):
-    """Guarda un video en caché en memoria por ttl segundos."""
-    VIDEO_CACHE[filename] = {
-        'bytes': data,
-        'mime': mime,
-        'exp': time.time() + max(1, int(ttl))
-    }
+def put_in_cache(filename: str, data: bytes = None, mime: str = 'video/mp4', ttl: int = 600, encoding: str = None, path: str = None):
+    """Guarda un video (o track) en el almacén de media por ttl segundos.
+    data: bytes del resultado, o path: archivo ya escrito (se mueve al almacén sin leerlo si es grande).
+    encoding: Content-Encoding con el que ya vienen los bytes (p. ej. 'gzip')."""
+    media_store.put(filename, data=data, path=path, mime=mime, ttl=ttl, encoding=encoding)
 
 @media_bp.route('/<path:filename>', methods=['GET'])
 def serve_media(filename):
-    # Limpiar expirados
-    now = time.time()
-    expired = [k for k, v in list(VIDEO_CACHE.items()) if v.get('exp', 0) < now]
-    for k in expired:
-        VIDEO_CACHE.pop(k, None)
-
-    # Servir desde memoria si existe
-    item = VIDEO_CACHE.get(filename)
-    if item:
-        data = item['bytes']
-        total = len(data)
-        mime = item.get('mime', 'video/mp4')
-        range_header = request.headers.get('Range')
-        if range_header:
-            try:
-                # Example: Range: bytes=START-END
-                units, rng = range_header.strip().split('=')
-                if units != 'bytes':
-                    raise ValueError('Unsupported unit')
-                start_str, end_str = (rng.split('-') + [''])[:2]
-                start = int(start_str) if start_str else 0
-                end = int(end_str) if end_str else total - 1
-                start = max(0, min(start, total - 1))
-                end = max(start, min(end, total - 1))
-                chunk = data[start:end + 1]
-                rv = Response(chunk, 206, mimetype=mime, direct_passthrough=True)
-                rv.headers['Content-Range'] = f'bytes {start}-{end}/{total}'
-                rv.headers['Accept-Ranges'] = 'bytes'
-                rv.headers['Content-Length'] = str(len(chunk))
-                return rv
-            except Exception:
-                # Fallback to full content
-                pass
-        # Full content
-        rv = Response(data, 200, mimetype=mime, direct_passthrough=True)
-        rv.headers['Accept-Ranges'] = 'bytes'
-        rv.headers['Content-Length'] = str(total)
-        return rv
+    # Servir desde el almacén (memoria o disco); los expirados los limpia el barredor
+    item = media_store.get(filename)
+    if item is None:
+        # Estricto: solo resultados registrados. Si no está, 404.
+        return abort(404)
 
-    # Estricto: solo memoria. Si no está en caché, 404.
-    return abort(404)
\ No newline at end of file
+    mime = item.mime or 'video/mp4'
+    data = item.data  # puede volcarse a disco en paralelo: leer una sola vez
+    if data is not None:
+        # En memoria: la respuesta completa es el mismo objeto bytes; un Range se recorta una vez
+        rv = Response([data], mimetype=mime, direct_passthrough=True)
+        rv.content_length = len(data)
+        rv.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    else:
+        # En disco: wsgi.file_wrapper (sendfile en gunicorn); Range y 416 los resuelve Werkzeug
+        try:
+            rv = send_file(item.path, mimetype=mime, conditional=True, etag=False,
+                           download_name=os.path.basename(filename))
+        except OSError:
+            # Expulsado del disco entre la búsqueda y la apertura
+            return abort(404)
+    if item.encoding:
+        rv.headers['Content-Encoding'] = item.encoding
+    return rv
@@ -4,8 +4,20 @@ import tempfile
 import numpy as np
 import mediapipe as mp
 import math
-from collections import deque  # suavizado por pierna
+from contextlib import contextmanager
+import threading
+import time
 import subprocess
+from app.services.pipeline import Pipeline
+from app.services.track_export import ConstructorTrack
+from app.services.encoder import FfmpegPipeWriter, ffmpeg_disponible, FFMPEG_BIN
+from app.services.landmarks import landmarks_a_array, array_a_proto, interpolar, apilar_track
+from app.services.kinematics import calcular_cinematica, cinematica_frame, cinematica_frame_rapida
+from app.services.reps import segmentar_ejercicio, segmentar_serie, SerieReps
+from app.services.smoothing import SuavizadorSesion
+from app.services.overlay import RenderizadorOverlay, dividir_texto, LANDMARK_SPEC, CONNECTION_SPEC
+from app.services.stats import AcumuladorEstadisticas, SCORE_ERROR
+from app.services.metrics import tiempo_etapa_frame, tiempo_ffmpeg
 
 # Silencia logs verbosos de MediaPipe
 try:
@@ -16,6 +28,11 @@ except Exception:
 
 def _new_writer_h264_or_fallback(output_path, fps, size):
     width, height = size
+    # 0) H.264 en una sola pasada: frames crudos -> ffmpeg (libx264) por stdin
+    if ffmpeg_disponible():
+        writer = FfmpegPipeWriter(output_path, fps, (width, height))
+        if writer.isOpened():
+            return writer, output_path, 'libx264'
     # 1) Intentar H.264 (avc1)
     fourcc = cv2.VideoWriter_fourcc(*'avc1')
     writer = cv2.VideoWriter(output_path, fourcc, max(fps, 1), (width, height))
@@ -34,21 +51,134 @@ def _new_writer_h264_or_fallback(output_path, fps, size):
     writer = cv2.VideoWriter(avi_path, fourcc, max(fps, 1), (width, height))
     return writer, avi_path, 'xvid'
 
-class AnalizadorEjercicios:
+# Umbrales (grados) de las máquinas de estados de repeticiones; sobreescribibles por análisis
+UMBRALES_REPS = {
+    'sentadilla': {'bajo': 100, 'alto': 160},
+    'desplantes': {'inicio': 165, 'fondo': 115, 'arriba': 172},
+    'press_banca': {'bajo': 80, 'alto': 120},
+}
+
+def pose_con_stride(entradas, stride, inferir):
+    """
+    Pose cada `stride` frames sobre (frame_idx, frame); los intermedios reciben landmarks
+    interpolados entre el keyframe anterior y el siguiente (se retienen hasta conocerlo).
+    Genera (frame_idx, frame, puntos) en el mismo orden.
+    """
+    previo = None
+    pendientes = []
+    for n, (frame_idx, frame) in enumerate(entradas):
+        if n % stride:
+            pendientes.append((frame_idx, frame))
+            continue
+        actual = inferir(frame)
+        for k, (idx_p, frame_p) in enumerate(pendientes, 1):
+            yield idx_p, frame_p, interpolar(previo, actual, k / (len(pendientes) + 1))
+        pendientes = []
+        yield frame_idx, frame, actual
+        previo = actual
+    # Cola final: inferir el último frame para cerrar la interpolación
+    if pendientes:
+        idx_u, frame_u = pendientes.pop()
+        ultimo = inferir(frame_u)
+        for k, (idx_p, frame_p) in enumerate(pendientes, 1):
+            yield idx_p, frame_p, interpolar(previo, ultimo, k / (len(pendientes) + 1))
+        yield idx_u, frame_u, ultimo
+
+def umbrales_reps(tipo_ejercicio, overrides=None):
+    """Umbrales por defecto del ejercicio combinados con overrides numéricos válidos."""
+    umbrales = dict(UMBRALES_REPS.get(tipo_ejercicio, {}))
+    for k, v in (overrides or {}).items():
+        if k not in umbrales:
+            raise ValueError(f"Umbral desconocido para {tipo_ejercicio}: {k}")
+        umbrales[k] = float(v)
+    return umbrales
+
+class SesionAnalisis:
+    """
+    Estado mutable de UN análisis (buffers de suavizado y máquinas de estado).
+    Se crea de nuevo por video para no compartir estado entre peticiones.
+    """
     def __init__(self):
+        self.suavizado = SuavizadorSesion()
+        # Máquina de estados de repeticiones
+        self.estado = "preparando"
+        self.repeticiones = 0
+        self.umbrales = {}
+        # Estado interno para desplantes
+        self.lunge_prev_angle = None
+        self.lunge_min_angle = None
+        self.lunge_front_side = None
+
+# Niveles de calidad -> model_complexity de MediaPipe Pose (lite / full / heavy)
+NIVELES_CALIDAD = {'fast': 0, 'balanced': 1, 'accurate': 2}
+
+def niveles_habilitados():
+    habilitados = os.environ.get('POSE_QUALITY_TIERS', ','.join(NIVELES_CALIDAD))
+    return [n.strip() for n in habilitados.split(',') if n.strip() in NIVELES_CALIDAD]
+
+def resolver_calidad(calidad=None):
+    """Nivel solicitado o el por defecto del despliegue (POSE_QUALITY). ValueError si no está habilitado."""
+    calidad = calidad or os.environ.get('POSE_QUALITY', 'accurate')
+    if calidad not in niveles_habilitados():
+        raise ValueError(f"Calidad no disponible: {calidad}. Opciones: {niveles_habilitados()}")
+    return calidad
+
+class RegistroEstadisticas:
+    """Acumula las métricas por frame de un análisis (scores, intervalos de error y repeticiones)
+    en memoria constante: ver AcumuladorEstadisticas."""
+    def __init__(self, fps, total_frames=0):
+        self.fps = fps
+        self.acumulador = AcumuladorEstadisticas(fps, total_frames)
+        self.stats = {
+            'repeticiones': 0,
+            'duracion_segundos': (total_frames / fps) if fps > 0 and total_frames > 0 else 0,
+            'score_promedio': 0
+        }
+
+    def registrar(self, resultado, frame_idx, timestamp):
+        feedback_data = resultado['feedback_data']
+        self.stats['repeticiones'] = resultado['repeticiones']
+        self.acumulador.agregar_score(frame_idx, feedback_data['score'])
+        self.acumulador.cerrar_vencidos(timestamp)
+        if feedback_data.get('feedback') and feedback_data['score'] < SCORE_ERROR:
+            self.acumulador.agregar_error(feedback_data['feedback'], timestamp)
+
+    def fijar_segmentacion(self, segmentacion):
+        """
+        La segmentación offline da el conteo final de repeticiones del resultado. El de la
+        máquina de estados por frame (overlay, progreso y /api/live) queda en repeticiones_en_vivo.
+        """
+        stats = self.stats
+        stats['segmentacion'] = segmentacion
+        stats['repeticiones_en_vivo'] = stats['repeticiones']
+        if segmentacion is not None:
+            stats['repeticiones'] = segmentacion['repeticiones']
+
+    def finalizar(self, frames):
+        stats = self.stats
+        stats.update(self.acumulador.exportar(frames))
+        # Duracion real si no venia en metadata
+        if not stats['duracion_segundos']:
+            stats['duracion_segundos'] = frames / self.fps if self.fps > 0 else 0
+        return stats
+
+class AnalizadorEjercicios:
+    def __init__(self, calidad=None, cargar_pose=True):
         # Configuracion de MediaPipe Pose
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
+        # Mismo criterio que las peticiones: un POSE_QUALITY mal escrito es un ValueError claro
+        self.calidad = resolver_calidad(calidad)
         
-        # Inicializar detector de pose
+        # Inicializar detector de pose (no hace falta para re-evaluar tracks ya calculados)
         self.pose = self.mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=2,
+            model_complexity=NIVELES_CALIDAD[self.calidad],
             smooth_landmarks=True,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
+        ) if cargar_pose else None
         
         # Landmarks
         self.HOMBROS = [self.mp_pose.PoseLandmark.LEFT_SHOULDER.value, self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
@@ -57,16 +187,76 @@ class AnalizadorEjercicios:
         self.CADERAS = [self.mp_pose.PoseLandmark.LEFT_HIP.value,      self.mp_pose.PoseLandmark.RIGHT_HIP.value]
         self.RODILLAS= [self.mp_pose.PoseLandmark.LEFT_KNEE.value,     self.mp_pose.PoseLandmark.RIGHT_KNEE.value]
         self.TOBILLOS= [self.mp_pose.PoseLandmark.LEFT_ANKLE.value,    self.mp_pose.PoseLandmark.RIGHT_ANKLE.value]
+
+        self.sesion = SesionAnalisis()
+        self.overlay = RenderizadorOverlay()
+
+    def nueva_sesion(self):
+        """Descarta el estado del análisis anterior (buffers y tracking de MediaPipe)."""
+        self.sesion = SesionAnalisis()
+        if self.pose is not None:
+            try:
+                self.pose.reset()
+            except Exception:
+                pass
+        return self.sesion
+
+    def calentar(self):
+        """Una inferencia en vacío para cargar el modelo antes del primer video real."""
+        self.pose.process(np.zeros((256, 256, 3), dtype=np.uint8))
+        self.nueva_sesion()
+
+    def close(self):
+        if self.pose is None:
+            return
+        try:
+            self.pose.close()
+        except Exception:
+            pass
     
-    def calcular_angulo(self, a, b, c):
-        a = np.array(a); b = np.array(b); c = np.array(c)
-        ba = a - b; bc = c - b
-        cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-        cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
-        angle = np.degrees(np.arccos(cosine_angle))
-        return angle
-    
-    def analizar_video_completo(self, video_path, tipo_ejercicio='sentadilla', on_progress=None, progress_queue=None):
+    def resolver_stride(self, fps, inference_stride=None, inference_fps=None):
+        """
+        Cada cuántos frames se ejecuta MediaPipe. inference_fps (si se indica) tiene prioridad
+        y se traduce a stride según el fps del video; por defecto POSE_INFERENCE_STRIDE / _FPS.
+        """
+        if inference_fps is None and inference_stride is None:
+            inference_fps = float(os.environ.get('POSE_INFERENCE_FPS', '0')) or None
+            inference_stride = int(os.environ.get('POSE_INFERENCE_STRIDE', '1'))
+        if inference_fps:
+            return max(1, int(round(fps / float(inference_fps))))
+        return max(1, int(inference_stride or 1))
+
+    def resolver_tamano_inferencia(self, width, height, max_side=None):
+        """
+        Tamaño (w, h) del frame que recibe MediaPipe, o None para usar el original.
+        Los landmarks son normalizados, así que se dibujan y miden igual sobre el frame completo.
+        """
+        if max_side is None:
+            max_side = int(os.environ.get('POSE_INFERENCE_MAX_SIDE', '0'))
+        lado = max(width, height)
+        if not max_side or lado <= max_side:
+            return None
+        escala = max_side / float(lado)
+        return max(1, int(round(width * escala))), max(1, int(round(height * escala)))
+
+    def clave_track(self, track_cache, video_hash, stride, tamano_inferencia, width, height):
+        """Clave del track de landmarks en caché: contenido del video + ajustes que cambian la pose."""
+        return track_cache.clave(video_hash, {
+            'calidad': self.calidad,
+            'stride': stride,
+            'resolucion': list(tamano_inferencia or (width, height)),
+        })
+
+    def analizar_video_completo(self, video_path, tipo_ejercicio='sentadilla', on_progress=None, progress_queue=None, on_frame=None,
+                                inference_stride=None, inference_fps=None, inference_max_side=None,
+                                track_cache=None, video_hash=None, umbrales=None, salida='video'):
+        """
+        Analiza el video y devuelve (ruta_video_salida, stats).
+        Con salida='track' no se dibuja ni se codifica nada: devuelve (payload_track, stats),
+        donde payload_track es el track compacto por frame para que el cliente dibuje el overlay.
+        Con track_cache + video_hash, reutiliza el track de landmarks si ya se calculó con los
+        mismos ajustes de pose (sin ejecutar MediaPipe) o lo guarda al terminar.
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise RuntimeError("No se pudo abrir el video de entrada")
@@ -76,18 +266,20 @@ class AnalizadorEjercicios:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
 
-        tmp_out = tempfile.mktemp(suffix='.mp4')
-        writer, output_path, codec = _new_writer_h264_or_fallback(tmp_out, fps, (width, height))
-        if not writer or not writer.isOpened():
-            raise RuntimeError("No se pudo abrir VideoWriter con ningun codec disponible")
-
-        stats = {
-            'repeticiones': 0,
-            'errores_detectados': [],
-            'scores_por_frame': [],
-            'duracion_segundos': (total_frames / fps) if fps > 0 and total_frames > 0 else 0,
-            'score_promedio': 0
-        }
+        if salida not in ('video', 'track'):
+            cap.release()
+            raise ValueError(f"Salida inválida: {salida}")
+        writer = output_path = codec = None
+        if salida == 'video':
+            tmp_out = tempfile.mktemp(suffix='.mp4')
+            writer, output_path, codec = _new_writer_h264_or_fallback(tmp_out, fps, (width, height))
+            if not writer or not writer.isOpened():
+                cap.release()
+                raise RuntimeError("No se pudo abrir VideoWriter con ningun codec disponible")
+        constructor = ConstructorTrack(fps, width, height) if salida == 'track' else None
+
+        registro = RegistroEstadisticas(fps, total_frames)
+        stats = registro.stats
 
         # Helper para notificar progreso
         def _notify_progress(pct: int):
@@ -100,154 +292,191 @@ class AnalizadorEjercicios:
             except Exception:
                 pass
 
-        frame_idx = 0
-        estado_ejercicio = "preparando"
-        repeticiones = 0
-        umbral_angulo_bajo = 100
-        umbral_angulo_alto = 160
-        # Estado interno para desplantes
-        self._lunge_prev_angle = None
-        self._lunge_min_angle = None
-        self._lunge_front_side = None
-        self._knee_buffers = {'izq': deque(maxlen=7), 'der': deque(maxlen=7)}
-        last_progress = -1
-        # Antispam de errores
-        last_error_msg = None
-        last_error_ts = -1.0
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame_idx += 1
-            timestamp = frame_idx / fps
-
-            # Progreso basado en total de frames (si esta disponible)
-            if total_frames > 0:
-                progress = int((frame_idx / total_frames) * 100)
-                if progress != last_progress:
-                    _notify_progress(progress)
-                    last_progress = progress
+        # Helper para notificar frames procesados (fps/ETA y repeticiones por trabajo)
+        def _notify_frame(idx: int, repeticiones: int):
+            try:
+                if on_frame:
+                    on_frame(idx, total_frames, repeticiones)
+            except Exception:
+                pass
 
+        sesion = self.nueva_sesion()
+        sesion.umbrales = umbrales_reps(tipo_ejercicio, umbrales)
+        contador = {'frames': 0, 'last_progress': -1, 'inferidos': 0, 'seg_inferencia': 0.0}
+        stride = self.resolver_stride(fps, inference_stride, inference_fps)
+        tamano_inferencia = self.resolver_tamano_inferencia(width, height, inference_max_side)
+
+        # Track de landmarks: reutilizar de la caché o registrarlo (solo si hay que guardarlo en ella)
+        track_id = None
+        track_cacheado = None
+        track = None
+        if track_cache is not None and video_hash:
+            track_id = self.clave_track(track_cache, video_hash, stride, tamano_inferencia, width, height)
+            hit = track_cache.get(track_id)
+            if hit is not None:
+                track_cacheado = hit[0]
+            else:
+                track = []
+        # Serie angular para la segmentación de repeticiones, frame a frame (memoria constante por frame)
+        serie_reps = SerieReps(tipo_ejercicio)
+
+        # Etapas del pipeline: decodificar -> pose -> análisis -> render -> codificar.
+        # Cada una corre en su propio hilo; el orden de frames se conserva (colas FIFO).
+        # Tiempo por frame de cada etapa -> posturepro_frame_stage_seconds{etapa}
+        medir = tiempo_etapa_frame.observe
+        reloj = time.perf_counter
+
+        def decodificar():
+            frame_idx = 0
+            while True:
+                t0 = reloj()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                medir(reloj() - t0, 'decode')
+                frame_idx += 1
+                yield frame_idx, frame
+
+        def _inferir(frame):
+            t0 = reloj()
+            if tamano_inferencia is not None:
+                # Redimensionar antes de convertir: cvtColor y pose trabajan sobre la copia pequeña
+                frame = cv2.resize(frame, tamano_inferencia, interpolation=cv2.INTER_AREA)
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            t1 = reloj()
             results = self.pose.process(rgb)
-            if results.pose_landmarks:
-                self.mp_drawing.draw_landmarks(
-                    frame,
-                    results.pose_landmarks,
-                    self.mp_pose.POSE_CONNECTIONS,
-                    landmark_drawing_spec=mp.solutions.drawing_utils.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
-                    connection_drawing_spec=mp.solutions.drawing_utils.DrawingSpec(color=(255, 0, 0), thickness=2)
-                )
-
-                landmarks = results.pose_landmarks.landmark
-                feedback_data = {"feedback": "", "score": 100, "color": (0, 255, 0)}
-
-                if tipo_ejercicio == 'sentadilla':
-                    feedback_data = self.analizar_sentadilla_completo(landmarks, frame, estado_ejercicio, timestamp)
-                    angulo_rodilla = self.calcular_angulo_rodilla(landmarks)
-                    if angulo_rodilla is not None:
-                        if estado_ejercicio == "preparando" and angulo_rodilla < umbral_angulo_bajo:
-                            estado_ejercicio = "bajando"
-                        elif estado_ejercicio == "bajando" and angulo_rodilla > umbral_angulo_alto:
-                            estado_ejercicio = "preparando"
-                            repeticiones += 1
-                            stats['repeticiones'] = repeticiones
-                elif tipo_ejercicio == 'desplantes':
-                    feedback_data = self.analizar_desplantes_completo(landmarks, frame, timestamp, estado_ejercicio)
-                    # 1) Ángulos crudos
-                    izq, der = self.calcular_angulos_rodillas(landmarks)
-                    # 2) Suavizado por pierna (mediana)
-                    if izq is not None: self._knee_buffers['izq'].append(izq)
-                    if der is not None: self._knee_buffers['der'].append(der)
-                    def _med(side):
-                        buf = self._knee_buffers[side]
-                        return float(np.median(buf)) if len(buf) else None
-                    izq_s, der_s = _med('izq'), _med('der')
-                    # 3) Fijar pierna delantera durante la repetición
-                    if estado_ejercicio == "preparando" or self._lunge_front_side is None:
-                        if izq_s is not None and der_s is not None:
-                            self._lunge_front_side = 'izq' if izq_s <= der_s else 'der'
-                        elif izq_s is not None:
-                            self._lunge_front_side = 'izq'
-                        elif der_s is not None:
-                            self._lunge_front_side = 'der'
-                        else:
-                            self._lunge_front_side = None
-                    front_side = self._lunge_front_side
-                    front_angle_s = izq_s if front_side == 'izq' else der_s if front_side == 'der' else None
-                    # 4) Maquina de estados robusta con histéresis
-                    if front_angle_s is not None:
-                        if self._lunge_prev_angle is None:
-                            self._lunge_prev_angle = front_angle_s
-                        delta = front_angle_s - self._lunge_prev_angle
-                        self._lunge_prev_angle = front_angle_s
-                        bajando_trend = delta < -0.3   # disminuye el ángulo
-                        subiendo_trend = delta >  0.3  # aumenta el ángulo
-                        # Umbrales
-                        start_thresh = 165   # iniciar bajada
-                        depth_ok     = 115   # fondo válido alcanzado
-                        top_thresh   = 172   # parte alta
-                        if estado_ejercicio == "preparando":
-                            if front_angle_s < start_thresh and bajando_trend:
-                                estado_ejercicio = "bajando"
-                                self._lunge_min_angle = front_angle_s
-                        elif estado_ejercicio == "bajando":
-                            self._lunge_min_angle = min(self._lunge_min_angle or front_angle_s, front_angle_s)
-                            # Solo pasar a subiendo si ya tocamos fondo suficiente
-                            if subiendo_trend and (self._lunge_min_angle is not None and self._lunge_min_angle < depth_ok):
-                                estado_ejercicio = "subiendo"
-                        elif estado_ejercicio == "subiendo":
-                            if front_angle_s > top_thresh and subiendo_trend:
-                                if (self._lunge_min_angle or 999) < depth_ok:
-                                    repeticiones += 1
-                                    stats['repeticiones'] = repeticiones
-                                estado_ejercicio = "preparando"
-                                self._lunge_min_angle = None
-                                self._lunge_prev_angle = None
-                                self._lunge_front_side = None
-                elif tipo_ejercicio == 'press_banca':
-                    feedback_data = self.analizar_press_banca_completo(landmarks, frame, timestamp)
-                
-                # NUEVO: overlay + registro de metricas
-                frame = self.agregar_overlay_feedback(frame, feedback_data, repeticiones, timestamp, estado_ejercicio)
-                stats['scores_por_frame'].append(feedback_data['score'])
-                if feedback_data.get('feedback') and feedback_data['score'] < 80:
-                    # Evitar registrar el mismo error en cada frame (cooldown 0.5s)
-                    if feedback_data['feedback'] != last_error_msg or (timestamp - last_error_ts) >= 0.5:
-                        stats['errores_detectados'].append({
-                            'timestamp': float(f"{timestamp:.2f}"),
-                            'error': feedback_data['feedback']
-                        })
-                        last_error_msg = feedback_data['feedback']
-                        last_error_ts = timestamp
-            else:
-                cv2.putText(frame, "No se detecta persona", (50, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-            # NUEVO: escribir siempre el frame (haya o no landmarks)
-            writer.write(frame)
-
-        cap.release()
-        writer.release()
+            t2 = reloj()
+            medir(t1 - t0, 'preproceso')
+            medir(t2 - t1, 'pose')
+            contador['seg_inferencia'] += t2 - t1
+            contador['inferidos'] += 1
+            return landmarks_a_array(results.pose_landmarks)
+
+        def leer_track(entradas):
+            # Landmarks ya calculados para este video y ajustes: no se ejecuta MediaPipe
+            for frame_idx, frame in entradas:
+                fila = track_cacheado[frame_idx - 1] if frame_idx <= len(track_cacheado) else None
+                yield frame_idx, frame, (None if fila is None or np.isnan(fila[0, 0]) else fila)
+
+        def inferir_pose(entradas):
+            return pose_con_stride(entradas, stride, _inferir)
+
+        def analizar(entradas):
+            for frame_idx, frame, puntos in entradas:
+                timestamp = frame_idx / fps
+                contador['frames'] = frame_idx
+
+                # Progreso basado en total de frames (si esta disponible)
+                if total_frames > 0:
+                    progress = int((frame_idx / total_frames) * 100)
+                    if progress != contador['last_progress']:
+                        _notify_progress(progress)
+                        contador['last_progress'] = progress
+
+                if track is not None:
+                    track.append(puntos)
+                resultado = None
+                if puntos is not None:
+                    t0 = reloj()
+                    cin = cinematica_frame_rapida(puntos)
+                    serie_reps.agregar(cin)
+                    resultado = self._analizar_frame(sesion, tipo_ejercicio, puntos, frame.shape, timestamp, cinematica=cin)
+                    registro.registrar(resultado, frame_idx, timestamp)
+                    medir(reloj() - t0, 'analisis')
+                else:
+                    serie_reps.agregar(None)
+                _notify_frame(frame_idx, sesion.repeticiones)
+                yield frame_idx, frame, puntos, resultado
+
+        def renderizar(entradas):
+            for frame_idx, frame, puntos, resultado in entradas:
+                t0 = reloj()
+                frame = self.dibujar_frame(frame, puntos, resultado, frame_idx / fps)
+                medir(reloj() - t0, 'render')
+                yield frame
+
+        def codificar(entradas):
+            # Escribir siempre el frame (haya o no landmarks)
+            for frame in entradas:
+                t0 = reloj()
+                writer.write(frame)
+                medir(reloj() - t0, 'encode')
+
+        def recolectar_track(entradas):
+            # Modo track: sin overlay ni encoder, solo el track compacto por frame
+            for frame_idx, frame, puntos, resultado in entradas:
+                t0 = reloj()
+                constructor.agregar(puntos, resultado)
+                medir(reloj() - t0, 'track')
+
+        fuente_pose = leer_track if track_cacheado is not None else inferir_pose
+        if salida == 'track':
+            etapas = [decodificar, fuente_pose, analizar, recolectar_track]
+        else:
+            etapas = [decodificar, fuente_pose, analizar, renderizar, codificar]
+        try:
+            Pipeline(etapas).run()
+        except Exception:
+            if writer is not None:
+                writer.release()
+                try:
+                    os.unlink(output_path)
+                except Exception:
+                    pass
+            raise
+        finally:
+            cap.release()
+        if writer is not None:
+            t0 = reloj()
+            liberado = writer.release()
+            if codec == 'libx264':
+                # Con ffmpeg por pipe, cerrar stdin espera a que termine de codificar lo pendiente
+                tiempo_ffmpeg.observe(reloj() - t0, 'encode_finalize')
+            if liberado is False:
+                try:
+                    os.unlink(output_path)
+                except Exception:
+                    pass
+                raise RuntimeError("Fallo la codificacion del video de salida")
+        frame_idx = contador['frames']
 
         # Asegurar 100% al finalizar
-        if last_progress < 100:
+        if contador['last_progress'] < 100:
             _notify_progress(100)
 
-        if stats['scores_por_frame']:
-            stats['score_promedio'] = float(np.mean(stats['scores_por_frame']))
-        else:
-            stats['score_promedio'] = 0.0
+        registro.finalizar(frame_idx)
 
-        # Duracion real si no venia en metadata
-        if not stats['duracion_segundos']:
-            stats['duracion_segundos'] = frame_idx / fps if fps > 0 else 0
+        if track is not None:
+            try:
+                track_cache.put(track_id, apilar_track(track), {'fps': fps, 'width': width, 'height': height})
+            except Exception as e:
+                print(f"[TRACK_CACHE][ERROR] {e}")
+            track = None
+
+        # Segmentación offline de repeticiones (límites, profundidad y tempo por rep)
+        registro.fijar_segmentacion(segmentar_serie(serie_reps.serie(), tipo_ejercicio, fps, sesion.umbrales))
+
+        stats['inferencia'] = {
+            'stride': stride,
+            'frames_inferidos': contador['inferidos'],
+            'resolucion': list(tamano_inferencia or (width, height)),
+            'resolucion_video': [width, height],
+            'calidad': self.calidad,
+            'model_complexity': NIVELES_CALIDAD[self.calidad],
+            'ms_por_frame': round(1000.0 * contador['seg_inferencia'] / contador['inferidos'], 2) if contador['inferidos'] else 0.0,
+            'track_id': track_id,
+            'cache': None if track_id is None else ('hit' if track_cacheado is not None else 'miss'),
+        }
 
         # NUEVO: recomendaciones personalizadas
         stats['recomendaciones'] = self.generar_recomendaciones(stats, tipo_ejercicio)
 
-        # Transcodificar a H.264 (MP4) para compatibilidad de navegador si es posible
+        if salida == 'track':
+            return constructor.construir(), stats
+
+        # Transcodificar a H.264 (MP4) solo si el writer no produjo ya H.264 con faststart
+        if codec == 'libx264':
+            return output_path, stats
         try:
             final_path = self._ensure_h264_mp4(output_path, fps)
             if final_path and os.path.exists(final_path):
@@ -264,6 +493,156 @@ class AnalizadorEjercicios:
 
         return output_path, stats
 
+    def _analizar_frame(self, sesion, tipo_ejercicio, puntos, frame_shape, timestamp, cinematica=None):
+        """
+        Analiza los landmarks de un frame (ndarray (33, 4)) y avanza la máquina de estados de
+        repeticiones de la sesión. No dibuja: las etiquetas a pintar vienen en feedback_data['etiquetas'].
+        cinematica: ángulos del frame ya calculados (p. ej. en lote sobre todo el track).
+        Los analizadores leen las coordenadas directamente de `puntos` (columnas x, y).
+        """
+        cin = cinematica if cinematica is not None else cinematica_frame_rapida(puntos)
+        # Todas las señales suavizadas del frame en una sola pasada (medianas móviles por sesión)
+        izq, der = cin['rodilla_izq'], cin['rodilla_der']
+        delantera = izq if der is None or (izq is not None and izq <= der) else der
+        suave = sesion.suavizado.actualizar({
+            'torso': cin['torso'],
+            'rodilla_delantera': delantera,
+            'rodilla_izq': izq,
+            'rodilla_der': der,
+        }, timestamp)
+        feedback_data = {"feedback": "", "score": 100, "color": (0, 255, 0)}
+        estado_ejercicio = sesion.estado
+        umbrales = sesion.umbrales or UMBRALES_REPS.get(tipo_ejercicio, {})
+
+        if tipo_ejercicio == 'sentadilla':
+            feedback_data = self.analizar_sentadilla_completo(puntos, cin, suave, frame_shape, estado_ejercicio, timestamp)
+            angulo_rodilla = cin['rodilla_der']
+            if angulo_rodilla is not None:
+                if estado_ejercicio == "preparando" and angulo_rodilla < umbrales['bajo']:
+                    estado_ejercicio = "bajando"
+                elif estado_ejercicio == "bajando" and angulo_rodilla > umbrales['alto']:
+                    estado_ejercicio = "preparando"
+                    sesion.repeticiones += 1
+        elif tipo_ejercicio == 'desplantes':
+            feedback_data = self.analizar_desplantes_completo(puntos, cin, suave, frame_shape, timestamp, estado_ejercicio)
+            # 1-2) Ángulos por pierna suavizados (mediana 7 frames, ya actualizada arriba)
+            izq_s = sesion.suavizado.mediana('rodilla_izq')
+            der_s = sesion.suavizado.mediana('rodilla_der')
+            # 3) Fijar pierna delantera durante la repetición
+            if estado_ejercicio == "preparando" or sesion.lunge_front_side is None:
+                if izq_s is not None and der_s is not None:
+                    sesion.lunge_front_side = 'izq' if izq_s <= der_s else 'der'
+                elif izq_s is not None:
+                    sesion.lunge_front_side = 'izq'
+                elif der_s is not None:
+                    sesion.lunge_front_side = 'der'
+                else:
+                    sesion.lunge_front_side = None
+            front_side = sesion.lunge_front_side
+            front_angle_s = izq_s if front_side == 'izq' else der_s if front_side == 'der' else None
+            # 4) Maquina de estados robusta con histéresis
+            if front_angle_s is not None:
+                if sesion.lunge_prev_angle is None:
+                    sesion.lunge_prev_angle = front_angle_s
+                delta = front_angle_s - sesion.lunge_prev_angle
+                sesion.lunge_prev_angle = front_angle_s
+                bajando_trend = delta < -0.3   # disminuye el ángulo
+                subiendo_trend = delta >  0.3  # aumenta el ángulo
+                # Umbrales
+                start_thresh = umbrales['inicio']   # iniciar bajada
+                depth_ok     = umbrales['fondo']    # fondo válido alcanzado
+                top_thresh   = umbrales['arriba']   # parte alta
+                if estado_ejercicio == "preparando":
+                    if front_angle_s < start_thresh and bajando_trend:
+                        estado_ejercicio = "bajando"
+                        sesion.lunge_min_angle = front_angle_s
+                elif estado_ejercicio == "bajando":
+                    sesion.lunge_min_angle = min(sesion.lunge_min_angle or front_angle_s, front_angle_s)
+                    # Solo pasar a subiendo si ya tocamos fondo suficiente
+                    if subiendo_trend and (sesion.lunge_min_angle is not None and sesion.lunge_min_angle < depth_ok):
+                        estado_ejercicio = "subiendo"
+                elif estado_ejercicio == "subiendo":
+                    if front_angle_s > top_thresh and subiendo_trend:
+                        if (sesion.lunge_min_angle or 999) < depth_ok:
+                            sesion.repeticiones += 1
+                        estado_ejercicio = "preparando"
+                        sesion.lunge_min_angle = None
+                        sesion.lunge_prev_angle = None
+                        sesion.lunge_front_side = None
+        elif tipo_ejercicio == 'press_banca':
+            feedback_data = self.analizar_press_banca_completo(puntos, cin, frame_shape, timestamp)
+            angulo_codo = cin['codo_der']
+            if angulo_codo is not None:
+                if estado_ejercicio == "preparando" and angulo_codo < umbrales['bajo']:
+                    estado_ejercicio = "bajando"
+                elif estado_ejercicio == "bajando" and angulo_codo > umbrales['alto']:
+                    estado_ejercicio = "preparando"
+                    sesion.repeticiones += 1
+
+        sesion.estado = estado_ejercicio
+        return {
+            'feedback_data': feedback_data,
+            'repeticiones': sesion.repeticiones,
+            'estado': estado_ejercicio,
+        }
+
+    def reproducir_track(self, landmarks, fps, frame_shape, tipo_ejercicio='sentadilla', umbrales=None):
+        """
+        Análisis por frame en orden sobre un track de landmarks ya calculado (sin decodificar
+        ni ejecutar MediaPipe). Devuelve (stats con segmentación, resultados por frame);
+        el resultado es None en los frames sin persona.
+        """
+        sesion = self.nueva_sesion()
+        sesion.umbrales = umbrales_reps(tipo_ejercicio, umbrales)
+        registro = RegistroEstadisticas(fps, len(landmarks))
+        resultados = [None] * len(landmarks)
+        # Todos los ángulos del track de una vez (vectorizado); el bucle solo avanza estados
+        cinematica = calcular_cinematica(landmarks)
+        for frame_idx, fila in enumerate(landmarks, 1):
+            if np.isnan(fila[0, 0]):
+                continue
+            timestamp = frame_idx / fps
+            resultado = self._analizar_frame(sesion, tipo_ejercicio, fila, frame_shape, timestamp,
+                                             cinematica=cinematica_frame(cinematica, frame_idx - 1))
+            registro.registrar(resultado, frame_idx, timestamp)
+            resultados[frame_idx - 1] = resultado
+        stats = registro.finalizar(len(landmarks))
+        registro.fijar_segmentacion(segmentar_ejercicio(cinematica, tipo_ejercicio, fps, sesion.umbrales))
+        return stats, resultados
+
+    def reevaluar_track(self, landmarks, meta, tipo_ejercicio='sentadilla', umbrales=None):
+        """
+        Repite el análisis por frame (analizadores, repeticiones y recomendaciones) sobre un
+        track de landmarks ya calculado, sin decodificar ni ejecutar MediaPipe.
+        """
+        fps = meta.get('fps') or 30
+        frame_shape = (meta.get('height') or 480, meta.get('width') or 640)
+        stats, _ = self.reproducir_track(landmarks, fps, frame_shape, tipo_ejercicio, umbrales)
+        stats['recomendaciones'] = self.generar_recomendaciones(stats, tipo_ejercicio)
+        return stats
+
+    def dibujar_frame(self, frame, puntos, resultado, timestamp):
+        """Esqueleto, etiquetas y panel de feedback de un frame (o el aviso si no hay persona)."""
+        if puntos is not None:
+            self.mp_drawing.draw_landmarks(
+                frame,
+                array_a_proto(puntos),
+                self.mp_pose.POSE_CONNECTIONS,
+                landmark_drawing_spec=LANDMARK_SPEC,
+                connection_drawing_spec=CONNECTION_SPEC
+            )
+            feedback_data = resultado['feedback_data']
+            self.dibujar_etiquetas(frame, feedback_data.get('etiquetas', []))
+            frame = self.agregar_overlay_feedback(frame, feedback_data, resultado['repeticiones'], timestamp, resultado['estado'])
+        else:
+            cv2.putText(frame, "No se detecta persona", (50, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        return frame
+
+    def dibujar_etiquetas(self, frame, etiquetas):
+        for texto, pos in etiquetas:
+            cv2.putText(frame, texto, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+
     def _ensure_h264_mp4(self, src_path, fps):
         """
         Intenta transcodificar el archivo src a H.264 (avc1) en MP4 usando ffmpeg CLI,
@@ -274,13 +653,17 @@ class AnalizadorEjercicios:
             base, _ = os.path.splitext(src_path)
             dst_path = base + "_h264.mp4"
             cmd = [
-                'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+                FFMPEG_BIN, '-y', '-hide_banner', '-loglevel', 'error',
                 '-i', src_path,
                 '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-preset', 'veryfast', '-crf', '23',
                 '-movflags', '+faststart',
                 dst_path
             ]
-            subprocess.run(cmd, check=True)
+            t0 = time.perf_counter()
+            try:
+                subprocess.run(cmd, check=True)
+            finally:
+                tiempo_ffmpeg.observe(time.perf_counter() - t0, 'transcode')
             # Verificar que el archivo exista y no esté vacío
             if os.path.exists(dst_path) and os.path.getsize(dst_path) > 0:
                 return dst_path
@@ -289,38 +672,11 @@ class AnalizadorEjercicios:
         return None
     
     def agregar_overlay_feedback(self, frame, feedback_data, repeticiones, timestamp, estado):
-        height, width = frame.shape[:2]
-        panel_width = 350; panel_height = 180
-        panel_x = width - panel_width - 10; panel_y = 10
-        
-        overlay = frame.copy()
-        import cv2 as _cv2
-        _cv2.rectangle(overlay, (panel_x, panel_y), (panel_x + panel_width, panel_y + panel_height), (40, 40, 40), -1)
-        frame = _cv2.addWeighted(frame, 0.7, overlay, 0.3, 0)
-        _cv2.rectangle(frame, (panel_x, panel_y), (panel_x + panel_width, panel_y + panel_height), feedback_data['color'], 2)
-        _cv2.putText(frame, "ANALISIS EN VIVO", (panel_x + 10, panel_y + 25), _cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        _cv2.putText(frame, f"Score: {feedback_data['score']}/100", (panel_x + 10, panel_y + 55), _cv2.FONT_HERSHEY_SIMPLEX, 0.7, feedback_data['color'], 2)
-        _cv2.putText(frame, f"Repeticiones: {repeticiones}", (panel_x + 10, panel_y + 85), _cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        minutos = int(timestamp // 60); segundos = int(timestamp % 60)
-        _cv2.putText(frame, f"Tiempo: {minutos:02d}:{segundos:02d}", (panel_x + 10, panel_y + 115), _cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        _cv2.putText(frame, f"Estado: {estado}", (panel_x + 10, panel_y + 145), _cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
-        if feedback_data['feedback']:
-            for i, line in enumerate(self.dividir_texto(feedback_data['feedback'], 40)):
-                _cv2.putText(frame, line, (panel_x, panel_y + panel_height + 30 + i * 25), _cv2.FONT_HERSHEY_SIMPLEX, 0.6, feedback_data['color'], 2)
-        return frame
+        # Dibuja in place (solo se mezcla la región del panel)
+        return self.overlay.dibujar(frame, feedback_data, repeticiones, timestamp, estado)
     
     def dividir_texto(self, texto, max_chars):
-        if len(texto) <= max_chars:
-            return [texto]
-        words = texto.split(); lines = []; current_line = ""
-        for word in words:
-            if len((current_line + " " + word).strip()) <= max_chars:
-                current_line = (current_line + " " + word).strip()
-            else:
-                if current_line: lines.append(current_line)
-                current_line = word
-        if current_line: lines.append(current_line)
-        return lines
+        return list(dividir_texto(texto, max_chars))
     
     def crear_frame_resumen(self, estadisticas, width, height, tipo_ejercicio):
         import cv2 as _cv2
@@ -336,24 +692,21 @@ class AnalizadorEjercicios:
         _cv2.putText(frame, f"Score promedio: {estadisticas['score_promedio']:.1f}/100", (50, y_pos), _cv2.FONT_HERSHEY_SIMPLEX, 0.7, score_color, 2); y_pos += 40
         minutos = int(estadisticas['duracion_segundos'] // 60); segundos = int(estadisticas['duracion_segundos'] % 60)
         _cv2.putText(frame, f"Duracion: {minutos:02d}:{segundos:02d}", (50, y_pos), _cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2); y_pos += 60
-        if estadisticas['errores_detectados']:
+        if estadisticas.get('errores_resumen'):
             _cv2.putText(frame, "Principales areas de mejora:", (50, y_pos), _cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2); y_pos += 35
-            errores_count = {}
-            for e in estadisticas['errores_detectados']:
-                msg = e['error']; errores_count[msg] = errores_count.get(msg, 0) + 1
-            for error, count in sorted(errores_count.items(), key=lambda x: x[1], reverse=True)[:3]:
-                _cv2.putText(frame, f"• {error} ({count} veces)", (70, y_pos), _cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 100, 100), 1); y_pos += 30
+            for e in estadisticas['errores_resumen'][:3]:
+                _cv2.putText(frame, f"• {e['error']} ({e['veces']} veces, {e['segundos']:.0f}s)", (70, y_pos), _cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 100, 100), 1); y_pos += 30
         return frame
     
-    def analizar_sentadilla_completo(self, landmarks, frame, estado, timestamp):
-        h, w, _ = frame.shape
-        angulo_rodilla = self.calcular_angulo_rodilla(landmarks)
-        angulo_espalda = self.calcular_angulo_espalda(landmarks)
-        score = 100; feedback_messages = []; color = (0, 255, 0)
+    def analizar_sentadilla_completo(self, puntos, cin, suave, frame_shape, estado, timestamp):
+        h, w = frame_shape[:2]
+        angulo_rodilla = cin['rodilla_der']
+        angulo_espalda = suave['torso']
+        score = 100; feedback_messages = []; color = (0, 255, 0); etiquetas = []
         if angulo_rodilla is not None:
-            cv2.putText(frame, f"Rodilla: {angulo_rodilla:.1f}°", (w - 200, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Rodilla: {angulo_rodilla:.1f}°", (w - 200, 30)))
         if angulo_espalda is not None:
-            cv2.putText(frame, f"Espalda: {angulo_espalda:.1f}°", (w - 200, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Espalda: {angulo_espalda:.1f}°", (w - 200, 60)))
         if angulo_rodilla is not None:
             if angulo_rodilla > 130 and estado == "bajando":
                 feedback_messages.append("Baja mas la sentadilla"); score -= 15; color = (0, 165, 255)
@@ -369,39 +722,28 @@ class AnalizadorEjercicios:
             elif angulo_espalda > 30:
                 feedback_messages.append("Mejora postura de espalda"); score -= 10; color = (0, 165, 255)
         if angulo_rodilla is not None and angulo_rodilla < 120:
-            rodilla_x = landmarks[self.RODILLAS[1]].x * w; tobillo_x = landmarks[self.TOBILLOS[1]].x * w
+            rodilla_x = float(puntos[self.RODILLAS[1], 0]) * w; tobillo_x = float(puntos[self.TOBILLOS[1], 0]) * w
             if rodilla_x < tobillo_x - 50:
                 feedback_messages.append("Rodillas muy atras"); score -= 15; color = (0, 0, 255)
             elif rodilla_x > tobillo_x + 100:
                 feedback_messages.append("Rodillas muy adelante!"); score -= 25; color = (0, 0, 255)
         try:
-            rodilla_izq = landmarks[self.RODILLAS[0]].y * h; rodilla_der = landmarks[self.RODILLAS[1]].y * h
+            rodilla_izq = float(puntos[self.RODILLAS[0], 1]) * h; rodilla_der = float(puntos[self.RODILLAS[1], 1]) * h
             if abs(rodilla_izq - rodilla_der) > 30:
                 feedback_messages.append("Manten rodillas niveladas"); score -= 10
                 if color == (0, 255, 0): color = (0, 165, 255)
         except:
             pass
         main_feedback = "Excelente forma!" if not feedback_messages else feedback_messages[0]
-        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color}
+        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color, "etiquetas": etiquetas, "angulos": {"rodilla": angulo_rodilla, "espalda": angulo_espalda}}
     
-    def analizar_press_banca_completo(self, landmarks, frame, timestamp):
-        h, w, _ = frame.shape
-        hombro_der = [landmarks[self.HOMBROS[1]].x, landmarks[self.HOMBROS[1]].y]
-        codo_der   = [landmarks[self.CODOS[1]].x,   landmarks[self.CODOS[1]].y]
-        muñeca_der = [landmarks[self.MUÑECAS[1]].x, landmarks[self.MUÑECAS[1]].y]
-        hombro_izq = [landmarks[self.HOMBROS[0]].x, landmarks[self.HOMBROS[0]].y]
-        codo_izq   = [landmarks[self.CODOS[0]].x,   landmarks[self.CODOS[0]].y]
-        muñeca_izq = [landmarks[self.MUÑECAS[0]].x, landmarks[self.MUÑECAS[0]].y]
-        
-        angulo_codo_der = None; angulo_codo_izq = None
-        if all(not math.isnan(p[0]) for p in [hombro_der, codo_der, muñeca_der]):
-            angulo_codo_der = self.calcular_angulo(hombro_der, codo_der, muñeca_der)
-        if all(not math.isnan(p[0]) for p in [hombro_izq, codo_izq, muñeca_izq]):
-            angulo_codo_izq = self.calcular_angulo(hombro_izq, codo_izq, muñeca_izq)
+    def analizar_press_banca_completo(self, puntos, cin, frame_shape, timestamp):
+        h, w = frame_shape[:2]
+        angulo_codo_der = cin['codo_der']; angulo_codo_izq = cin['codo_izq']
         
-        score = 100; feedback_messages = []; color = (0, 255, 0)
+        score = 100; feedback_messages = []; color = (0, 255, 0); etiquetas = []
         if angulo_codo_der is not None:
-            cv2.putText(frame, f"Codo Der: {angulo_codo_der:.1f}°", (w - 200, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Codo Der: {angulo_codo_der:.1f}°", (w - 200, 30)))
             if angulo_codo_der < 50:
                 feedback_messages.append("Demasiada profundidad"); score -= 15; color = (0, 100, 255)
             elif angulo_codo_der < 60:
@@ -411,7 +753,7 @@ class AnalizadorEjercicios:
             elif angulo_codo_der > 120:
                 feedback_messages.append("Baja mas el peso"); score -= 20; color = (0, 0, 255)
         if angulo_codo_der is not None and angulo_codo_izq is not None:
-            cv2.putText(frame, f"Codo Izq: {angulo_codo_izq:.1f}°", (w - 200, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Codo Izq: {angulo_codo_izq:.1f}°", (w - 200, 60)))
             diferencia_brazos = abs(angulo_codo_der - angulo_codo_izq)
             if diferencia_brazos > 20:
                 feedback_messages.append("Manten simetria entre brazos"); score -= 15
@@ -420,123 +762,26 @@ class AnalizadorEjercicios:
                 feedback_messages.append("Leve asimetria en brazos"); score -= 5
                 if color == (0, 255, 0): color = (0, 200, 255)
         try:
-            muñeca_der_x = landmarks[self.MUÑECAS[1]].x * w
-            hombro_der_x = landmarks[self.HOMBROS[1]].x * w
+            muñeca_der_x = float(puntos[self.MUÑECAS[1], 0]) * w
+            hombro_der_x = float(puntos[self.HOMBROS[1], 0]) * w
             if abs(muñeca_der_x - hombro_der_x) > 50:
                 feedback_messages.append("Manten trayectoria vertical"); score -= 10
                 if color == (0, 255, 0): color = (0, 165, 255)
         except:
             pass
         main_feedback = "Buen movimiento!" if not feedback_messages else feedback_messages[0]
-        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color}
-    
-    def calcular_angulo_rodilla(self, landmarks):
-        cadera  = [landmarks[self.CADERAS[1]].x,  landmarks[self.CADERAS[1]].y]
-        rodilla = [landmarks[self.RODILLAS[1]].x, landmarks[self.RODILLAS[1]].y]
-        tobillo = [landmarks[self.TOBILLOS[1]].x, landmarks[self.TOBILLOS[1]].y]
-        if all(not math.isnan(p[0]) for p in [cadera, rodilla, tobillo]):
-            return self.calcular_angulo(cadera, rodilla, tobillo)
-        return None
+        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color, "etiquetas": etiquetas, "angulos": {"codo_der": angulo_codo_der, "codo_izq": angulo_codo_izq}}
     
-    def calcular_angulo_espalda(self, landmarks):
-        """
-        Ángulo del torso respecto a la vertical (0° = torso recto, mayor = más inclinado).
-        Usa eje vertical global y suaviza con mediana para reducir jitter.
-        """
-        hombro = [landmarks[self.HOMBROS[1]].x, landmarks[self.HOMBROS[1]].y]
-        cadera = [landmarks[self.CADERAS[1]].x, landmarks[self.CADERAS[1]].y]
-
-        if any(math.isnan(p) for p in [hombro[0], hombro[1], cadera[0], cadera[1]]):
-            return None
-
-        # Vector torso (de cadera a hombro)
-        vx = hombro[0] - cadera[0]
-        vy = hombro[1] - cadera[1]   # Nota: en MediaPipe y aumenta hacia abajo
-        norm = math.sqrt(vx*vx + vy*vy)
-        if norm < 1e-6:
-            return None
-
-        # Eje vertical hacia arriba en coordenadas normalizadas (0, -1)
-        # cos(theta) = (v · (0,-1)) / |v| = (-vy)/|v|
-        cos_theta = (-vy) / norm
-        cos_theta = max(-1.0, min(1.0, cos_theta))
-        angle_deg = math.degrees(math.acos(cos_theta))  # 0° recto, >0 inclinado
-
-        # Suavizado (mediana últimos 5 valores)
-        if not hasattr(self, "_espalda_angle_buffer"):
-            self._espalda_angle_buffer = []
-        self._espalda_angle_buffer.append(angle_deg)
-        if len(self._espalda_angle_buffer) > 5:
-            self._espalda_angle_buffer.pop(0)
-        angle_smoothed = float(np.median(self._espalda_angle_buffer))
-
-        return angle_smoothed
-
-    def calcular_flexion_toracolumbar(self, landmarks):
-        """
-        Proxy de 'redondeo' (flexión torácica) usando relación entre:
-        - Vector tronco (cadera media -> hombro medio)
-        - Vector cuello/cabeza (hombro medio -> oreja/nariz)
-        Devuelve diferencia angular (grados). Mayor = más flexión anterior.
-        """
-        try:
-            ls = landmarks[self.HOMBROS[0]]; rs = landmarks[self.HOMBROS[1]]
-            lh = landmarks[self.CADERAS[0]]; rh = landmarks[self.CADERAS[1]]
-            # Preferir orejas; si faltan usar nariz
-            nose = landmarks[self.mp_pose.PoseLandmark.NOSE.value]
-            le_idx = self.mp_pose.PoseLandmark.LEFT_EAR.value
-            re_idx = self.mp_pose.PoseLandmark.RIGHT_EAR.value
-            le = landmarks[le_idx]; re = landmarks[re_idx]
-
-            mid_shoulder = ((ls.x + rs.x)/2, (ls.y + rs.y)/2)
-            mid_hip      = ((lh.x + rh.x)/2, (lh.y + rh.y)/2)
-
-            # Cabeza (usar orejas si tienen visibilidad decente, si no nariz)
-            head_pts = []
-            for pt in (le, re):
-                if pt.visibility > 0.5:
-                    head_pts.append((pt.x, pt.y))
-            if head_pts:
-                head = (sum(p[0] for p in head_pts)/len(head_pts),
-                        sum(p[1] for p in head_pts)/len(head_pts))
-            else:
-                head = (nose.x, nose.y)
-
-            vx_trunk = mid_shoulder[0] - mid_hip[0]
-            vy_trunk = mid_shoulder[1] - mid_hip[1]
-            vx_neck  = head[0] - mid_shoulder[0]
-            vy_neck  = head[1] - mid_shoulder[1]
-
-            def _norm(vx, vy):
-                n = math.sqrt(vx*vx + vy*vy)
-                return (vx/n, vy/n) if n > 1e-6 else (0,0)
-
-            tx, ty = _norm(vx_trunk, vy_trunk)
-            nx, ny = _norm(vx_neck, vy_neck)
-
-            dot = max(-1.0, min(1.0, tx*nx + ty*ny))
-            angle = math.degrees(math.acos(dot))  # 0 alineado, > grande = más flexión
-
-            # Suavizado corto
-            if not hasattr(self, "_flex_buffer"):
-                self._flex_buffer = []
-            self._flex_buffer.append(angle)
-            if len(self._flex_buffer) > 5:
-                self._flex_buffer.pop(0)
-            return float(np.median(self._flex_buffer))
-        except Exception:
-            return None
-
-    def analizar_desplantes_completo(self, landmarks, frame, timestamp, estado):
+    def analizar_desplantes_completo(self, puntos, cin, suave, frame_shape, timestamp, estado):
         """
         Analiza desplantes (lunges) usando:
         - Flexión de rodilla de la pierna delantera (ideal ~80–110° en el fondo).
         - Alineación rodilla-tobillo (evitar muy adelante/atrás).
         - Inclinación del torso (ángulo de espalda respecto a la vertical).
         """
-        h, w, _ = frame.shape
-        izq, der = self.calcular_angulos_rodillas(landmarks)
-        angulo_espalda = self.calcular_angulo_espalda(landmarks)
+        h, w = frame_shape[:2]
+        izq, der = cin['rodilla_izq'], cin['rodilla_der']
+        angulo_espalda = suave['torso']  # respecto a la vertical, mediana 5 frames
 
         # Determinar pierna delantera por mayor flexión (menor ángulo)
         front_side = None
@@ -551,30 +796,16 @@ class AnalizadorEjercicios:
         elif der is not None:
             front_side, front_knee = 'der', der
 
-        # Suavizado de rodilla delantera (mediana 7 frames)
-        front_knee_s = None
-        if front_knee is not None:
-            if not hasattr(self, "_front_knee_buffer"):
-                self._front_knee_buffer = []
-            self._front_knee_buffer.append(front_knee)
-            if len(self._front_knee_buffer) > 7:
-                self._front_knee_buffer.pop(0)
-            front_knee_s = float(np.median(self._front_knee_buffer))
+        # Rodilla delantera suavizada (mediana 7 frames)
+        front_knee_s = suave['rodilla_delantera']
         
         # Heurística: rodilla trasera “casi al piso” => no pedir bajar más
         near_floor = False
         try:
-            if front_side == 'izq':
-                back_knee = landmarks[self.RODILLAS[1]]
-                back_ankle = landmarks[self.TOBILLOS[1]]
-            elif front_side == 'der':
-                back_knee = landmarks[self.RODILLAS[0]]
-                back_ankle = landmarks[self.TOBILLOS[0]]
-            else:
-                back_knee = back_ankle = None
-            if back_knee and back_ankle:
-                knee_y = back_knee.y * h
-                ankle_y = back_ankle.y * h
+            if front_side is not None:
+                atras = 1 if front_side == 'izq' else 0
+                knee_y = float(puntos[self.RODILLAS[atras], 1]) * h
+                ankle_y = float(puntos[self.TOBILLOS[atras], 1]) * h
                 # Umbral relativo al alto (6% de la altura o ~35px mínimo)
                 thr = max(35, 0.06 * h)
                 near_floor = abs(ankle_y - knee_y) < thr
@@ -584,14 +815,15 @@ class AnalizadorEjercicios:
         score = 100
         feedback_messages = []
         color = (0, 255, 0)
+        etiquetas = []
 
-        # Overlay info básica
+        # Overlay info básica (se dibuja en la etapa de render)
         if izq is not None:
-            cv2.putText(frame, f"Rodilla IZQ: {izq:.1f}°", (w - 220, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Rodilla IZQ: {izq:.1f}°", (w - 220, 30)))
         if der is not None:
-            cv2.putText(frame, f"Rodilla DER: {der:.1f}°", (w - 220, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Rodilla DER: {der:.1f}°", (w - 220, 55)))
         if angulo_espalda is not None:
-            cv2.putText(frame, f"Torso: {angulo_espalda:.1f}°", (w - 220, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            etiquetas.append((f"Torso: {angulo_espalda:.1f}°", (w - 220, 80)))
 
         # Torso verticalidad
         if angulo_espalda is not None:
@@ -610,19 +842,11 @@ class AnalizadorEjercicios:
 
         # Alineación rodilla-tobillo de la pierna delantera
         try:
-            if front_side == 'izq':
-                knee = landmarks[self.RODILLAS[0]]
-                ankle = landmarks[self.TOBILLOS[0]]
-            elif front_side == 'der':
-                knee = landmarks[self.RODILLAS[1]]
-                ankle = landmarks[self.TOBILLOS[1]]
-            else:
-                knee = ankle = None
-
-            knee_x = knee.x * w if knee else None
-            knee_y = knee.y * h if knee else None
-            ankle_x = ankle.x * w if ankle else None
-            ankle_y = ankle.y * h if ankle else None
+            knee_x = knee_y = ankle_x = ankle_y = None
+            if front_side is not None:
+                delante = 0 if front_side == 'izq' else 1
+                knee_x, knee_y = float(puntos[self.RODILLAS[delante], 0]) * w, float(puntos[self.RODILLAS[delante], 1]) * h
+                ankle_x, ankle_y = float(puntos[self.TOBILLOS[delante], 0]) * w, float(puntos[self.TOBILLOS[delante], 1]) * h
 
             if knee_x is not None and ankle_x is not None and knee_y is not None and ankle_y is not None:
                 # Normalizar desplazamiento horizontal por la longitud de la tibia (en píxeles)
@@ -649,38 +873,13 @@ class AnalizadorEjercicios:
                 if color == (0, 255, 0): color = (0, 165, 255)
 
         main_feedback = "Buen desplante!" if not feedback_messages else feedback_messages[0]
-        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color}
+        return {"feedback": main_feedback, "score": max(0, min(100, score)), "color": color, "etiquetas": etiquetas, "angulos": {"rodilla_izq": izq, "rodilla_der": der, "torso": angulo_espalda}}
 
-    def calcular_angulos_rodillas(self, landmarks):
-        """
-        Devuelve (angulo_rodilla_izq, angulo_rodilla_der) en grados.
-        """
-        try:
-            cadera_i  = [landmarks[self.CADERAS[0]].x,  landmarks[self.CADERAS[0]].y]
-            rodilla_i = [landmarks[self.RODILLAS[0]].x, landmarks[self.RODILLAS[0]].y]
-            tobillo_i = [landmarks[self.TOBILLOS[0]].x, landmarks[self.TOBILLOS[0]].y]
-            ang_i = self.calcular_angulo(cadera_i, rodilla_i, tobillo_i) if all(not math.isnan(p[0]) for p in [cadera_i, rodilla_i, tobillo_i]) else None
-        except Exception:
-            ang_i = None
-        try:
-            cadera_d  = [landmarks[self.CADERAS[1]].x,  landmarks[self.CADERAS[1]].y]
-            rodilla_d = [landmarks[self.RODILLAS[1]].x, landmarks[self.RODILLAS[1]].y]
-            tobillo_d = [landmarks[self.TOBILLOS[1]].x, landmarks[self.TOBILLOS[1]].y]
-            ang_d = self.calcular_angulo(cadera_d, rodilla_d, tobillo_d) if all(not math.isnan(p[0]) for p in [cadera_d, rodilla_d, tobillo_d]) else None
-        except Exception:
-            ang_d = None
-        return ang_i, ang_d
-    
     def generar_recomendaciones(self, stats, tipo_ejercicio: str):
-        # Conteo de errores
-        counts = {}
-        for e in stats.get('errores_detectados', []):
-            msg = (e.get('error') or '').strip()
-            if not msg:
-                continue
-            counts[msg] = counts.get(msg, 0) + 1
+        # Resumen de errores del acumulador (ya ordenado por tiempo con el error)
+        resumen = [e for e in stats.get('errores_resumen', []) if (e.get('error') or '').strip()]
 
-        if not counts:
+        if not resumen:
             return ["Excelente técnica general. Continúa igual."]
 
         advice_map = {
@@ -704,10 +903,9 @@ class AnalizadorEjercicios:
         }
 
         # Top 3 errores más frecuentes
-        top = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:3]
-
         recs = []
-        for err, _ in top:
+        for e in resumen[:3]:
+            err = e['error'].strip()
             key = err.lower()
             chosen = None
             for k, adv in advice_map.items():
@@ -730,5 +928,95 @@ class AnalizadorEjercicios:
                 dedup.append(r)
         return dedup[:4]
 
-# Instancia unica
-analyzer = AnalizadorEjercicios()
\ No newline at end of file
+class PoolAnalizadores:
+    """
+    Pool de analizadores independientes (cada uno con su propio grafo de MediaPipe Pose).
+    Los analizadores se crean bajo demanda hasta `size` (en total, entre todos los niveles
+    de calidad) y se prestan en exclusiva:
+
+        with analyzer_pool.checkout('balanced') as analyzer:
+            analyzer.analizar_video_completo(...)
+
+    Si el pool está lleno pero hay un analizador libre de otro nivel, se recicla.
+    """
+    def __init__(self, size=None, factory=AnalizadorEjercicios):
+        self.size = size
+        self.factory = factory
+        self._libres = {}  # calidad -> [analizadores libres]
+        self._creados = 0
+        self._cond = threading.Condition()
+
+    def _size(self):
+        if self.size is None:
+            self.size = max(1, int(os.environ.get('ANALYZER_POOL_SIZE', str(os.cpu_count() or 1))))
+        return self.size
+
+    def adquirir(self, calidad=None, timeout=None):
+        calidad = resolver_calidad(calidad)
+        limite = (time.monotonic() + timeout) if timeout is not None else None
+        victima = None
+        with self._cond:
+            while True:
+                libres = self._libres.get(calidad)
+                if libres:
+                    return libres.pop()
+                if self._creados < self._size():
+                    self._creados += 1
+                    break
+                otros = next((l for l in self._libres.values() if l), None)
+                if otros:
+                    victima = otros.pop()
+                    break
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    raise TimeoutError('No hay analizadores disponibles en el pool')
+                self._cond.wait(restante)
+        if victima is not None:
+            victima.close()
+        try:
+            return self.factory(calidad)
+        except Exception:
+            with self._cond:
+                self._creados -= 1
+                self._cond.notify()
+            raise
+
+    def liberar(self, analizador):
+        # El estado del análisis no debe sobrevivir a la devolución
+        analizador.sesion = SesionAnalisis()
+        with self._cond:
+            self._libres.setdefault(analizador.calidad, []).append(analizador)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self, calidad=None, timeout=None):
+        analizador = self.adquirir(calidad, timeout=timeout)
+        try:
+            yield analizador
+        finally:
+            self.liberar(analizador)
+
+    def precalentar(self, calidades=None):
+        """
+        Crea y calienta (una inferencia en vacío) un grafo por nivel indicado.
+        Por defecto POSE_PREWARM (lista separada por comas; "0" lo desactiva) o el nivel por defecto.
+        """
+        if calidades is None:
+            valor = os.environ.get('POSE_PREWARM')
+            if valor is None:
+                calidades = [resolver_calidad(None)]
+            else:
+                calidades = [c.strip() for c in valor.split(',') if c.strip() and c.strip() != '0']
+        for calidad in calidades:
+            try:
+                with self.checkout(calidad) as analizador:
+                    analizador.calentar()
+            except Exception as e:
+                print(f"[POOL] No se pudo precalentar '{calidad}': {e}")
+
+    def en_uso(self):
+        with self._cond:
+            return self._creados - sum(len(l) for l in self._libres.values())
+
+# Pool compartido por todos los workers
+analyzer_pool = PoolAnalizadores()
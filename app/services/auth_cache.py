@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def _clave(token):
+    # Nunca se guarda el bearer token en claro (ni en memoria compartida ni en Redis)
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class LocalTokenCacheBackend:
+    """Backend en proceso: LRU acotado + índice usuario -> tokens para invalidar por usuario.
+
+    Otro backend (p. ej. Redis) solo necesita implementar get/set/delete/delete_user/clear.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # clave -> (user, expira)
+        self._por_usuario = {}         # user_id -> {claves}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._entries.get(clave)
+            if item is None:
+                return None
+            user, expira = item
+            if expira <= time.time():
+                self._quitar(clave)
+                return None
+            self._entries.move_to_end(clave)
+            return user
+
+    def set(self, clave, user, ttl):
+        with self._lock:
+            self._quitar(clave)
+            self._entries[clave] = (user, time.time() + ttl)
+            self._por_usuario.setdefault(user['id'], set()).add(clave)
+            while len(self._entries) > self.max_entries:
+                self._quitar(next(iter(self._entries)))
+
+    def _quitar(self, clave):
+        item = self._entries.pop(clave, None)
+        if item is None:
+            return
+        claves = self._por_usuario.get(item[0]['id'])
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_usuario[item[0]['id']]
+
+    def delete(self, clave):
+        with self._lock:
+            self._quitar(clave)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for clave in list(self._por_usuario.get(user_id, ())):
+                self._quitar(clave)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._por_usuario.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisTokenCacheBackend:
+    """Backend compartido entre workers/procesos (AUTH_CACHE_REDIS_URL); requiere el paquete redis."""
+
+    def __init__(self, url, prefix='posturepro:auth:'):
+        import redis  # opcional: solo si se configura AUTH_CACHE_REDIS_URL
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _tok(self, clave):
+        return f'{self.prefix}tok:{clave}'
+
+    def _usr(self, user_id):
+        return f'{self.prefix}user:{user_id}'
+
+    def get(self, clave):
+        data = self.redis.get(self._tok(clave))
+        return json.loads(data) if data else None
+
+    def set(self, clave, user, ttl):
+        ttl = max(1, int(ttl))
+        pipe = self.redis.pipeline()
+        pipe.set(self._tok(clave), json.dumps(user), ex=ttl)
+        pipe.sadd(self._usr(user['id']), clave)
+        pipe.expire(self._usr(user['id']), ttl)
+        pipe.execute()
+
+    def delete(self, clave):
+        self.redis.delete(self._tok(clave))
+
+    def delete_user(self, user_id):
+        claves = self.redis.smembers(self._usr(user_id))
+        pipe = self.redis.pipeline()
+        for clave in claves:
+            pipe.delete(self._tok(clave.decode() if isinstance(clave, bytes) else clave))
+        pipe.delete(self._usr(user_id))
+        pipe.execute()
+
+    def clear(self):
+        for key in self.redis.scan_iter(f'{self.prefix}*'):
+            self.redis.delete(key)
+
+
+class TokenCache:
+    """
+    Caché token de sesión -> identidad del usuario ({id, email, name}) para get_current_user.
+
+    - Cada entrada vive como mucho AUTH_CACHE_TTL segundos y nunca más allá de la expiración
+      del propio token.
+    - Logout, reset de contraseña e invalidate_user_sessions la invalidan explícitamente.
+    - Con varios workers, AUTH_CACHE_REDIS_URL comparte la caché (y sus invalidaciones);
+      sin él cada proceso tiene la suya y una sesión revocada en otro worker puede seguir
+      aceptándose hasta AUTH_CACHE_TTL segundos.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _backend(self):
+        if self.backend is not None:
+            return self.backend
+        with self._lock:
+            if self.backend is None:
+                if self.ttl is None:
+                    self.ttl = float(os.environ.get('AUTH_CACHE_TTL', '60'))
+                if self.max_entries is None:
+                    self.max_entries = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000'))
+                url = os.environ.get('AUTH_CACHE_REDIS_URL')
+                backend = None
+                if url:
+                    try:
+                        backend = RedisTokenCacheBackend(url)
+                    except Exception as e:
+                        print(f"[AUTH_CACHE] Redis no disponible ({e}); se usa caché en proceso")
+                self.backend = backend or LocalTokenCacheBackend(self.max_entries)
+        return self.backend
+
+    @property
+    def habilitada(self):
+        self._backend()
+        return self.ttl > 0
+
+    def get(self, token):
+        if not self.habilitada:
+            return None
+        try:
+            user = self._backend().get(_clave(token))
+        except Exception as e:
+            print(f"[AUTH_CACHE][ERROR] {e}")
+            user = None
+        if user is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(user)
+
+    def put(self, token, user, token_exp):
+        if not self.habilitada:
+            return
+        ttl = min(self.ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        try:
+            self._backend().set(_clave(token), dict(user), ttl)
+        except Exception as e:
+            print(f"[AUTH_CACHE][ERROR] {e}")
+
+    def invalidate(self, token):
+        try:
+            self._backend().delete(_clave(token))
+        except Exception as e:
+            print(f"[AUTH_CACHE][ERROR] {e}")
+
+    def invalidate_user(self, user_id):
+        try:
+            self._backend().delete_user(user_id)
+        except Exception as e:
+            print(f"[AUTH_CACHE][ERROR] {e}")
+
+    def clear(self):
+        self._backend().clear()
+
+    def stats(self):
+        backend = self._backend()
+        return {
+            'backend': 'redis' if isinstance(backend, RedisTokenCacheBackend) else 'local',
+            'entries': len(backend) if isinstance(backend, LocalTokenCacheBackend) else None,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Instancia unica
+token_cache = TokenCache()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+FFMPEG_BIN = os.environ.get('FFMPEG_BIN', 'ffmpeg')
+
+_sonda = {'resultado': None}
+_sonda_lock = threading.Lock()
+
+
+def ffmpeg_disponible() -> bool:
+    """
+    True si ffmpeg existe y puede codificar con FfmpegPipeWriter (libx264 + yuv420p).
+    Se comprueba una sola vez por proceso codificando un clip mínimo: un ffmpeg sin libx264
+    o que rechace el formato no llega a usarse y queda el VideoWriter de OpenCV.
+    """
+    if _sonda['resultado'] is None:
+        with _sonda_lock:
+            if _sonda['resultado'] is None:
+                _sonda['resultado'] = _probar_ffmpeg()
+    return _sonda['resultado']
+
+
+def _probar_ffmpeg():
+    if shutil.which(FFMPEG_BIN) is None:
+        return False
+    fd, ruta = tempfile.mkstemp(suffix='.mp4')
+    os.close(fd)
+    try:
+        writer = FfmpegPipeWriter(ruta, 1, (64, 64))
+        writer.write(np.zeros((64, 64, 3), dtype=np.uint8))
+        ok = bool(writer.release())
+    except Exception as e:
+        print(f"[ENCODER][ERROR] {e}")
+        ok = False
+    finally:
+        try:
+            os.unlink(ruta)
+        except OSError:
+            pass
+    if not ok:
+        print("[ENCODER] ffmpeg no puede codificar H.264 (libx264); se usará cv2.VideoWriter")
+    return ok
+
+
+class FfmpegPipeWriter:
+    """
+    Codifica frames BGR crudos directamente a H.264 (libx264, MP4 +faststart)
+    enviándolos por stdin a un único proceso ffmpeg. Misma interfaz que cv2.VideoWriter
+    (isOpened/write/release), así que puede usarse como reemplazo directo.
+    """
+
+    def __init__(self, output_path, fps, size, preset='veryfast', crf=23):
+        width, height = size
+        self.output_path = output_path
+        self.size = (int(width), int(height))
+        self.error = None
+        cmd = [
+            FFMPEG_BIN, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{self.size[0]}x{self.size[1]}', '-r', str(max(fps, 1)),
+            '-i', '-',
+            '-an',
+            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-preset', preset, '-crf', str(crf),
+        ]
+        # yuv420p exige dimensiones pares
+        if self.size[0] % 2 or self.size[1] % 2:
+            cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        cmd += ['-movflags', '+faststart', output_path]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            self.proc = None
+            self.error = str(e)
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None and self.error is None
+
+    def write(self, frame):
+        if self.proc is None or self.error is not None:
+            return
+        if frame.shape[1] != self.size[0] or frame.shape[0] != self.size[1]:
+            raise ValueError('Tamaño de frame distinto al del encoder')
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError) as e:
+            self.error = str(e)
+
+    def release(self):
+        """Cierra stdin y espera a ffmpeg. Devuelve True si el MP4 quedó bien escrito."""
+        if self.proc is None:
+            return False
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        stderr = self.proc.stderr.read() if self.proc.stderr else b''
+        code = self.proc.wait()
+        if self.proc.stderr:
+            self.proc.stderr.close()
+        if code != 0 and self.error is None:
+            self.error = stderr.decode('utf-8', 'replace').strip() or f'ffmpeg terminó con código {code}'
+        ok = self.error is None and os.path.exists(self.output_path) and os.path.getsize(self.output_path) > 0
+        if self.error:
+            print(f"[ENCODER][ERROR] {self.error}")
+        return ok
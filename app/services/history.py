@@ -0,0 +1,217 @@
+import json
+import time
+import zlib
+import struct
+import numpy as np
+from sqlalchemy import case, or_, and_
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Analysis, AnalysisFrames, UserExerciseStats
+
+SIN_DATOS = 255  # tramo de la timeline sin persona
+
+
+# --- series empaquetadas ---------------------------------------------------------------------
+
+def _empaquetar_mensajes(mensajes):
+    return json.dumps(mensajes, ensure_ascii=False).encode('utf-8')
+
+
+def _indices_mensajes(textos):
+    mensajes, indices = [], {}
+    for texto in textos:
+        if texto not in indices:
+            indices[texto] = len(mensajes)
+            mensajes.append(texto)
+    return mensajes, [indices[t] for t in textos]
+
+
+def empaquetar_timeline(timeline):
+    """Timeline reducida -> segundos por punto (float32) + score medio por tramo (uint8, 255 = sin persona)."""
+    valores = [SIN_DATOS if v is None else min(100, max(0, int(round(v)))) for v in timeline.get('score_medio') or []]
+    cuerpo = struct.pack('<f', float(timeline.get('segundos_por_punto') or 0.0)) + np.asarray(valores, dtype=np.uint8).tobytes()
+    return zlib.compress(cuerpo, 6)
+
+
+def desempaquetar_timeline(blob):
+    datos = zlib.decompress(blob)
+    (segundos,) = struct.unpack_from('<f', datos)
+    valores = np.frombuffer(datos, dtype=np.uint8, offset=4)
+    return {'segundos_por_punto': round(segundos, 4),
+            'score_medio': [None if v == SIN_DATOS else int(v) for v in valores]}
+
+
+def empaquetar_intervalos(intervalos):
+    """
+    [{error, inicio, fin, frames}] -> n (uint32) + inicio y fin en ms (uint32[n] cada uno) +
+    frames (uint32[n]) + índice del mensaje (uint16[n]) + mensajes únicos (JSON), comprimido.
+    """
+    mensajes, idx = _indices_mensajes([e.get('error') or '' for e in intervalos])
+    cuerpo = (struct.pack('<I', len(intervalos))
+              + np.asarray([int(round(e['inicio'] * 1000)) for e in intervalos], dtype='<u4').tobytes()
+              + np.asarray([int(round(e['fin'] * 1000)) for e in intervalos], dtype='<u4').tobytes()
+              + np.asarray([int(e['frames']) for e in intervalos], dtype='<u4').tobytes()
+              + np.asarray(idx, dtype='<u2').tobytes()
+              + _empaquetar_mensajes(mensajes))
+    return zlib.compress(cuerpo, 6)
+
+
+def desempaquetar_intervalos(blob):
+    datos = zlib.decompress(blob)
+    (n,) = struct.unpack_from('<I', datos)
+    inicio, fin, frames = (np.frombuffer(datos, dtype='<u4', count=n, offset=4 + 4 * n * k) for k in range(3))
+    idx = np.frombuffer(datos, dtype='<u2', count=n, offset=4 + 12 * n)
+    mensajes = json.loads(datos[4 + 14 * n:].decode('utf-8'))
+    return [{'error': mensajes[i], 'inicio': round(int(a) / 1000.0, 2), 'fin': round(int(b) / 1000.0, 2), 'frames': int(f)}
+            for a, b, f, i in zip(inicio, fin, frames, idx)]
+
+
+# --- escritura -------------------------------------------------------------------------------
+
+def _resumen(stats):
+    segmentacion = dict(stats.get('segmentacion') or {})
+    segmentacion.pop('serie', None)  # la serie angular completa no se guarda
+    return {
+        'segmentacion': segmentacion,
+        'recomendaciones': stats.get('recomendaciones') or [],
+        'errores_frecuentes': (stats.get('errores_resumen') or [])[:5],
+        'histograma_scores': stats.get('histograma_scores'),
+        'score_min': stats.get('score_min'),
+        'score_max': stats.get('score_max'),
+    }
+
+
+def _sumar_agregados(user_id, exercise_type, analysis):
+    """Suma el análisis a los agregados con un UPDATE atómico (sin leer-modificar-escribir)."""
+    score = float(analysis.score_promedio)
+    cambios = {
+        UserExerciseStats.sesiones: UserExerciseStats.sesiones + 1,
+        UserExerciseStats.repeticiones_total: UserExerciseStats.repeticiones_total + analysis.repeticiones,
+        UserExerciseStats.duracion_total: UserExerciseStats.duracion_total + analysis.duracion_segundos,
+        UserExerciseStats.errores_total: UserExerciseStats.errores_total + analysis.num_errores,
+        UserExerciseStats.score_suma: UserExerciseStats.score_suma + score,
+        UserExerciseStats.mejor_score: case((UserExerciseStats.mejor_score < score, score), else_=UserExerciseStats.mejor_score),
+        UserExerciseStats.ultimo_score: score,
+        UserExerciseStats.ultimo_at: analysis.created_at,
+    }
+    filtro = UserExerciseStats.query.filter_by(user_id=user_id, exercise_type=exercise_type)
+    if filtro.update(cambios, synchronize_session=False):
+        return
+    # Primer análisis de este ejercicio: crear la fila (si otro worker se adelantó, sumar)
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserExerciseStats(
+                user_id=user_id, exercise_type=exercise_type, sesiones=1,
+                repeticiones_total=analysis.repeticiones, duracion_total=analysis.duracion_segundos,
+                errores_total=analysis.num_errores, score_suma=score, mejor_score=score,
+                ultimo_score=score, ultimo_at=analysis.created_at,
+            ))
+    except IntegrityError:
+        filtro.update(cambios, synchronize_session=False)
+
+
+def guardar_analisis(analysis_id, user_id, exercise_type, stats, quality=None):
+    """Persiste el resumen, las series empaquetadas y actualiza los agregados en una transacción."""
+    intervalos = stats.get('errores_intervalos') or []
+    analysis = Analysis(
+        id=analysis_id,
+        user_id=user_id,
+        exercise_type=exercise_type,
+        created_at=int(time.time()),
+        quality=quality,
+        duracion_segundos=float(stats.get('duracion_segundos') or 0.0),
+        repeticiones=int(stats.get('repeticiones') or 0),
+        score_promedio=float(stats.get('score_promedio') or 0.0),
+        num_errores=len(intervalos) + int(stats.get('errores_intervalos_omitidos') or 0),
+        resumen=json.dumps(_resumen(stats), ensure_ascii=False),
+    )
+    analysis.frames = AnalysisFrames(
+        scores=empaquetar_timeline(stats.get('timeline_scores') or {}),
+        errores=empaquetar_intervalos(intervalos),
+    )
+    try:
+        db.session.add(analysis)
+        db.session.flush()
+        _sumar_agregados(user_id, exercise_type, analysis)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return analysis
+
+
+# --- lectura ---------------------------------------------------------------------------------
+
+def analisis_a_dict(analysis, con_series=False):
+    data = {
+        'id': analysis.id,
+        'exercise_type': analysis.exercise_type,
+        'created_at': analysis.created_at,
+        'quality': analysis.quality,
+        'duracion_segundos': analysis.duracion_segundos,
+        'repeticiones': analysis.repeticiones,
+        'score_promedio': round(analysis.score_promedio, 2),
+        'num_errores': analysis.num_errores,
+    }
+    if con_series:
+        data.update(json.loads(analysis.resumen or '{}'))
+        frames = analysis.frames
+        if frames is not None:
+            data['timeline_scores'] = desempaquetar_timeline(frames.scores)
+            data['errores_intervalos'] = desempaquetar_intervalos(frames.errores)
+    return data
+
+
+def _cursor(analysis):
+    return f'{analysis.created_at}_{analysis.id}'
+
+
+def listar_analisis(user_id, exercise_type=None, limit=20, cursor=None):
+    """
+    Página del histórico (más reciente primero) con paginación por cursor sobre el índice
+    (user_id, [exercise_type,] created_at): el coste no crece con la página pedida.
+    Devuelve (items, next_cursor).
+    """
+    q = Analysis.query.filter(Analysis.user_id == user_id)
+    if exercise_type:
+        q = q.filter(Analysis.exercise_type == exercise_type)
+    if cursor:
+        creado, _, ultimo_id = cursor.partition('_')
+        creado = int(creado)
+        q = q.filter(or_(Analysis.created_at < creado,
+                         and_(Analysis.created_at == creado, Analysis.id < ultimo_id)))
+    filas = q.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1).all()
+    siguiente = _cursor(filas[limit - 1]) if len(filas) > limit else None
+    return [analisis_a_dict(a) for a in filas[:limit]], siguiente
+
+
+def progreso_usuario(user_id, exercise_type=None, puntos=100):
+    """Agregados precalculados por ejercicio + tendencia (escalares de los últimos `puntos` análisis)."""
+    q = UserExerciseStats.query.filter_by(user_id=user_id)
+    if exercise_type:
+        q = q.filter_by(exercise_type=exercise_type)
+    agregados = []
+    for s in q.order_by(UserExerciseStats.exercise_type).all():
+        agregados.append({
+            'exercise_type': s.exercise_type,
+            'sesiones': s.sesiones,
+            'repeticiones_total': s.repeticiones_total,
+            'duracion_total': round(s.duracion_total, 1),
+            'errores_total': s.errores_total,
+            'score_medio': round(s.score_suma / s.sesiones, 2) if s.sesiones else 0.0,
+            'mejor_score': round(s.mejor_score, 2),
+            'ultimo_score': round(s.ultimo_score, 2) if s.ultimo_score is not None else None,
+            'ultimo_at': s.ultimo_at,
+        })
+    # Solo columnas escalares: ninguna serie por frame se lee ni se descomprime
+    t = db.session.query(Analysis.created_at, Analysis.exercise_type, Analysis.score_promedio,
+                         Analysis.repeticiones, Analysis.num_errores).filter(Analysis.user_id == user_id)
+    if exercise_type:
+        t = t.filter(Analysis.exercise_type == exercise_type)
+    filas = t.order_by(Analysis.created_at.desc()).limit(puntos).all()
+    tendencia = [{
+        'created_at': f.created_at, 'exercise_type': f.exercise_type,
+        'score_promedio': round(f.score_promedio, 2), 'repeticiones': f.repeticiones,
+        'num_errores': f.num_errores,
+    } for f in reversed(filas)]
+    return {'agregados': agregados, 'tendencia': tendencia}
@@ -0,0 +1,248 @@
+import os
+import time
+import uuid
+import threading
+import queue as _queue
+from app.services.metrics import espera_cola, trabajos_terminados
+
+
+class QueueFullError(Exception):
+    """La cola de trabajos alcanzó su capacidad máxima."""
+
+
+class Job:
+    """Estado de un trabajo de análisis (progreso, fps, ETA y resultado)."""
+
+    def __init__(self, fn, args=(), kwargs=None, meta=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.meta = dict(meta or {})
+        self.state = 'queued'  # queued | running | done | error
+        self.progress = 0
+        self.frames = 0
+        self.total_frames = 0
+        self.fps = 0.0
+        self.eta_seconds = None
+        self.repeticiones = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+        # Versión del estado: cada cambio la incrementa y despierta a quien espera (SSE)
+        self.version = 0
+        self._cambio = threading.Condition(self._lock)
+
+    def set_state(self, state):
+        with self._lock:
+            self.state = state
+            self._notificar()
+
+    def _notificar(self):
+        self.version += 1
+        self._cambio.notify_all()
+
+    def wait(self, version, timeout=None):
+        """Bloquea hasta que la versión supere `version` (o timeout). Devuelve la versión actual."""
+        with self._lock:
+            if self.version <= version:
+                self._cambio.wait(timeout)
+            return self.version
+
+    @property
+    def terminado(self):
+        return self.state in ('done', 'error')
+
+    def update(self, progress=None, frames=None, total_frames=None, repeticiones=None):
+        """Actualiza el progreso; fps y ETA se derivan de los frames procesados."""
+        with self._lock:
+            if repeticiones is not None:
+                self.repeticiones = int(repeticiones)
+            if progress is not None:
+                self.progress = max(0, min(100, int(progress)))
+            if total_frames is not None:
+                self.total_frames = int(total_frames)
+            if frames is not None:
+                self.frames = int(frames)
+                elapsed = time.time() - (self.started_at or self.created_at)
+                if elapsed > 0 and self.frames > 0:
+                    self.fps = self.frames / elapsed
+                    if self.total_frames > self.frames:
+                        self.eta_seconds = (self.total_frames - self.frames) / self.fps
+                    else:
+                        self.eta_seconds = 0.0
+            self._notificar()
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                'id': self.id,
+                'state': self.state,
+                'progress': self.progress,
+                'frames': self.frames,
+                'total_frames': self.total_frames,
+                'fps': round(self.fps, 2),
+                'eta_seconds': round(self.eta_seconds, 1) if self.eta_seconds is not None else None,
+                'repeticiones': self.repeticiones,
+            }
+            data.update(self.meta)
+            if self.state == 'done' and isinstance(self.result, dict):
+                data.update(self.result)
+            elif self.state == 'error':
+                data['message'] = self.error
+            return data
+
+
+class LocalJobBackend:
+    """Backend en proceso: cola FIFO acotada + registro de trabajos en memoria.
+
+    Otro backend (p. ej. Redis) solo necesita implementar put/get/save/load/delete/items.
+    """
+
+    def __init__(self, max_pending=32):
+        self._queue = _queue.Queue(maxsize=max(1, int(max_pending)))
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        try:
+            self._queue.put_nowait(job.id)
+        except _queue.Full:
+            raise QueueFullError('Cola de análisis llena')
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except _queue.Empty:
+            return None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+
+    def load(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def items(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+
+class JobManager:
+    """Pool acotado de workers que drena la cola de trabajos de análisis."""
+
+    def __init__(self, backend=None, workers=None, ttl=None):
+        self.backend = backend
+        self.workers = workers
+        self.ttl = ttl
+        self.app = None
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        if self.workers is None:
+            # Por defecto tantos workers como analizadores en el pool
+            self.workers = int(os.environ.get('ANALYSIS_WORKERS', os.environ.get('ANALYZER_POOL_SIZE', str(os.cpu_count() or 1))))
+        if self.ttl is None:
+            self.ttl = int(os.environ.get('JOB_TTL', os.environ.get('ANALYSIS_CACHE_TTL', '600')))
+        if self.backend is None:
+            self.backend = LocalJobBackend(max_pending=int(os.environ.get('JOB_QUEUE_MAX', '32')))
+        app.extensions['jobs'] = self
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(max(1, int(self.workers or 1))):
+                t = threading.Thread(target=self._worker_loop, name=f'analysis-worker-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, fn, *args, meta=None, **kwargs):
+        """Encola fn(job, *args, **kwargs) y devuelve el Job sin esperar."""
+        if self.backend is None:
+            raise RuntimeError('JobManager sin inicializar (llama a init_app)')
+        self._ensure_started()
+        self.purge_expired()
+        job = Job(fn, args, kwargs, meta=meta)
+        self.backend.save(job)
+        try:
+            self.backend.put(job)
+        except QueueFullError:
+            self.backend.delete(job.id)
+            raise
+        return job
+
+    def get(self, job_id):
+        if self.backend is None:
+            return None
+        return self.backend.load(job_id)
+
+    def latest(self):
+        jobs = self.backend.items() if self.backend is not None else []
+        return max(jobs, key=lambda j: j.created_at) if jobs else None
+
+    def counts(self):
+        jobs = self.backend.items() if self.backend is not None else []
+        out = {'queued': 0, 'running': 0, 'done': 0, 'error': 0}
+        for j in jobs:
+            out[j.state] = out.get(j.state, 0) + 1
+        return out
+
+    def purge_expired(self):
+        now = time.time()
+        for job in self.backend.items():
+            if job.finished_at and now - job.finished_at > self.ttl:
+                self.backend.delete(job.id)
+
+    def _worker_loop(self):
+        while True:
+            job_id = self.backend.get(timeout=1.0)
+            if job_id is None:
+                continue
+            job = self.backend.load(job_id)
+            if job is None:
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job.started_at = time.time()
+        espera_cola.observe(job.started_at - job.created_at)
+        job.set_state('running')
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = job.fn(job, *job.args, **job.kwargs)
+            else:
+                result = job.fn(job, *job.args, **job.kwargs)
+            job.result = result
+            job.update(progress=100)
+            job.finished_at = time.time()
+            job.set_state('done')
+        except Exception as e:
+            print(f"Error en trabajo {job.id}: {e}")
+            job.error = 'Error al analizar el video'
+            job.finished_at = time.time()
+            job.set_state('error')
+        finally:
+            trabajos_terminados.inc(job.state)
+            # Liberar referencias a argumentos (rutas temporales, etc.)
+            job.args = (); job.kwargs = {}
+
+
+# Instancia unica
+jobs = JobManager()
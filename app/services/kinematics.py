@@ -0,0 +1,155 @@
+import math
+import numpy as np
+
+# Índices de landmarks de MediaPipe Pose (mp.solutions.pose.PoseLandmark)
+NARIZ = 0
+OREJA_IZQ, OREJA_DER = 7, 8
+HOMBRO_IZQ, HOMBRO_DER = 11, 12
+CODO_IZQ, CODO_DER = 13, 14
+MUNECA_IZQ, MUNECA_DER = 15, 16
+CADERA_IZQ, CADERA_DER = 23, 24
+RODILLA_IZQ, RODILLA_DER = 25, 26
+TOBILLO_IZQ, TOBILLO_DER = 27, 28
+
+# Ángulos articulares (extremo, vértice, extremo) calculados en el plano de la imagen
+ANGULOS_ARTICULARES = {
+    'rodilla_izq': (CADERA_IZQ, RODILLA_IZQ, TOBILLO_IZQ),
+    'rodilla_der': (CADERA_DER, RODILLA_DER, TOBILLO_DER),
+    'codo_izq': (HOMBRO_IZQ, CODO_IZQ, MUNECA_IZQ),
+    'codo_der': (HOMBRO_DER, CODO_DER, MUNECA_DER),
+}
+
+_NOMBRES = list(ANGULOS_ARTICULARES)
+_TRIADAS = np.array([ANGULOS_ARTICULARES[n] for n in _NOMBRES])
+
+
+def _xy(track):
+    """(..., 33, 4) -> (..., 33, 2) en float64 (mismo redondeo que la ruta escalar con floats de Python)."""
+    return np.asarray(track, dtype=np.float64)[..., :2]
+
+
+def _producto(u, v):
+    """Producto escalar 2D sobre el último eje."""
+    return u[..., 0] * v[..., 0] + u[..., 1] * v[..., 1]
+
+
+def angulos_articulares(track):
+    """
+    Todos los ángulos de ANGULOS_ARTICULARES en grados, para un frame (33, 4) o un track
+    (frames, 33, 4). Devuelve {nombre: ndarray (...)}; NaN donde falta algún punto.
+    """
+    xy = _xy(track)
+    a = xy[..., _TRIADAS[:, 0], :]
+    b = xy[..., _TRIADAS[:, 1], :]
+    c = xy[..., _TRIADAS[:, 2], :]
+    ba = a - b
+    bc = c - b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coseno = _producto(ba, bc) / (np.sqrt(_producto(ba, ba)) * np.sqrt(_producto(bc, bc)))
+        angulos = np.degrees(np.arccos(np.clip(coseno, -1.0, 1.0)))
+    return {nombre: angulos[..., i] for i, nombre in enumerate(_NOMBRES)}
+
+
+def inclinacion_torso(track, hombro=HOMBRO_DER, cadera=CADERA_DER):
+    """
+    Ángulo del torso (cadera -> hombro) respecto a la vertical, sin suavizar.
+    0° = torso recto, mayor = más inclinado. NaN si faltan puntos o el torso es degenerado.
+    """
+    xy = _xy(track)
+    vx = xy[..., hombro, 0] - xy[..., cadera, 0]
+    vy = xy[..., hombro, 1] - xy[..., cadera, 1]  # en MediaPipe y aumenta hacia abajo
+    norma = np.sqrt(vx * vx + vy * vy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coseno = np.clip(-vy / norma, -1.0, 1.0)
+        angulo = np.degrees(np.arccos(coseno))
+    return np.where(norma < 1e-6, np.nan, angulo)
+
+
+def flexion_toracolumbar(track, min_visibilidad=0.5):
+    """
+    Proxy de flexión torácica: diferencia angular entre el tronco (cadera media -> hombro medio)
+    y el cuello (hombro medio -> cabeza). La cabeza es la media de las orejas visibles o, si
+    no hay ninguna, la nariz. Sin suavizar; 0 = alineado, mayor = más flexión anterior.
+    """
+    arr = np.asarray(track, dtype=np.float64)
+    xy = arr[..., :2]
+    hombro = (xy[..., HOMBRO_IZQ, :] + xy[..., HOMBRO_DER, :]) / 2
+    cadera = (xy[..., CADERA_IZQ, :] + xy[..., CADERA_DER, :]) / 2
+
+    orejas = xy[..., [OREJA_IZQ, OREJA_DER], :]
+    visibles = arr[..., [OREJA_IZQ, OREJA_DER], 3] > min_visibilidad
+    n_visibles = visibles.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_orejas = np.where(visibles[..., None], orejas, 0.0).sum(axis=-2) / n_visibles[..., None]
+    cabeza = np.where((n_visibles > 0)[..., None], media_orejas, xy[..., NARIZ, :])
+
+    def _unitario(v):
+        n = np.sqrt(_producto(v, v))[..., None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 1e-6, v / n, 0.0)
+
+    tronco = _unitario(hombro - cadera)
+    cuello = _unitario(cabeza - hombro)
+    angulo = np.degrees(np.arccos(np.clip(_producto(tronco, cuello), -1.0, 1.0)))
+    # Sin persona (NaN) no hay flexión que medir
+    return np.where(np.isnan(hombro[..., 0]) | np.isnan(cadera[..., 0]), np.nan, angulo)
+
+
+def calcular_cinematica(track, flexion=False):
+    """
+    Serie cinemática completa de un track (frames, 33, 4) o de un frame (33, 4):
+    ángulos articulares e inclinación del torso ('torso'); con flexion=True también el
+    proxy de flexión ('flexion'), que ningún analizador usa y cuesta tanto como el resto.
+    """
+    cinematica = angulos_articulares(track)
+    cinematica['torso'] = inclinacion_torso(track)
+    if flexion:
+        cinematica['flexion'] = flexion_toracolumbar(track)
+    return cinematica
+
+
+def _acos(x):
+    # np.arccos y no math.acos: difieren en el último bit en ~1 de cada 10 valores y los
+    # umbrales de los analizadores deben dar lo mismo que la ruta vectorizada
+    return float(np.arccos(x))
+
+
+def _angulo(ax, ay, bx, by, cx, cy):
+    """Ángulo en b (grados) con las mismas operaciones en float64 que angulos_articulares."""
+    bax, bay = ax - bx, ay - by
+    bcx, bcy = cx - bx, cy - by
+    try:
+        coseno = (bax * bcx + bay * bcy) / (math.sqrt(bax * bax + bay * bay) * math.sqrt(bcx * bcx + bcy * bcy))
+    except ZeroDivisionError:
+        return None
+    if coseno != coseno:
+        return None
+    return math.degrees(_acos(min(1.0, max(-1.0, coseno))))
+
+
+def cinematica_frame_rapida(puntos):
+    """
+    cinematica_frame(calcular_cinematica(puntos)) para UN frame (33, 4) con aritmética escalar:
+    en el camino por frame, numpy sobre arrays de 2-4 elementos cuesta ~100 µs solo en overhead.
+    """
+    xy = puntos[:, :2].tolist()
+    valores = {}
+    for nombre, (a, b, c) in ANGULOS_ARTICULARES.items():
+        valores[nombre] = _angulo(*xy[a], *xy[b], *xy[c])
+    (hx, hy), (cx, cy) = xy[HOMBRO_DER], xy[CADERA_DER]
+    vx, vy = hx - cx, hy - cy
+    norma = math.sqrt(vx * vx + vy * vy)
+    if norma < 1e-6 or norma != norma:
+        valores['torso'] = None
+    else:
+        valores['torso'] = math.degrees(_acos(min(1.0, max(-1.0, -vy / norma))))
+    return valores
+
+
+def cinematica_frame(cinematica, indice=None):
+    """Valores de un frame como floats de Python (None donde no hay dato)."""
+    valores = {}
+    for nombre, serie in cinematica.items():
+        valor = float(serie if indice is None else serie[indice])
+        valores[nombre] = None if np.isnan(valor) else valor
+    return valores
@@ -0,0 +1,47 @@
+from collections import namedtuple
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+# Un landmark normalizado con la misma interfaz que el protobuf de MediaPipe (x, y, z, visibility)
+Punto = namedtuple('Punto', ['x', 'y', 'z', 'visibility'])
+
+NUM_LANDMARKS = 33
+
+
+def landmarks_a_array(pose_landmarks):
+    """NormalizedLandmarkList de MediaPipe -> ndarray float32 (33, 4) [x, y, z, visibility]."""
+    if not pose_landmarks:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark], dtype=np.float32)
+
+
+def array_a_landmarks(arr):
+    """ndarray (33, 4) -> lista indexable de Punto, utilizable por los analizadores."""
+    return [Punto(*map(float, fila)) for fila in arr]
+
+
+def array_a_proto(arr):
+    """ndarray (33, 4) -> NormalizedLandmarkList (para mp_drawing.draw_landmarks)."""
+    lista = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, v in arr:
+        lista.landmark.add(x=float(x), y=float(y), z=float(z), visibility=float(v))
+    return lista
+
+
+def interpolar(a, b, t):
+    """
+    Interpolación lineal entre dos keyframes de landmarks (t en [0, 1]).
+    Si falta alguno de los dos, no se inventa una pose: devuelve None.
+    """
+    if a is None or b is None:
+        return None
+    return (a + (b - a) * np.float32(t)).astype(np.float32)
+
+
+def apilar_track(frames):
+    """Lista de (33, 4) o None por frame -> ndarray float32 (frames, 33, 4) con NaN donde no hubo persona."""
+    track = np.full((len(frames), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    for i, puntos in enumerate(frames):
+        if puntos is not None:
+            track[i] = puntos
+    return track
@@ -0,0 +1,261 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from app.services.analyzer import analyzer_pool, umbrales_reps, resolver_calidad
+from app.services.landmarks import landmarks_a_array
+
+
+class LiveSessionError(Exception):
+    """Petición inválida sobre una sesión en vivo (frame ilegible, sin analizadores libres...)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def decodificar_frame(data, mimetype=None, width=None, height=None):
+    """
+    Frame BGR a partir del cuerpo de la petición: JPEG/PNG (cv2.imdecode) o BGR crudo
+    (application/octet-stream, requiere width y height).
+    """
+    if mimetype == 'application/octet-stream':
+        if not width or not height or len(data) != width * height * 3:
+            raise LiveSessionError('Frame crudo inválido: se esperan width*height*3 bytes BGR')
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise LiveSessionError('No se pudo decodificar el frame (JPEG/PNG)')
+    return frame
+
+
+class LiveSession:
+    """
+    Sesión de coaching en vivo: un analizador del pool en exclusiva (tracking de MediaPipe y
+    máquinas de estado de repeticiones continuas) y un hilo que procesa siempre el frame más
+    reciente. Si el cliente envía más rápido de lo que se infiere, el frame pendiente se
+    reemplaza (descartado) en vez de acumular cola: la latencia no crece con el tiempo.
+    """
+
+    def __init__(self, analizador, tipo_ejercicio, umbrales, objetivo_ms, idle_timeout, on_close=None):
+        self.id = uuid.uuid4().hex
+        self.tipo_ejercicio = tipo_ejercicio
+        self.objetivo_ms = objetivo_ms
+        self.idle_timeout = idle_timeout
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.cerrada = False
+        self.recibidos = 0
+        self.procesados = 0
+        self.descartados = 0
+        self.ultimo = None  # último resultado publicado
+        self.version = 0
+        self._analizador = analizador
+        self._sesion = analizador.nueva_sesion()
+        self._sesion.umbrales = umbrales
+        self._pendiente = None
+        self._inicio = None
+        self._latencias = deque(maxlen=int(os.environ.get('LIVE_LATENCY_WINDOW', '300')))
+        self._on_close = on_close
+        self._cond = threading.Condition()
+        self._hilo = threading.Thread(target=self._procesar, name=f'live-{self.id[:8]}', daemon=True)
+        self._hilo.start()
+
+    # --- entrada -------------------------------------------------------------------------
+
+    def enviar(self, data, mimetype=None, width=None, height=None, timestamp=None, client_ts=None):
+        """Deja el frame como pendiente (reemplaza al anterior si aún no se procesó). Devuelve su seq."""
+        with self._cond:
+            if self.cerrada:
+                raise LiveSessionError('La sesión está cerrada', status=410)
+            if self._pendiente is not None:
+                self.descartados += 1
+            self.recibidos += 1
+            self._pendiente = {
+                'seq': self.recibidos, 'data': data, 'mimetype': mimetype, 'width': width, 'height': height,
+                'timestamp': timestamp, 'client_ts': client_ts, 'recibido': time.perf_counter(),
+            }
+            self.updated_at = time.time()
+            self._cond.notify_all()
+            return self.recibidos
+
+    # --- procesamiento ---------------------------------------------------------------------
+
+    def _siguiente(self):
+        with self._cond:
+            while self._pendiente is None and not self.cerrada:
+                if not self._cond.wait(self.idle_timeout) and self._pendiente is None:
+                    print(f"[LIVE] Sesión {self.id[:8]} inactiva: se cierra")
+                    self.cerrada = True
+            pendiente, self._pendiente = self._pendiente, None
+            return None if self.cerrada else pendiente
+
+    def _procesar(self):
+        try:
+            while True:
+                pendiente = self._siguiente()
+                if pendiente is None:
+                    break
+                try:
+                    resultado = self._analizar(pendiente)
+                except LiveSessionError as e:
+                    resultado = {'seq': pendiente['seq'], 'error': str(e)}
+                self._publicar(resultado)
+        except Exception as e:
+            print(f"[LIVE][ERROR] {e}")
+        finally:
+            self._liberar()
+
+    def _analizar(self, pendiente):
+        frame = decodificar_frame(pendiente['data'], pendiente['mimetype'], pendiente['width'], pendiente['height'])
+        analizador = self._analizador
+        height, width = frame.shape[:2]
+        tamano = analizador.resolver_tamano_inferencia(width, height)
+        entrada = cv2.resize(frame, tamano, interpolation=cv2.INTER_AREA) if tamano is not None else frame
+        t0 = time.perf_counter()
+        puntos = landmarks_a_array(analizador.pose.process(cv2.cvtColor(entrada, cv2.COLOR_BGR2RGB)).pose_landmarks)
+        inferencia_ms = (time.perf_counter() - t0) * 1000
+
+        # Tiempo del frame según el cliente (s); si no lo manda, reloj del servidor desde el primer frame
+        timestamp = pendiente['timestamp']
+        if timestamp is None:
+            if self._inicio is None:
+                self._inicio = pendiente['recibido']
+            timestamp = pendiente['recibido'] - self._inicio
+
+        resultado = {'seq': pendiente['seq'], 'persona': puntos is not None}
+        if puntos is not None:
+            analisis = analizador._analizar_frame(self._sesion, self.tipo_ejercicio, puntos, frame.shape, timestamp)
+            feedback_data = analisis['feedback_data']
+            resultado.update({
+                'score': feedback_data['score'],
+                'feedback': feedback_data['feedback'],
+            })
+        resultado.update({
+            'repeticiones': self._sesion.repeticiones,
+            'estado': self._sesion.estado,
+            'inferencia_ms': round(inferencia_ms, 1),
+            'latencia_ms': round((time.perf_counter() - pendiente['recibido']) * 1000, 1),
+            'descartados': self.descartados,
+        })
+        if pendiente['client_ts'] is not None:
+            # Eco del reloj del cliente: con él mide la latencia extremo a extremo
+            resultado['client_ts'] = pendiente['client_ts']
+        return resultado
+
+    def _publicar(self, resultado):
+        with self._cond:
+            if 'latencia_ms' in resultado:
+                self.procesados += 1
+                self._latencias.append(resultado['latencia_ms'])
+            self.ultimo = resultado
+            self.version += 1
+            self._cond.notify_all()
+
+    def _liberar(self):
+        with self._cond:
+            self.cerrada = True
+            self.version += 1
+            self._cond.notify_all()
+        if self._analizador is not None:
+            analyzer_pool.liberar(self._analizador)
+            self._analizador = None
+        if self._on_close:
+            self._on_close(self)
+
+    # --- salida ----------------------------------------------------------------------------
+
+    def wait(self, version, timeout=None):
+        """Bloquea hasta que haya un resultado posterior a `version` (o timeout). Devuelve la versión actual."""
+        with self._cond:
+            if self.version <= version and not self.cerrada:
+                self._cond.wait(timeout)
+            return self.version
+
+    def close(self):
+        with self._cond:
+            self.cerrada = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            latencias = np.asarray(self._latencias, dtype=np.float64)
+            datos = {
+                'session_id': self.id,
+                'exercise_type': self.tipo_ejercicio,
+                'closed': self.cerrada,
+                'frames_recibidos': self.recibidos,
+                'frames_procesados': self.procesados,
+                'frames_descartados': self.descartados,
+                'repeticiones': self._sesion.repeticiones,
+                'objetivo_latencia_ms': self.objetivo_ms,
+            }
+        if latencias.size:
+            p50, p95 = np.percentile(latencias, [50, 95])
+            datos.update({
+                'latencia_p50_ms': round(float(p50), 1),
+                'latencia_p95_ms': round(float(p95), 1),
+                'dentro_objetivo': round(float(np.mean(latencias <= self.objetivo_ms)), 3),
+            })
+        return datos
+
+
+class LiveSessionManager:
+    """Registro de sesiones en vivo: cada una retiene un analizador del pool mientras está abierta."""
+
+    def __init__(self, max_sessions=None, objetivo_ms=None, idle_timeout=None):
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.environ.get('LIVE_MAX_SESSIONS', '2'))
+        self.objetivo_ms = objetivo_ms if objetivo_ms is not None else float(os.environ.get('LIVE_TARGET_LATENCY_MS', '150'))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.environ.get('LIVE_IDLE_TIMEOUT', '30'))
+        self._sessions = {}
+        self._reservadas = 0  # plazas apartadas mientras se adquiere el analizador
+        self._lock = threading.Lock()
+
+    def create(self, tipo_ejercicio, calidad=None, umbrales=None):
+        try:
+            calidad = resolver_calidad(calidad)
+            umbrales = umbrales_reps(tipo_ejercicio, umbrales)
+        except (TypeError, ValueError) as e:
+            raise LiveSessionError(f'Parámetro inválido: {e}')
+        # La plaza se reserva bajo el lock y se mantiene durante la espera del pool, para que
+        # dos creaciones simultáneas no superen max_sessions
+        with self._lock:
+            if len(self._sessions) + self._reservadas >= self.max_sessions:
+                raise LiveSessionError('Demasiadas sesiones en vivo abiertas', status=503)
+            self._reservadas += 1
+        analizador = None
+        try:
+            analizador = analyzer_pool.adquirir(calidad, timeout=float(os.environ.get('LIVE_ACQUIRE_TIMEOUT', '5')))
+            session = LiveSession(analizador, tipo_ejercicio, umbrales, self.objetivo_ms, self.idle_timeout,
+                                  on_close=self._quitar)
+        except BaseException as e:
+            if analizador is not None:
+                analyzer_pool.liberar(analizador)
+            with self._lock:
+                self._reservadas -= 1
+            if isinstance(e, TimeoutError):
+                raise LiveSessionError('No hay analizadores libres; reintenta en unos segundos', status=503)
+            raise
+        with self._lock:
+            self._reservadas -= 1
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _quitar(self, session):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+# Instancia unica
+live_sessions = LiveSessionManager()
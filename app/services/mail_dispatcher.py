@@ -0,0 +1,160 @@
+import os
+import ssl
+import time
+import heapq
+import smtplib
+import threading
+import itertools
+
+
+class MailQueueFullError(Exception):
+    """La cola de correos salientes alcanzó su capacidad máxima."""
+
+
+class MailDispatcher:
+    """
+    Envío de correos en segundo plano: las peticiones solo encolan el mensaje y un hilo
+    los manda reutilizando una única conexión SMTP autenticada (STARTTLS + login una vez).
+
+    - La conexión se cierra tras MAIL_IDLE_TIMEOUT segundos sin enviar y se reabre sola
+      si el servidor la corta.
+    - Un envío fallido se reintenta con backoff exponencial (MAIL_RETRY_BASE * 2^n) hasta
+      MAIL_MAX_RETRIES veces.
+    - La cola vive en memoria: lo pendiente se pierde si el proceso termina.
+    """
+
+    def __init__(self, host=None, port=None, user=None, password=None, starttls=None,
+                 max_pending=None, max_retries=None, retry_base=None, idle_timeout=None, timeout=None):
+        self.host = host or os.getenv('SMTP_HOST', 'smtp.gmail.com')
+        self.port = port or int(os.getenv('SMTP_PORT', '587'))
+        self.user = user if user is not None else os.getenv('SMTP_USER')
+        self.password = password if password is not None else os.getenv('SMTP_PASS')
+        self.starttls = starttls if starttls is not None else os.getenv('SMTP_STARTTLS', '1') == '1'
+        self.max_pending = max_pending or int(os.getenv('MAIL_QUEUE_MAX', '1000'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('MAIL_MAX_RETRIES', '5'))
+        self.retry_base = retry_base if retry_base is not None else float(os.getenv('MAIL_RETRY_BASE', '2'))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv('MAIL_IDLE_TIMEOUT', '60'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('SMTP_TIMEOUT', '20'))
+        self._cola = []  # heap de (listo_en, orden, intento, mensaje)
+        self._orden = itertools.count()
+        self._cond = threading.Condition()
+        self._smtp = None
+        self._ultimo_uso = 0.0
+        self._thread = None
+        self.stats_data = {'sent': 0, 'failed': 0, 'retries': 0, 'connections': 0}
+
+    @property
+    def configurado(self):
+        return bool(self.user and self.password)
+
+    def enviar(self, msg):
+        """Encola un EmailMessage y vuelve de inmediato."""
+        with self._cond:
+            if len(self._cola) >= self.max_pending:
+                raise MailQueueFullError('Cola de correos llena')
+            heapq.heappush(self._cola, (time.monotonic(), next(self._orden), 0, msg))
+            self._cond.notify()
+        self._iniciar()
+
+    def pending(self):
+        with self._cond:
+            return len(self._cola)
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='mail-dispatcher', daemon=True)
+                self._thread.start()
+
+    # --- conexión ----------------------------------------------------------------------------
+
+    def _conexion(self):
+        if self._smtp is not None and time.monotonic() - self._ultimo_uso > self.idle_timeout:
+            self._cerrar()
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo_or_helo_if_needed()
+                # Un servidor de pruebas local (sin AUTH) acepta el correo sin login
+                if self.user and self.password and smtp.has_extn('auth'):
+                    smtp.login(self.user, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self.stats_data['connections'] += 1
+        return self._smtp
+
+    def _cerrar(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+        self._smtp = None
+
+    def _mandar(self, msg):
+        try:
+            self._conexion().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # La conexión reutilizada caducó en el servidor: reabrir una vez en el acto
+            self._smtp = None
+            self._conexion().send_message(msg)
+        self._ultimo_uso = time.monotonic()
+
+    # --- hilo --------------------------------------------------------------------------------
+
+    def _siguiente(self):
+        """Siguiente mensaje listo; mientras espera, cierra la conexión si queda ociosa."""
+        while True:
+            with self._cond:
+                ahora = time.monotonic()
+                if self._cola and self._cola[0][0] <= ahora:
+                    _, _, intento, msg = heapq.heappop(self._cola)
+                    return intento, msg
+                espera = self._cola[0][0] - ahora if self._cola else None
+                ocioso = None
+                if self._smtp is not None:
+                    ocioso = self._ultimo_uso + self.idle_timeout - ahora
+                    if ocioso > 0:
+                        espera = ocioso if espera is None else min(espera, ocioso)
+                if ocioso is None or ocioso > 0:
+                    self._cond.wait(espera)
+                    continue
+            # QUIT fuera del lock: enviar() no debe esperar a la red
+            self._cerrar()
+
+    def _loop(self):
+        while True:
+            intento, msg = self._siguiente()
+            try:
+                self._mandar(msg)
+                self.stats_data['sent'] += 1
+            except Exception as e:
+                self._cerrar()
+                if intento < self.max_retries:
+                    espera = self.retry_base * (2 ** intento)
+                    print(f"[MAIL][WARN] Falló el envío a {msg['To']} ({e}); reintento en {espera:.0f}s")
+                    self.stats_data['retries'] += 1
+                    with self._cond:
+                        heapq.heappush(self._cola, (time.monotonic() + espera, next(self._orden), intento + 1, msg))
+                else:
+                    print(f"[MAIL][ERROR] Descartado correo a {msg['To']} tras {intento + 1} intentos: {e}")
+                    self.stats_data['failed'] += 1
+
+    def stats(self):
+        data = dict(self.stats_data)
+        data['pending'] = self.pending()
+        return data
+
+
+# Instancia unica
+mail_dispatcher = MailDispatcher()
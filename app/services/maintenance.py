@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+from sqlalchemy import select
+from app.extensions import db
+from app.models import SessionToken, PasswordResetToken, Analysis
+
+
+def reset_token_ttl():
+    return int(os.environ.get('RESET_TOKEN_TTL', '3600'))
+
+
+class DbMaintenance:
+    """
+    Limpieza periódica de tokens caducados (sesiones por `exp`, reset de contraseña por
+    `created_at` + RESET_TOKEN_TTL). Borra por lotes de MAINTENANCE_BATCH_SIZE filas con un
+    commit por lote, así ninguna transacción bloquea la tabla mucho tiempo (SQLite bloquea
+    la base entera mientras escribe).
+    """
+
+    def __init__(self, interval=None, batch_size=None, max_batches=None, pause=None):
+        # Los valores no pasados se leen del entorno en init_app (después de load_dotenv)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause = pause
+        self.app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'runs': 0,
+            'last_run_at': None,
+            'last_run_seconds': None,
+            'purged_total': {'sessions': 0, 'password_reset_tokens': 0},
+            'purged_last_run': {'sessions': 0, 'password_reset_tokens': 0},
+            'purge_rate_per_s': None,
+            'table_rows': {'sessions': None, 'password_reset_tokens': None},
+        }
+
+    def init_app(self, app):
+        self.app = app
+        if self.interval is None:
+            self.interval = float(os.environ.get('MAINTENANCE_INTERVAL', '300'))
+        if self.batch_size is None:
+            self.batch_size = int(os.environ.get('MAINTENANCE_BATCH_SIZE', '1000'))
+        if self.max_batches is None:
+            self.max_batches = int(os.environ.get('MAINTENANCE_MAX_BATCHES', '100'))
+        if self.pause is None:
+            self.pause = float(os.environ.get('MAINTENANCE_BATCH_PAUSE', '0.05'))
+        with app.app_context():
+            self.ensure_indexes()
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='db-maintenance', daemon=True)
+            self._thread.start()
+        app.extensions['db_maintenance'] = self
+
+    def ensure_indexes(self):
+        """Crea los índices declarados en los modelos que falten (create_all no toca tablas existentes)."""
+        for table in (SessionToken.__table__, PasswordResetToken.__table__, Analysis.__table__):
+            for index in table.indexes:
+                try:
+                    index.create(bind=db.engine, checkfirst=True)
+                except Exception as e:
+                    print(f"[MAINTENANCE][ERROR] Índice {index.name}: {e}")
+
+    def _purge(self, model, key, condition):
+        """Borra por lotes las filas que cumplen `condition`. Devuelve cuántas se borraron."""
+        total = 0
+        for _ in range(max(1, self.max_batches)):
+            lote = select(key).where(condition).limit(self.batch_size)
+            borradas = model.query.filter(key.in_(lote)).delete(synchronize_session=False)
+            db.session.commit()
+            total += borradas
+            if borradas < self.batch_size:
+                break
+            time.sleep(self.pause)  # dejar pasar a las escrituras de las peticiones
+        return total
+
+    def purge_sessions(self, now=None):
+        now = int(now if now is not None else time.time())
+        return self._purge(SessionToken, SessionToken.token, SessionToken.exp < now)
+
+    def purge_reset_tokens(self, now=None):
+        now = int(now if now is not None else time.time())
+        return self._purge(PasswordResetToken, PasswordResetToken.token,
+                           PasswordResetToken.created_at < now - reset_token_ttl())
+
+    def run_once(self):
+        t0 = time.perf_counter()
+        try:
+            sesiones = self.purge_sessions()
+            resets = self.purge_reset_tokens()
+            filas = {
+                'sessions': SessionToken.query.count(),
+                'password_reset_tokens': PasswordResetToken.query.count(),
+            }
+        except Exception:
+            db.session.rollback()
+            raise
+        segundos = time.perf_counter() - t0
+        with self._lock:
+            stats = self._stats
+            stats['runs'] += 1
+            stats['last_run_at'] = int(time.time())
+            stats['last_run_seconds'] = round(segundos, 3)
+            stats['purged_last_run'] = {'sessions': sesiones, 'password_reset_tokens': resets}
+            stats['purged_total']['sessions'] += sesiones
+            stats['purged_total']['password_reset_tokens'] += resets
+            stats['purge_rate_per_s'] = round((sesiones + resets) / segundos, 1) if segundos > 0 else None
+            stats['table_rows'] = filas
+        if sesiones or resets:
+            print(f"[MAINTENANCE] Purgados {sesiones} sesiones y {resets} tokens de reset en {segundos:.2f}s")
+        return sesiones, resets
+
+    def _loop(self):
+        while True:
+            time.sleep(max(1.0, self.interval))
+            # La sesión de SQLAlchemy se libera al cerrar el app context
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"[MAINTENANCE][ERROR] {e}")
+
+    def stats(self):
+        """Métricas de la última pasada (no consulta la base)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['purged_total'] = dict(stats['purged_total'])
+            return stats
+
+
+# Instancia unica
+db_maintenance = DbMaintenance()
@@ -0,0 +1,245 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class MediaEntry:
+    """Un resultado servible por /media: en memoria (data) o volcado a disco (path)."""
+    __slots__ = ('name', 'data', 'path', 'size', 'mime', 'encoding', 'exp', 'volcando')
+
+    def __init__(self, name, size, mime, encoding, exp, data=None, path=None):
+        self.name = name
+        self.data = data
+        self.path = path
+        self.size = size
+        self.mime = mime
+        self.encoding = encoding
+        self.exp = exp
+        self.volcando = False  # elegida para volcarse a disco (escritura en curso fuera del lock)
+
+    @property
+    def en_memoria(self):
+        return self.data is not None
+
+
+class MediaStore:
+    """
+    Almacén de resultados con presupuesto de bytes en memoria y expulsión LRU.
+
+    - Lo que supera MEDIA_SPILL_BYTES (o no cabe en MEDIA_STORE_MAX_BYTES) vive en un
+      archivo temporal; al pasarse del presupuesto, las entradas menos usadas se vuelcan a disco.
+    - El disco tiene su propio límite (MEDIA_DISK_MAX_BYTES): ahí sí se descartan las más viejas.
+    - Un hilo barredor elimina los expirados cada MEDIA_SWEEP_INTERVAL segundos.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, spill_bytes=None, disk_max_bytes=None, sweep_interval=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # nombre -> MediaEntry (orden LRU: último = más reciente)
+        self._mem_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._configurado = False
+
+    def _configurar(self):
+        if self._configurado:
+            return
+        if self.directory is None:
+            self.directory = os.environ.get('MEDIA_STORE_DIR', os.path.join(tempfile.gettempdir(), 'posturepro_media'))
+        if self.max_bytes is None:
+            self.max_bytes = int(os.environ.get('MEDIA_STORE_MAX_BYTES', str(256 * 1024 * 1024)))
+        if self.spill_bytes is None:
+            self.spill_bytes = int(os.environ.get('MEDIA_SPILL_BYTES', str(16 * 1024 * 1024)))
+        if self.disk_max_bytes is None:
+            self.disk_max_bytes = int(os.environ.get('MEDIA_DISK_MAX_BYTES', str(4 * 1024 * 1024 * 1024)))
+        if self.sweep_interval is None:
+            self.sweep_interval = float(os.environ.get('MEDIA_SWEEP_INTERVAL', '30'))
+        os.makedirs(self.directory, exist_ok=True)
+        self._configurado = True
+
+    def init_app(self, app):
+        self._configurar()
+        self._iniciar_barredor()
+        app.extensions['media_store'] = self
+
+    # --- escritura -------------------------------------------------------------------------
+
+    def put(self, name, data=None, path=None, mime='video/mp4', ttl=600, encoding=None):
+        """
+        Registra un resultado a partir de bytes (data) o de un archivo ya escrito (path).
+        Con path el archivo se mueve al almacén (sin leerlo) si es grande; si es pequeño se
+        carga en memoria y se borra.
+        """
+        self._configurar()
+        self._iniciar_barredor()
+        exp = time.time() + max(1, int(ttl))
+        if path is not None:
+            size = os.path.getsize(path)
+            if size > self.spill_bytes or size > self.max_bytes:
+                destino = self._ruta_nueva()
+                shutil.move(path, destino)
+                entry = MediaEntry(name, size, mime, encoding, exp, path=destino)
+            else:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.unlink(path)
+                entry = MediaEntry(name, size, mime, encoding, exp, data=data)
+        else:
+            size = len(data)
+            if size > self.spill_bytes or size > self.max_bytes:
+                entry = MediaEntry(name, size, mime, encoding, exp, path=self._escribir(data))
+            else:
+                entry = MediaEntry(name, size, mime, encoding, exp, data=data)
+        with self._lock:
+            self._quitar(name)
+            self._entries[name] = entry
+            self._contar(entry, +1)
+            victimas = self._elegir_volcado()
+            self._ajustar_disco()
+        self._volcar(victimas)
+        return entry
+
+    def _ruta_nueva(self):
+        return os.path.join(self.directory, uuid.uuid4().hex + '.bin')
+
+    def _escribir(self, data):
+        destino = self._ruta_nueva()
+        with open(destino, 'wb') as f:
+            f.write(data)
+        return destino
+
+    def _contar(self, entry, signo):
+        if entry.en_memoria:
+            self._mem_bytes += signo * entry.size
+        else:
+            self._disk_bytes += signo * entry.size
+
+    def _quitar(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        self._contar(entry, -1)
+        if entry.path:
+            # Si alguien lo está sirviendo, el descriptor abierto sigue siendo válido (POSIX)
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def _elegir_volcado(self):
+        """
+        (Con el lock) Entradas en memoria menos usadas a volcar a disco para entrar en el
+        presupuesto. Las que otro hilo ya está volcando cuentan como liberadas.
+        """
+        exceso = self._mem_bytes - self.max_bytes
+        victimas = []
+        for entry in self._entries.values():
+            if exceso <= 0:
+                break
+            if entry.en_memoria:
+                if not entry.volcando:
+                    entry.volcando = True
+                    victimas.append(entry)
+                exceso -= entry.size
+        return victimas
+
+    def _volcar(self, victimas):
+        """
+        Escribe las víctimas a disco sin el lock (get/put no esperan a la E/S) y después,
+        con el lock, pasa cada entrada a su archivo si sigue registrada.
+        """
+        for entry in victimas:
+            try:
+                destino = self._escribir(entry.data)
+            except OSError as e:
+                print(f"[MEDIA_STORE][ERROR] No se pudo volcar {entry.name}: {e}")
+                destino = None
+            with self._lock:
+                entry.volcando = False
+                if destino and self._entries.get(entry.name) is entry:
+                    self._contar(entry, -1)
+                    entry.path = destino  # path antes que data: quien lea data=None ya ve el archivo
+                    entry.data = None
+                    self._contar(entry, +1)
+                    destino = None
+                    self._ajustar_disco()
+            if destino:
+                # Reemplazada o expirada mientras se escribía
+                try:
+                    os.unlink(destino)
+                except OSError:
+                    pass
+
+    def _ajustar_disco(self):
+        # Disco: descartar las menos usadas
+        if self._disk_bytes > self.disk_max_bytes:
+            for name, entry in list(self._entries.items()):
+                if self._disk_bytes <= self.disk_max_bytes:
+                    break
+                if not entry.en_memoria:
+                    self._quitar(name)
+
+    # --- lectura ---------------------------------------------------------------------------
+
+    def get(self, name):
+        """Entrada vigente (y la marca como usada) o None."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if entry.exp < time.time():
+                self._quitar(name)
+                return None
+            self._entries.move_to_end(name)
+            return entry
+
+    # --- mantenimiento ---------------------------------------------------------------------
+
+    def sweep(self):
+        """Elimina las entradas expiradas. Devuelve cuántas se borraron."""
+        now = time.time()
+        with self._lock:
+            expirados = [name for name, e in self._entries.items() if e.exp < now]
+            for name in expirados:
+                self._quitar(name)
+        return len(expirados)
+
+    def _iniciar_barredor(self):
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._barrer, name='media-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _barrer(self):
+        while True:
+            time.sleep(max(1.0, self.sweep_interval))
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[MEDIA_STORE][ERROR] {e}")
+
+    def stats(self):
+        with self._lock:
+            en_memoria = sum(1 for e in self._entries.values() if e.en_memoria)
+            return {
+                'entries': len(self._entries),
+                'memory_entries': en_memoria,
+                'disk_entries': len(self._entries) - en_memoria,
+                'memory_bytes': self._mem_bytes,
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+# Instancia unica
+media_store = MediaStore()
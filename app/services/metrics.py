@@ -0,0 +1,231 @@
+import os
+import math
+import time
+import threading
+from bisect import bisect_left
+
+# Tramos (segundos) por tipo de medida
+TRAMOS_FRAME = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+TRAMOS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TRAMOS_TRABAJO = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+TRAMOS_FFMPEG = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+TRAMOS_CONSULTA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    """
+    Histograma acumulativo por combinación de etiquetas. observe() es un bisect y tres sumas
+    bajo un lock propio (~1 µs): apto para llamarse una vez por frame.
+    """
+
+    def __init__(self, registro, nombre, ayuda, etiquetas=(), tramos=TRAMOS_FRAME):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.tramos = tuple(sorted(tramos))
+        self._series = {}  # valores de etiquetas -> [conteos por tramo (+Inf al final), suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, valor, *etiquetas):
+        if not self.registro.habilitado:
+            return
+        i = bisect_left(self.tramos, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.tramos) + 1), 0.0, 0]
+            serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for valores, conteos, suma, total in sorted(series):
+            acumulado = 0
+            for limite, n in zip(self.tramos + (math.inf,), conteos):
+                acumulado += n
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {total}')
+        return lineas
+
+
+class Contador:
+    def __init__(self, registro, nombre, ayuda, etiquetas=()):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *etiquetas, cantidad=1):
+        if not self.registro.habilitado:
+            return
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        with self._lock:
+            valores = sorted(self._valores.items())
+        lineas += [f'{self.nombre}{_etiquetas(self.etiquetas, k)} {_numero(v)}' for k, v in valores]
+        return lineas
+
+
+class MedidorCallback:
+    """Gauge (o counter ya acumulado en otro servicio) que se lee solo al exponer: coste cero entre scrapes.
+    `leer` devuelve {tupla de valores de etiquetas: número}."""
+
+    def __init__(self, registro, nombre, ayuda, leer, etiquetas=(), tipo='gauge'):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.leer = leer
+        self.etiquetas = tuple(etiquetas)
+        self.tipo = tipo
+
+    def exponer(self):
+        try:
+            valores = self.leer()
+        except Exception as e:
+            print(f"[METRICS][ERROR] {self.nombre}: {e}")
+            return []
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        lineas += [f'{self.nombre}{_etiquetas(self.etiquetas, k)} {_numero(v)}'
+                   for k, v in sorted(valores.items()) if v is not None]
+        return lineas
+
+
+class RegistroMetricas:
+    """
+    Métricas del proceso en formato de texto de Prometheus (GET /api/metrics).
+
+    Cada worker de gunicorn (y cada proceso del análisis particionado) tiene su propio
+    registro: Prometheus debe raspar cada worker o agregarse por instancia. METRICS_ENABLED=0
+    convierte las observaciones en no-ops.
+    """
+
+    def __init__(self, habilitado=None):
+        # METRICS_ENABLED se lee en init_app (después de load_dotenv); hasta entonces se mide
+        self._habilitado = habilitado
+        self.habilitado = habilitado if habilitado is not None else True
+        self._metricas = []
+        self._lock = threading.Lock()
+
+    def _agregar(self, metrica):
+        # Mismo nombre = reemplazo (create_app puede llamarse más de una vez en el mismo proceso)
+        with self._lock:
+            self._metricas = [m for m in self._metricas if m.nombre != metrica.nombre] + [metrica]
+        return metrica
+
+    def init_app(self, app):
+        """Latencia de cada petición por blueprint (posturepro_http_request_seconds)."""
+        from flask import g, request
+
+        if self._habilitado is None:
+            self.habilitado = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+        @app.before_request
+        def _inicio_peticion():
+            g._metricas_t0 = time.perf_counter()
+
+        @app.after_request
+        def _fin_peticion(response):
+            t0 = g.pop('_metricas_t0', None)
+            if t0 is not None:
+                tiempo_peticion.observe(time.perf_counter() - t0, request.blueprint or 'app',
+                                        request.method, str(response.status_code))
+            return response
+
+        app.extensions['metricas'] = self
+
+    def histograma(self, nombre, ayuda, etiquetas=(), tramos=TRAMOS_FRAME):
+        return self._agregar(Histograma(self, nombre, ayuda, etiquetas, tramos))
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(self, nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre, ayuda, leer, etiquetas=(), tipo='gauge'):
+        return self._agregar(MedidorCallback(self, nombre, ayuda, leer, etiquetas, tipo))
+
+    def exponer(self):
+        with self._lock:
+            metricas = list(self._metricas)
+        lineas = []
+        for m in metricas:
+            lineas += m.exponer()
+        return '\n'.join(lineas) + '\n'
+
+
+def clase_resolucion(width, height):
+    """Clase de resolución para etiquetar (cardinalidad acotada): lado corto redondeado al estándar."""
+    lado = min(int(width or 0), int(height or 0))
+    for clase in (360, 480, 720, 1080, 1440, 2160):
+        if lado <= clase:
+            return f'{clase}p'
+    return 'mayor'
+
+
+# Instancia unica
+metricas = RegistroMetricas()
+
+# Métricas compartidas por los servicios (los medidores se registran en registrar_medidores)
+tiempo_etapa_frame = metricas.histograma(
+    'posturepro_frame_stage_seconds', 'Tiempo por frame de cada etapa de analizar_video_completo',
+    ('etapa',), TRAMOS_FRAME)
+tiempo_trabajo = metricas.histograma(
+    'posturepro_job_seconds', 'Duración de un trabajo de análisis (desde que un worker lo toma)',
+    ('exercise_type', 'resolucion', 'output'), TRAMOS_TRABAJO)
+espera_cola = metricas.histograma(
+    'posturepro_job_queue_wait_seconds', 'Espera en cola de un trabajo antes de empezar', (), TRAMOS_TRABAJO)
+trabajos_terminados = metricas.contador(
+    'posturepro_jobs_finished_total', 'Trabajos terminados por estado final', ('state',))
+tiempo_ffmpeg = metricas.histograma(
+    'posturepro_ffmpeg_seconds', 'Duración de las operaciones de ffmpeg', ('operacion',), TRAMOS_FFMPEG)
+tiempo_consulta_auth = metricas.histograma(
+    'posturepro_auth_db_query_seconds', 'Consulta a la BD de sesión + usuario en get_current_user', (), TRAMOS_CONSULTA)
+tiempo_peticion = metricas.histograma(
+    'posturepro_http_request_seconds', 'Latencia de las peticiones HTTP por blueprint (hasta la respuesta; sin el cuerpo en streaming)',
+    ('blueprint', 'method', 'status'), TRAMOS_PETICION)
+
+
+def registrar_medidores(jobs, media_store, token_cache, analyzer_pool, live_sessions):
+    """Medidores leídos de los servicios al exponer (no añaden trabajo a su camino caliente)."""
+    metricas.medidor('posturepro_jobs', 'Trabajos registrados por estado', lambda: {(k,): v for k, v in jobs.counts().items()}, ('state',))
+    metricas.medidor('posturepro_job_queue_pending', 'Trabajos en cola esperando un worker',
+                     lambda: {(): jobs.backend.pending() if jobs.backend is not None else 0})
+    metricas.medidor('posturepro_analyzers_in_use', 'Analizadores del pool prestados (trabajos y sesiones en vivo en curso)',
+                     lambda: {(): analyzer_pool.en_uso()})
+    metricas.medidor('posturepro_live_sessions', 'Sesiones de coaching en vivo abiertas', lambda: {(): live_sessions.count()})
+    metricas.medidor('posturepro_media_store_bytes', 'Bytes en el almacén de resultados (/media)',
+                     lambda: _por_almacen(media_store.stats(), 'bytes'), ('almacen',))
+    metricas.medidor('posturepro_media_store_entries', 'Entradas en el almacén de resultados (/media)',
+                     lambda: _por_almacen(media_store.stats(), 'entries'), ('almacen',))
+    metricas.medidor('posturepro_auth_cache_lookups_total', 'Búsquedas en la caché de tokens por resultado',
+                     lambda: {('hit',): token_cache.hits, ('miss',): token_cache.misses}, ('resultado',), tipo='counter')
+
+
+def _por_almacen(stats, campo):
+    return {('memory',): stats[f'memory_{campo}'], ('disk',): stats[f'disk_{campo}']}
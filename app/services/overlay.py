@@ -0,0 +1,98 @@
+from functools import lru_cache
+import cv2
+import numpy as np
+import mediapipe as mp
+
+# Estilos del esqueleto: se crean una vez y se reutilizan en cada frame
+LANDMARK_SPEC = mp.solutions.drawing_utils.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
+CONNECTION_SPEC = mp.solutions.drawing_utils.DrawingSpec(color=(255, 0, 0), thickness=2)
+
+PANEL_ANCHO = 350
+PANEL_ALTO = 180
+PANEL_FONDO = (40, 40, 40)
+PANEL_OPACIDAD = 0.3
+TITULO = "ANALISIS EN VIVO"
+
+
+@lru_cache(maxsize=256)
+def dividir_texto(texto, max_chars):
+    """Parte el texto en líneas de como mucho max_chars (cacheado: los mensajes se repiten)."""
+    if len(texto) <= max_chars:
+        return (texto,)
+    words = texto.split(); lines = []; current_line = ""
+    for word in words:
+        if len((current_line + " " + word).strip()) <= max_chars:
+            current_line = (current_line + " " + word).strip()
+        else:
+            if current_line: lines.append(current_line)
+            current_line = word
+    if current_line: lines.append(current_line)
+    return tuple(lines)
+
+
+class _Panel:
+    """Geometría y recursos estáticos del panel para un tamaño de video."""
+
+    def __init__(self, width, height):
+        self.x = width - PANEL_ANCHO - 10
+        self.y = 10
+        # Región realmente dentro del frame (rectangle recorta; el slicing no)
+        x0, y0 = max(self.x, 0), max(self.y, 0)
+        x1, y1 = min(self.x + PANEL_ANCHO + 1, width), min(self.y + PANEL_ALTO + 1, height)
+        self.roi = (slice(y0, y1), slice(x0, x1)) if x1 > x0 and y1 > y0 else None
+        if self.roi is None:
+            self.fondo = None
+            self.titulo = None
+            return
+        # Fondo constante ya reservado para el blend (frame * 0.7 + fondo * 0.3)
+        self.fondo = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        self.fondo[:] = PANEL_FONDO
+        # Título pre-renderizado como máscara alfa recortada a su caja (el trazo grueso tiene bordes suaves)
+        mascara = np.zeros((height, width), dtype=np.uint8)
+        cv2.putText(mascara, TITULO, (self.x + 10, self.y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 255, 2)
+        ys, xs = np.nonzero(mascara)
+        if len(ys):
+            caja = (slice(ys.min(), ys.max() + 1), slice(xs.min(), xs.max() + 1))
+            alfa = mascara[caja].astype(np.float32)[..., None] / 255.0
+            self.titulo = (caja, 255.0 * alfa, 1.0 - alfa)
+        else:
+            self.titulo = None
+
+
+class RenderizadorOverlay:
+    """
+    Dibuja el panel de feedback mezclando solo la región del panel (in place) en vez de copiar
+    y mezclar el frame completo. Fondo y título se preparan una vez por tamaño de video.
+    """
+
+    def __init__(self):
+        self._paneles = {}
+
+    def _panel(self, width, height):
+        panel = self._paneles.get((width, height))
+        if panel is None:
+            panel = self._paneles[(width, height)] = _Panel(width, height)
+        return panel
+
+    def dibujar(self, frame, feedback_data, repeticiones, timestamp, estado):
+        height, width = frame.shape[:2]
+        panel = self._panel(width, height)
+        panel_x, panel_y = panel.x, panel.y
+        color = feedback_data['color']
+        if panel.roi is not None:
+            roi = frame[panel.roi]
+            cv2.addWeighted(roi, 1 - PANEL_OPACIDAD, panel.fondo, PANEL_OPACIDAD, 0, dst=roi)
+        cv2.rectangle(frame, (panel_x, panel_y), (panel_x + PANEL_ANCHO, panel_y + PANEL_ALTO), color, 2)
+        if panel.titulo is not None:
+            caja, blanco, resto = panel.titulo
+            zona = frame[caja]
+            np.copyto(zona, (zona * resto + blanco + 0.5).astype(np.uint8))
+        cv2.putText(frame, f"Score: {feedback_data['score']}/100", (panel_x + 10, panel_y + 55), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        cv2.putText(frame, f"Repeticiones: {repeticiones}", (panel_x + 10, panel_y + 85), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        minutos = int(timestamp // 60); segundos = int(timestamp % 60)
+        cv2.putText(frame, f"Tiempo: {minutos:02d}:{segundos:02d}", (panel_x + 10, panel_y + 115), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(frame, f"Estado: {estado}", (panel_x + 10, panel_y + 145), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        if feedback_data['feedback']:
+            for i, line in enumerate(dividir_texto(feedback_data['feedback'], 40)):
+                cv2.putText(frame, line, (panel_x, panel_y + PANEL_ALTO + 30 + i * 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return frame
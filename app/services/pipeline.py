@@ -0,0 +1,87 @@
+import os
+import queue
+import threading
+
+# Marca de fin de flujo entre etapas
+_FIN = object()
+
+
+def _queue_size():
+    return max(1, int(os.environ.get('PIPELINE_QUEUE_SIZE', '3')))
+
+
+class Pipeline:
+    """
+    Ejecuta etapas encadenadas, cada una en su propio hilo, unidas por colas acotadas.
+
+    - La primera etapa es un generador sin argumentos (fuente).
+    - Las intermedias reciben un iterable de entradas y devuelven/generan salidas.
+    - La última puede devolver None (sumidero).
+
+    Cada etapa corre en un único hilo y las colas son FIFO, por lo que el orden de los
+    frames es determinista. Si una etapa falla, se detienen todas y run() relanza el error.
+    """
+
+    def __init__(self, etapas, maxsize=None):
+        if not etapas:
+            raise ValueError('Pipeline sin etapas')
+        self.etapas = list(etapas)
+        self.maxsize = maxsize or _queue_size()
+        self._stop = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter(self, q):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _FIN:
+                return
+            yield item
+
+    def _fallar(self, e):
+        with self._error_lock:
+            if self._error is None:
+                self._error = e
+        self._stop.set()
+
+    def _correr(self, etapa, qin, qout):
+        try:
+            salida = etapa(self._iter(qin)) if qin is not None else etapa()
+            if salida is not None:
+                for item in salida:
+                    if qout is not None and not self._put(qout, item):
+                        break
+        except BaseException as e:
+            self._fallar(e)
+        finally:
+            if qout is not None:
+                self._put(qout, _FIN)
+
+    def run(self):
+        colas = [queue.Queue(maxsize=self.maxsize) for _ in range(len(self.etapas) - 1)]
+        hilos = []
+        for i, etapa in enumerate(self.etapas):
+            qin = colas[i - 1] if i > 0 else None
+            qout = colas[i] if i < len(colas) else None
+            nombre = getattr(etapa, '__name__', f'etapa{i}')
+            t = threading.Thread(target=self._correr, args=(etapa, qin, qout), name=f'pipeline-{nombre}', daemon=True)
+            t.start()
+            hilos.append(t)
+        for t in hilos:
+            t.join()
+        if self._error is not None:
+            raise self._error
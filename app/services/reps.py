@@ -0,0 +1,190 @@
+from array import array
+import numpy as np
+
+# Serie angular que describe cada ejercicio y qué umbrales de UMBRALES_REPS delimitan el fondo
+# (bajo) y la parte alta (alto) de una repetición. Todas las series bajan durante la fase excéntrica.
+SERIES_REPS = {
+    'sentadilla': {'serie': 'rodilla_der', 'bajo': 'bajo', 'alto': 'alto'},
+    'desplantes': {'serie': 'rodilla_delantera', 'bajo': 'fondo', 'alto': 'inicio'},
+    'press_banca': {'serie': 'codo_der', 'bajo': 'bajo', 'alto': 'alto'},
+}
+
+DURACION_MIN_REP = 0.5   # segundos
+VENTANA_MEDIANA = 5      # frames
+
+
+def serie_ejercicio(cinematica, tipo_ejercicio):
+    """Serie angular (frames,) del ejercicio a partir de calcular_cinematica sobre un track."""
+    nombre = SERIES_REPS[tipo_ejercicio]['serie']
+    if nombre == 'rodilla_delantera':
+        # Pierna delantera = la más flexionada en cada frame
+        return np.fmin(cinematica['rodilla_izq'], cinematica['rodilla_der'])
+    return cinematica[nombre]
+
+
+class SerieReps:
+    """
+    Serie angular del ejercicio construida frame a frame durante el análisis (8 bytes por
+    frame): segmentar las repeticiones no requiere guardar el track de landmarks completo.
+    """
+
+    def __init__(self, tipo_ejercicio):
+        config = SERIES_REPS.get(tipo_ejercicio)
+        self.nombre = config['serie'] if config else None
+        self.valores = array('d')
+
+    def agregar(self, cinematica):
+        """cinematica: valores del frame (cinematica_frame) o None si no hubo persona."""
+        if self.nombre is None:
+            return
+        valor = None
+        if cinematica is not None:
+            if self.nombre == 'rodilla_delantera':
+                # Igual que np.fmin en serie_ejercicio: la rodilla disponible más flexionada
+                izq, der = cinematica['rodilla_izq'], cinematica['rodilla_der']
+                valor = izq if der is None or (izq is not None and izq <= der) else der
+            else:
+                valor = cinematica[self.nombre]
+        self.valores.append(np.nan if valor is None else valor)
+
+    def serie(self):
+        return np.frombuffer(self.valores, dtype=np.float64) if self.valores else np.empty(0)
+
+
+def rellenar_huecos(serie):
+    """Interpola linealmente los NaN (frames sin persona). None si no hay datos suficientes."""
+    serie = np.asarray(serie, dtype=np.float64)
+    validos = np.flatnonzero(~np.isnan(serie))
+    if len(validos) < 3:
+        return None
+    return np.interp(np.arange(len(serie)), validos, serie[validos])
+
+
+def suavizar_serie(rellena, ventana=VENTANA_MEDIANA):
+    """Mediana móvil centrada (vectorizada) sobre una serie sin huecos."""
+    ventana = max(1, int(ventana)) | 1  # impar
+    if ventana == 1 or len(rellena) < ventana:
+        return rellena
+    mitad = ventana // 2
+    ventanas = np.lib.stride_tricks.sliding_window_view(np.pad(rellena, mitad, mode='edge'), ventana)
+    return np.median(ventanas, axis=1)
+
+
+def _extremos(s):
+    """Mínimos/máximos locales (centro de cada meseta) más los extremos de la serie, alternados."""
+    cambios = np.flatnonzero(np.diff(s) != 0) + 1
+    inicios = np.concatenate(([0], cambios))
+    fines = np.concatenate((cambios - 1, [len(s) - 1]))
+    valores = s[inicios]
+    centros = (inicios + fines) // 2
+    if len(valores) < 3:
+        return centros, valores
+    pendiente = np.sign(np.diff(valores))
+    interiores = np.flatnonzero(pendiente[:-1] != pendiente[1:]) + 1
+    idx = np.concatenate(([0], interiores, [len(valores) - 1]))
+    return centros[idx], valores[idx]
+
+
+def _pivotes(indices, valores, prominencia):
+    """
+    Filtro zigzag sobre los extremos: solo se aceptan cambios de dirección de al menos
+    `prominencia` grados. Devuelve la lista alternada de pivotes [(indice, valor), ...].
+    """
+    maximo = minimo = (int(indices[0]), float(valores[0]))
+    pivotes = []
+    tendencia = 0
+    for i, v in zip(indices[1:].tolist(), valores[1:].tolist()):
+        if tendencia == 0:
+            if v > maximo[1]:
+                maximo = (i, v)
+            if v < minimo[1]:
+                minimo = (i, v)
+            if v - minimo[1] >= prominencia:
+                pivotes, tendencia = [minimo, (i, v)], 1
+            elif maximo[1] - v >= prominencia:
+                pivotes, tendencia = [maximo, (i, v)], -1
+        elif tendencia == 1:
+            if v >= pivotes[-1][1]:
+                pivotes[-1] = (i, v)
+            elif pivotes[-1][1] - v >= prominencia:
+                pivotes.append((i, v)); tendencia = -1
+        else:
+            if v <= pivotes[-1][1]:
+                pivotes[-1] = (i, v)
+            elif v - pivotes[-1][1] >= prominencia:
+                pivotes.append((i, v)); tendencia = 1
+    return pivotes
+
+
+def segmentar_repeticiones(serie, fps, bajo, alto, prominencia=None, duracion_min=DURACION_MIN_REP,
+                           ventana=VENTANA_MEDIANA):
+    """
+    Segmenta repeticiones sobre una serie angular completa (frames,), NaN = sin persona.
+    La estructura (picos y valles) se busca sobre la serie suavizada con mediana; la
+    profundidad se mide sobre la serie cruda. Una repetición es alto -> valle -> alto con:
+      - ángulo mínimo (crudo) <= bajo y vuelta arriba >= alto,
+      - caída y subida de al menos `prominencia` grados (por defecto la mitad de alto - bajo),
+      - duración mínima `duracion_min` segundos.
+    Los límites de cada rep se sitúan donde el ángulo se separa un 10% del rango de la parte alta.
+    Devuelve una lista de dicts con frames/tiempos de inicio, fondo y fin, profundidad y tempo.
+    """
+    fps = fps or 30
+    cruda = rellenar_huecos(serie)
+    if cruda is None:
+        return []
+    s = suavizar_serie(cruda, ventana)
+    if prominencia is None:
+        prominencia = max(5.0, (alto - bajo) / 2.0)
+    pivotes = _pivotes(*_extremos(s), prominencia)
+
+    reps = []
+    for k in range(1, len(pivotes) - 1):
+        (i0, v0), (iv, vv), (i1, v1) = pivotes[k - 1], pivotes[k], pivotes[k + 1]
+        if not (vv < v0 and vv < v1) or v1 < alto:
+            continue
+        # Inicio: último frame cerca de la parte alta antes del valle; fin: primero después
+        bajada = s[i0:iv + 1]
+        inicio = i0 + int(np.flatnonzero(bajada >= v0 - 0.1 * (v0 - vv))[-1])
+        subida = s[iv:i1 + 1]
+        fin = iv + int(np.flatnonzero(subida >= v1 - 0.1 * (v1 - vv))[0])
+        duracion = (fin - inicio) / fps
+        minimo = float(cruda[inicio:fin + 1].min())
+        if duracion < duracion_min or minimo > bajo:
+            continue
+        reps.append({
+            'frames': [inicio, iv, fin],
+            'inicio': round((inicio + 1) / fps, 2),
+            'fondo': round((iv + 1) / fps, 2),
+            'fin': round((fin + 1) / fps, 2),
+            'angulo_min': round(minimo, 1),
+            'rango': round(min(v0, v1) - minimo, 1),
+            'bajada_s': round((iv - inicio) / fps, 2),
+            'subida_s': round((fin - iv) / fps, 2),
+            'duracion_s': round(duracion, 2),
+        })
+    return reps
+
+
+def segmentar_ejercicio(cinematica, tipo_ejercicio, fps, umbrales, **opciones):
+    """
+    Segmentación de repeticiones de un ejercicio sobre la cinemática de todo el track.
+    umbrales: los de UMBRALES_REPS del ejercicio (con overrides).
+    """
+    if tipo_ejercicio not in SERIES_REPS:
+        return None
+    return segmentar_serie(serie_ejercicio(cinematica, tipo_ejercicio), tipo_ejercicio, fps, umbrales, **opciones)
+
+
+def segmentar_serie(serie, tipo_ejercicio, fps, umbrales, **opciones):
+    """Como segmentar_ejercicio, sobre la serie angular del ejercicio ya calculada (p. ej. SerieReps)."""
+    config = SERIES_REPS.get(tipo_ejercicio)
+    if config is None:
+        return None
+    reps = segmentar_repeticiones(serie, fps, umbrales[config['bajo']], umbrales[config['alto']], **opciones)
+    return {
+        'serie': config['serie'],
+        'repeticiones': len(reps),
+        'reps': reps,
+        'tempo_medio_s': round(float(np.mean([r['duracion_s'] for r in reps])), 2) if reps else None,
+        'angulo_min_medio': round(float(np.mean([r['angulo_min'] for r in reps])), 1) if reps else None,
+    }
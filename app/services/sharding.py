@@ -0,0 +1,361 @@
+import os
+import math
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+from app.services.analyzer import AnalizadorEjercicios, NIVELES_CALIDAD, pose_con_stride, resolver_calidad
+from app.services.encoder import FfmpegPipeWriter, ffmpeg_disponible, FFMPEG_BIN
+from app.services.landmarks import landmarks_a_array, apilar_track
+from app.services.track_export import ConstructorTrack
+from app.services.metrics import tiempo_ffmpeg
+
+# Peso de cada fase en el progreso del modo video (pose / render + codificación)
+PESO_POSE = 0.7
+
+# --- procesos del pool ---------------------------------------------------------------------
+
+_analizadores = {}  # por proceso: calidad -> AnalizadorEjercicios (grafo de MediaPipe caliente)
+_progreso = None    # cola hacia el proceso principal: (token, frames procesados)
+
+
+def _iniciar_worker(cola):
+    global _progreso
+    _progreso = cola
+
+
+def _analizador(calidad):
+    analizador = _analizadores.get(calidad)
+    if analizador is None:
+        analizador = _analizadores[calidad] = AnalizadorEjercicios(calidad, cargar_pose=calidad is not None)
+    return analizador
+
+
+def _avisar(token, frames):
+    if _progreso is not None and frames:
+        _progreso.put((token, frames))
+
+
+def _leer_frames(cap, desde, hasta):
+    """(índice 0-based, frame) de [desde, hasta); hasta=None lee hasta el final del video."""
+    if desde and not cap.set(cv2.CAP_PROP_POS_FRAMES, desde):
+        # Contenedor sin seek: descartar frames hasta el inicio
+        for _ in range(desde):
+            if not cap.grab():
+                return
+    idx = desde
+    while hasta is None or idx < hasta:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield idx, frame
+        idx += 1
+
+
+def _pose_segmento(token, video_path, calidad, desde, inicio, fin, stride, tamano_inferencia):
+    """
+    Track de landmarks de [inicio, fin). Los frames [desde, inicio) solo calientan el tracking
+    y el suavizado de MediaPipe; no forman parte del resultado.
+    """
+    analizador = _analizador(calidad)
+    analizador.nueva_sesion()
+    contador = {'inferidos': 0, 'seg_inferencia': 0.0}
+
+    def inferir(frame):
+        if tamano_inferencia is not None:
+            frame = cv2.resize(frame, tamano_inferencia, interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        t0 = time.perf_counter()
+        results = analizador.pose.process(rgb)
+        contador['seg_inferencia'] += time.perf_counter() - t0
+        contador['inferidos'] += 1
+        return landmarks_a_array(results.pose_landmarks)
+
+    filas = []
+    cap = cv2.VideoCapture(video_path)
+    try:
+        for idx, _, puntos in pose_con_stride(_leer_frames(cap, desde, fin), stride, inferir):
+            if idx < inicio:
+                continue
+            filas.append(puntos)
+            if len(filas) % 25 == 0:
+                _avisar(token, 25)
+    finally:
+        cap.release()
+    _avisar(token, len(filas) % 25)
+    return apilar_track(filas), contador['inferidos'], contador['seg_inferencia']
+
+
+def _render_segmento(token, video_path, inicio, fps, size, track, resultados, output_path):
+    """Dibuja y codifica (H.264) los frames [inicio, inicio + len(track)) en su propio MP4."""
+    analizador = _analizador(None)
+    writer = FfmpegPipeWriter(output_path, fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo iniciar ffmpeg para el segmento: {writer.error}")
+    cap = cv2.VideoCapture(video_path)
+    escritos = 0
+    try:
+        for idx, frame in _leer_frames(cap, inicio, inicio + len(track)):
+            k = idx - inicio
+            fila = track[k]
+            puntos = None if np.isnan(fila[0, 0]) else fila
+            writer.write(analizador.dibujar_frame(frame, puntos, resultados[k], (idx + 1) / fps))
+            escritos += 1
+            if escritos % 25 == 0:
+                _avisar(token, 25)
+    finally:
+        cap.release()
+        ok = writer.release()
+    _avisar(token, escritos % 25)
+    if not ok:
+        raise RuntimeError("Falló la codificación de un segmento")
+    return output_path
+
+
+def concatenar_segmentos(segmentos, output_path):
+    """Une MP4 codificados con los mismos parámetros sin recodificar (concat demuxer, -c copy)."""
+    lista = output_path + '.txt'
+    with open(lista, 'w') as f:
+        for ruta in segmentos:
+            f.write("file '{}'\n".format(ruta.replace("'", "'\\''")))
+    t0 = time.perf_counter()
+    try:
+        subprocess.run([
+            FFMPEG_BIN, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', lista,
+            '-c', 'copy', '-movflags', '+faststart', output_path
+        ], check=True)
+    finally:
+        tiempo_ffmpeg.observe(time.perf_counter() - t0, 'concat')
+        os.unlink(lista)
+    return output_path
+
+
+# --- proceso principal ---------------------------------------------------------------------
+
+class _Avance:
+    """Progreso agregado de todos los segmentos de un análisis (frames ponderados por fase)."""
+
+    def __init__(self, total_frames, on_progress=None, on_frame=None):
+        self.total = max(1, total_frames)
+        self.on_progress = on_progress
+        self.on_frame = on_frame
+        self.peso = PESO_POSE
+        self.base = 0.0
+        self.frames = 0
+        self.repeticiones = 0
+        self.ultimo_pct = -1
+        self._lock = threading.Lock()
+
+    def fase(self, base, peso):
+        with self._lock:
+            self.base, self.peso, self.frames = base, peso, 0
+
+    def sumar(self, frames):
+        with self._lock:
+            self.frames += frames
+            fraccion = min(1.0, self.base + self.peso * self.frames / self.total)
+            pct = int(fraccion * 100)
+            avisar_pct = pct != self.ultimo_pct
+            self.ultimo_pct = pct
+        try:
+            if avisar_pct and self.on_progress:
+                self.on_progress(pct)
+            if self.on_frame:
+                # Frames "equivalentes" del video completo: el fps y la ETA del trabajo siguen valiendo
+                self.on_frame(int(fraccion * self.total), self.total, self.repeticiones)
+        except Exception:
+            pass
+
+
+class AnalisisParticionado:
+    """
+    Análisis de un video largo repartido entre procesos:
+
+    1. El video se divide en segmentos de tiempo; cada proceso calcula la pose de su segmento
+       precedido de SHARD_WARMUP_SECONDS de calentamiento (tracking y suavizado de MediaPipe).
+    2. Los tracks se unen y el análisis por frame se repite en orden sobre el track completo
+       (reproducir_track): las repeticiones que cruzan un corte y la deduplicación de
+       errores salen igual que en un análisis secuencial.
+    3. Cada proceso dibuja y codifica su segmento; los MP4 se concatenan sin recodificar.
+
+    Se usa para videos de al menos SHARD_MIN_SECONDS con SHARD_WORKERS > 1.
+    """
+
+    def __init__(self, workers=None, min_seconds=None, segment_seconds=None, warmup_seconds=None):
+        self.workers = workers if workers is not None else int(os.environ.get('SHARD_WORKERS', str(os.cpu_count() or 1)))
+        self.min_seconds = min_seconds if min_seconds is not None else float(os.environ.get('SHARD_MIN_SECONDS', '120'))
+        self.segment_seconds = segment_seconds if segment_seconds is not None else float(os.environ.get('SHARD_SEGMENT_SECONDS', '30'))
+        self.warmup_seconds = warmup_seconds if warmup_seconds is not None else float(os.environ.get('SHARD_WARMUP_SECONDS', '1.0'))
+        self._executor = None
+        self._cola = None
+        self._avances = {}  # token -> _Avance
+        self._lock = threading.Lock()
+
+    def aplicable(self, video_path, salida='video'):
+        """True si conviene partir el video (largo, varios procesos y ffmpeg para el modo video)."""
+        if self.workers <= 1 or (salida == 'video' and not ffmpeg_disponible()):
+            return False
+        cap = cv2.VideoCapture(video_path)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0
+            total = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        finally:
+            cap.release()
+        return fps > 0 and total / fps >= self.min_seconds
+
+    def planificar(self, total_frames, fps):
+        """[(desde, inicio, fin)] por segmento; el último llega hasta el final real (fin=None)."""
+        por_segmento = max(1, int(self.segment_seconds * fps))
+        n = max(1, min(self.workers, math.ceil(total_frames / por_segmento)))
+        limites = np.linspace(0, total_frames, n + 1).astype(int)
+        warmup = int(round(self.warmup_seconds * fps))
+        segmentos = []
+        for i in range(n):
+            inicio, fin = int(limites[i]), int(limites[i + 1])
+            segmentos.append((max(0, inicio - warmup), inicio, fin if i < n - 1 else None))
+        return segmentos
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: los procesos no heredan hilos ni grafos de MediaPipe del proceso principal
+                contexto = multiprocessing.get_context('spawn')
+                self._cola = contexto.Queue()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto,
+                                                     initializer=_iniciar_worker, initargs=(self._cola,))
+                threading.Thread(target=self._escuchar, args=(self._cola,), name='shard-progress', daemon=True).start()
+            return self._executor
+
+    def _escuchar(self, cola):
+        while True:
+            try:
+                token, frames = cola.get()
+            except Exception:
+                return
+            avance = self._avances.get(token)
+            if avance is not None:
+                avance.sumar(frames)
+
+    def _ejecutar(self, fn, tareas):
+        pool = self._pool()
+        try:
+            futuros = [pool.submit(fn, *args) for args in tareas]
+            return [f.result() for f in futuros]
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. OOM): el próximo análisis crea un pool nuevo
+            with self._lock:
+                if self._executor is pool:
+                    self._executor = None
+            raise
+
+    def analizar(self, video_path, tipo_ejercicio='sentadilla', calidad=None, on_progress=None, on_frame=None,
+                 inference_stride=None, inference_fps=None, inference_max_side=None,
+                 track_cache=None, video_hash=None, umbrales=None, salida='video'):
+        """Misma interfaz y resultado que analizar_video_completo: (ruta_video | payload_track, stats)."""
+        if salida not in ('video', 'track'):
+            raise ValueError(f"Salida inválida: {salida}")
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise RuntimeError("No se pudo abrir el video de entrada")
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+        cap.release()
+
+        calidad = resolver_calidad(calidad)
+        analizador = AnalizadorEjercicios(calidad, cargar_pose=False)
+        stride = analizador.resolver_stride(fps, inference_stride, inference_fps)
+        tamano_inferencia = analizador.resolver_tamano_inferencia(width, height, inference_max_side)
+        segmentos = self.planificar(total_frames, fps)
+
+        token = uuid.uuid4().hex
+        avance = _Avance(total_frames, on_progress, on_frame)
+        if salida == 'track':
+            avance.fase(0.0, 1.0)
+        self._avances[token] = avance
+        directorio = tempfile.mkdtemp(prefix='posturepro_shards_')
+        try:
+            # 1) Pose por segmento (o track ya calculado en la caché)
+            track_id = None
+            landmarks_track = None
+            inferidos, seg_inferencia = 0, 0.0
+            if track_cache is not None and video_hash:
+                track_id = analizador.clave_track(track_cache, video_hash, stride, tamano_inferencia, width, height)
+                hit = track_cache.get(track_id)
+                if hit is not None:
+                    landmarks_track = hit[0]
+            cache_hit = landmarks_track is not None
+            if not cache_hit:
+                partes = self._ejecutar(_pose_segmento, [
+                    (token, video_path, calidad, desde, inicio, fin, stride, tamano_inferencia)
+                    for desde, inicio, fin in segmentos
+                ])
+                landmarks_track = np.concatenate([p[0] for p in partes])
+                inferidos = sum(p[1] for p in partes)
+                seg_inferencia = sum(p[2] for p in partes)
+                longitudes = [len(p[0]) for p in partes]
+                if track_id is not None:
+                    try:
+                        track_cache.put(track_id, landmarks_track, {'fps': fps, 'width': width, 'height': height})
+                    except Exception as e:
+                        print(f"[TRACK_CACHE][ERROR] {e}")
+            else:
+                # Mismos cortes sobre el track cacheado (solo se usan para el render)
+                longitudes = [(fin if fin is not None else len(landmarks_track)) - inicio for _, inicio, fin in segmentos]
+
+            # 2) Análisis en orden sobre el track completo
+            stats, resultados = analizador.reproducir_track(landmarks_track, fps, (height, width), tipo_ejercicio, umbrales)
+            avance.repeticiones = stats['repeticiones']
+            stats['inferencia'] = {
+                'stride': stride,
+                'frames_inferidos': inferidos,
+                'resolucion': list(tamano_inferencia or (width, height)),
+                'resolucion_video': [width, height],
+                'calidad': calidad,
+                'model_complexity': NIVELES_CALIDAD[calidad],
+                'ms_por_frame': round(1000.0 * seg_inferencia / inferidos, 2) if inferidos else 0.0,
+                'track_id': track_id,
+                'cache': None if track_id is None else ('hit' if cache_hit else 'miss'),
+                'segmentos': len(segmentos),
+            }
+            stats['recomendaciones'] = analizador.generar_recomendaciones(stats, tipo_ejercicio)
+
+            if salida == 'track':
+                constructor = ConstructorTrack(fps, width, height)
+                for fila, resultado in zip(landmarks_track, resultados):
+                    constructor.agregar(None if np.isnan(fila[0, 0]) else fila, resultado)
+                return constructor.construir(), stats
+
+            # 3) Render + codificación por segmento y concatenación sin recodificar
+            if cache_hit:
+                avance.fase(0.0, 1.0)
+            else:
+                avance.fase(PESO_POSE, 1.0 - PESO_POSE)
+            tareas, offset = [], 0
+            for i, ((_, inicio, _), n) in enumerate(zip(segmentos, longitudes)):
+                if n <= 0:
+                    continue
+                tareas.append((token, video_path, inicio, fps, (width, height),
+                               landmarks_track[offset:offset + n], resultados[offset:offset + n],
+                               os.path.join(directorio, f'segmento_{i:03d}.mp4')))
+                offset += n
+            partes = self._ejecutar(_render_segmento, tareas)
+            output_path = tempfile.mktemp(suffix='.mp4')
+            concatenar_segmentos(partes, output_path)
+            return output_path, stats
+        finally:
+            self._avances.pop(token, None)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+# Instancia unica
+analisis_particionado = AnalisisParticionado()
@@ -0,0 +1,143 @@
+import os
+import math
+from bisect import insort, bisect_left
+
+
+class MedianaMovil:
+    """
+    Mediana de las últimas `ventana` muestras. Anillo de tamaño fijo + lista ordenada mantenida
+    con bisect: cada muestra cuesta una inserción y un borrado (ventanas de 5-7 valores), sin
+    reordenar ni reservar memoria por frame. Mismo resultado que np.median sobre la ventana.
+    """
+    __slots__ = ('ventana', '_anillo', '_orden', '_pos')
+
+    def __init__(self, ventana):
+        self.ventana = int(ventana)
+        self.reset()
+
+    def reset(self):
+        self._anillo = [None] * self.ventana
+        self._orden = []
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._orden)
+
+    def agregar(self, valor):
+        valor = float(valor)
+        saliente = self._anillo[self._pos]
+        if saliente is not None:
+            del self._orden[bisect_left(self._orden, saliente)]
+        self._anillo[self._pos] = valor
+        self._pos = (self._pos + 1) % self.ventana
+        insort(self._orden, valor)
+        return self.valor
+
+    @property
+    def valor(self):
+        n = len(self._orden)
+        if not n:
+            return None
+        mitad = n // 2
+        if n % 2:
+            return self._orden[mitad]
+        return (self._orden[mitad - 1] + self._orden[mitad]) / 2
+
+
+class OneEuro:
+    """
+    Filtro One-Euro (Casiez et al.) de una señal escalar. El corte se adapta a la velocidad:
+    poco retardo en movimientos rápidos y mucho suavizado en reposo. Aritmética en float de
+    Python: son pocas señales por frame y numpy costaría más en la creación de arrays que en
+    la cuenta.
+    """
+    __slots__ = ('min_cutoff', 'beta', 'd_cutoff', '_x', '_dx', '_t')
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = 0.0
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filtrar(self, valor, t):
+        valor = float(valor)
+        if self._x is None:
+            self._x, self._t = valor, t
+            return valor
+        dt = max(t - self._t, 1e-6)
+        dx = (valor - self._x) / dt
+        dx_hat = self._dx + self._alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * abs(dx_hat)
+        self._x = self._x + self._alpha(cutoff, dt) * (valor - self._x)
+        self._dx = dx_hat
+        self._t = t
+        return self._x
+
+
+# Señales suavizadas por sesión y su ventana de mediana (frames)
+VENTANAS_SUAVIZADO = {
+    'torso': 5,
+    'rodilla_delantera': 7,
+    'rodilla_izq': 7,
+    'rodilla_der': 7,
+}
+
+# Señales que pasan antes por One-Euro: las rodillas alimentan la máquina de estados de
+# desplantes (tendencia de ±0.3° por frame), donde el temblor de los landmarks produce
+# cambios de feedback espurios que la mediana sola no quita
+SENALES_ONE_EURO = ('rodilla_delantera', 'rodilla_izq', 'rodilla_der')
+
+
+def one_euro_habilitado():
+    return os.environ.get('SMOOTHING_ONE_EURO', '0') == '1'
+
+
+class SuavizadorSesion:
+    """
+    Suavizado de todas las señales angulares de un análisis en un solo paso por frame:
+    One-Euro sobre SENALES_ONE_EURO (solo con SMOOTHING_ONE_EURO=1) seguido de una mediana móvil por señal. Vive en la SesionAnalisis, así que cada video empieza con
+    el estado limpio.
+    """
+
+    def __init__(self, ventanas=None, one_euro=None, senales_one_euro=SENALES_ONE_EURO):
+        self.ventanas = dict(ventanas or VENTANAS_SUAVIZADO)
+        self.nombres = list(self.ventanas)
+        self.medianas = {n: MedianaMovil(v) for n, v in self.ventanas.items()}
+        usar_one_euro = one_euro_habilitado() if one_euro is None else one_euro
+        self.one_euro = {n: OneEuro() for n in self.nombres if n in senales_one_euro} if usar_one_euro else {}
+
+    def reset(self):
+        for mediana in self.medianas.values():
+            mediana.reset()
+        for filtro in self.one_euro.values():
+            filtro.reset()
+
+    def actualizar(self, valores, timestamp=None):
+        """
+        valores: {señal: ángulo crudo o None}. Solo se agregan las señales con dato.
+        Devuelve {señal: valor suavizado}, None para las señales sin dato en este frame.
+        """
+        crudos = {n: valores.get(n) for n in self.nombres}
+        if timestamp is not None:
+            for nombre, filtro in self.one_euro.items():
+                if crudos[nombre] is not None:
+                    crudos[nombre] = filtro.filtrar(crudos[nombre], timestamp)
+        suavizados = {}
+        for nombre in self.nombres:
+            valor = crudos[nombre]
+            suavizados[nombre] = None if valor is None else self.medianas[nombre].agregar(valor)
+        return suavizados
+
+    def mediana(self, nombre):
+        """Mediana actual de la ventana de una señal (aunque el último frame no trajera dato)."""
+        return self.medianas[nombre].valor
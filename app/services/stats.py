@@ -0,0 +1,154 @@
+import os
+import numpy as np
+
+# Hueco máximo (segundos) entre dos frames con el mismo error para considerarlos un solo intervalo
+HUECO_INTERVALO_ERROR = 0.5
+# Umbral de score por debajo del cual el feedback del frame cuenta como error
+SCORE_ERROR = 80
+LIMITES_HISTOGRAMA = list(range(0, 101, 10))  # 10 tramos; el último incluye el 100
+
+
+class TimelineReducida:
+    """
+    Serie de scores a resolución fija: como mucho `puntos` tramos de `ancho` frames con suma,
+    conteo, mínimo y máximo. Si el video resulta más largo de lo previsto, los tramos se
+    fusionan de dos en dos y el ancho se duplica, así la memoria no depende de la duración.
+    """
+    __slots__ = ('puntos', 'ancho', '_suma', '_n', '_min', '_max')
+
+    def __init__(self, puntos=200, total_frames=0):
+        self.puntos = max(2, int(puntos) + int(puntos) % 2)  # par, para fusionar por parejas
+        self.ancho = max(1, -(-int(total_frames) // self.puntos)) if total_frames > 0 else 1
+        self._suma = np.zeros(self.puntos, dtype=np.float64)
+        self._n = np.zeros(self.puntos, dtype=np.int64)
+        self._min = np.full(self.puntos, np.inf)
+        self._max = np.full(self.puntos, -np.inf)
+
+    def _fusionar(self):
+        mitad = self.puntos // 2
+        for arr, op, vacio in ((self._suma, np.sum, 0), (self._n, np.sum, 0),
+                               (self._min, np.min, np.inf), (self._max, np.max, -np.inf)):
+            arr[:mitad] = op(arr.reshape(mitad, 2), axis=1)
+            arr[mitad:] = vacio
+        self.ancho *= 2
+
+    def agregar(self, frame_idx, score):
+        """frame_idx empieza en 1 (como en el pipeline)."""
+        tramo = (frame_idx - 1) // self.ancho
+        while tramo >= self.puntos:
+            self._fusionar()
+            tramo = (frame_idx - 1) // self.ancho
+        self._suma[tramo] += score
+        self._n[tramo] += 1
+        if score < self._min[tramo]:
+            self._min[tramo] = score
+        if score > self._max[tramo]:
+            self._max[tramo] = score
+
+    def exportar(self, frames, fps):
+        """Tramos que cubren `frames` frames; None donde no hubo persona."""
+        usados = min(self.puntos, -(-int(frames) // self.ancho)) if frames > 0 else 0
+        n = self._n[:usados]
+        con_datos = n > 0
+        media = np.divide(self._suma[:usados], n, out=np.zeros(usados), where=con_datos)
+
+        def _lista(valores):
+            return [round(float(v), 1) if ok else None for v, ok in zip(valores, con_datos)]
+        return {
+            'segundos_por_punto': round(self.ancho / fps, 4) if fps > 0 else None,
+            'score_medio': _lista(media),
+            'score_min': _lista(self._min[:usados]),
+            'score_max': _lista(self._max[:usados]),
+        }
+
+
+class AcumuladorEstadisticas:
+    """
+    Estadísticas de un análisis en memoria constante, frame a frame:
+
+    - score: media, mínimo y máximo acumulados + histograma en tramos de 10 puntos.
+    - timeline: serie de scores reducida a STATS_TIMELINE_PUNTOS tramos (TimelineReducida).
+    - errores: intervalos [inicio, fin] por mensaje (run-length) en lugar de un timestamp por
+      aparición; como mucho STATS_MAX_INTERVALOS, más un resumen por mensaje que siempre es
+      completo y del que salen las recomendaciones y el frame de resumen.
+    """
+
+    def __init__(self, fps, total_frames=0, puntos_timeline=None, max_intervalos=None):
+        self.fps = fps
+        puntos = puntos_timeline or int(os.environ.get('STATS_TIMELINE_PUNTOS', '200'))
+        self.max_intervalos = max_intervalos or int(os.environ.get('STATS_MAX_INTERVALOS', '1000'))
+        self.timeline = TimelineReducida(puntos, total_frames)
+        self.frames_con_persona = 0
+        self._suma = 0.0
+        self._min = None
+        self._max = None
+        self._histograma = [0] * (len(LIMITES_HISTOGRAMA) - 1)
+        self._abiertos = {}     # mensaje -> [inicio, fin, frames]
+        self.intervalos = []    # cerrados, en orden de cierre
+        self.intervalos_omitidos = 0
+        self._por_mensaje = {}  # mensaje -> [intervalos, frames]
+
+    # --- scores ------------------------------------------------------------------------------
+
+    def agregar_score(self, frame_idx, score):
+        self.frames_con_persona += 1
+        self._suma += score
+        self._min = score if self._min is None or score < self._min else self._min
+        self._max = score if self._max is None or score > self._max else self._max
+        self._histograma[min(int(score) // 10, len(self._histograma) - 1)] += 1
+        self.timeline.agregar(frame_idx, score)
+
+    @property
+    def score_promedio(self):
+        return self._suma / self.frames_con_persona if self.frames_con_persona else 0.0
+
+    # --- errores -----------------------------------------------------------------------------
+
+    def _cerrar(self, mensaje):
+        inicio, fin, frames = self._abiertos.pop(mensaje)
+        if len(self.intervalos) < self.max_intervalos:
+            self.intervalos.append({'error': mensaje, 'inicio': round(inicio, 2), 'fin': round(fin, 2), 'frames': frames})
+        else:
+            self.intervalos_omitidos += 1
+
+    def agregar_error(self, mensaje, timestamp):
+        """Frame con error: prolonga el intervalo abierto del mensaje o abre uno nuevo."""
+        abierto = self._abiertos.get(mensaje)
+        if abierto is not None and timestamp - abierto[1] <= HUECO_INTERVALO_ERROR:
+            abierto[1] = timestamp
+            abierto[2] += 1
+        else:
+            if abierto is not None:
+                self._cerrar(mensaje)
+            self._abiertos[mensaje] = [timestamp, timestamp, 1]
+            self._por_mensaje.setdefault(mensaje, [0, 0])[0] += 1
+        self._por_mensaje[mensaje][1] += 1
+
+    def cerrar_vencidos(self, timestamp):
+        for mensaje in [m for m, (_, fin, _) in self._abiertos.items() if timestamp - fin > HUECO_INTERVALO_ERROR]:
+            self._cerrar(mensaje)
+
+    def resumen_errores(self):
+        """Por mensaje: número de intervalos ('veces') y segundos con el error, de más a menos tiempo."""
+        resumen = [{'error': m, 'veces': v, 'segundos': round(f / self.fps, 2) if self.fps > 0 else 0.0}
+                   for m, (v, f) in self._por_mensaje.items()]
+        resumen.sort(key=lambda e: (e['segundos'], e['veces']), reverse=True)
+        return resumen
+
+    # --- salida ------------------------------------------------------------------------------
+
+    def exportar(self, frames):
+        for mensaje in list(self._abiertos):
+            self._cerrar(mensaje)
+        self.intervalos.sort(key=lambda e: e['inicio'])
+        return {
+            'frames_con_persona': self.frames_con_persona,
+            'score_promedio': float(self.score_promedio),
+            'score_min': self._min if self._min is not None else 0,
+            'score_max': self._max if self._max is not None else 0,
+            'histograma_scores': {'limites': LIMITES_HISTOGRAMA, 'frames': list(self._histograma)},
+            'timeline_scores': self.timeline.exportar(frames, self.fps),
+            'errores_intervalos': self.intervalos,
+            'errores_intervalos_omitidos': self.intervalos_omitidos,
+            'errores_resumen': self.resumen_errores(),
+        }
@@ -0,0 +1,107 @@
+import os
+import io
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import numpy as np
+
+
+def hash_archivo(path, chunk_size=1024 * 1024):
+    """sha256 del contenido del video (por bloques, sin cargarlo entero en memoria)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(chunk_size), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class TrackCache:
+    """
+    Caché en disco de tracks de landmarks por frame (ndarray (frames, 33, 4), NaN = sin persona),
+    indexada por hash del video + ajustes de pose. Expulsión LRU por bytes totales y nº de entradas.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_entries=None):
+        self.directory = directory or os.environ.get(
+            'TRACK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'posturepro_tracks'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('TRACK_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get('TRACK_CACHE_MAX_ENTRIES', '500'))
+        self._index = None  # clave -> {'size', 'atime'}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(video_hash, ajustes):
+        """Clave estable a partir del contenido y de los ajustes que afectan a los landmarks."""
+        payload = json.dumps({'video': video_hash, 'ajustes': ajustes}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, clave):
+        return os.path.join(self.directory, f'{clave}.npz')
+
+    def _cargar_indice(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        os.makedirs(self.directory, exist_ok=True)
+        for nombre in os.listdir(self.directory):
+            if not nombre.endswith('.npz'):
+                continue
+            st = os.stat(os.path.join(self.directory, nombre))
+            self._index[nombre[:-4]] = {'size': st.st_size, 'atime': st.st_mtime}
+
+    def get(self, clave):
+        """Devuelve (landmarks, meta) o None si no está en caché."""
+        if not clave:
+            return None
+        with self._lock:
+            self._cargar_indice()
+            entrada = self._index.get(clave)
+            if entrada is None:
+                return None
+            entrada['atime'] = time.time()
+        try:
+            with np.load(self._path(clave), allow_pickle=False) as data:
+                landmarks = data['landmarks']
+                meta = json.loads(bytes(data['meta']).decode('utf-8'))
+            return landmarks, meta
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self._index.pop(clave, None)
+            return None
+
+    def put(self, clave, landmarks, meta):
+        buf = io.BytesIO()
+        np.savez_compressed(buf, landmarks=np.asarray(landmarks, dtype=np.float32),
+                            meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+        data = buf.getvalue()
+        with self._lock:
+            self._cargar_indice()
+            tmp = self._path(clave) + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(clave))
+            self._index[clave] = {'size': len(data), 'atime': time.time()}
+            self._expulsar()
+
+    def _expulsar(self):
+        total = sum(e['size'] for e in self._index.values())
+        for clave, entrada in sorted(self._index.items(), key=lambda kv: kv[1]['atime']):
+            if total <= self.max_bytes and len(self._index) <= self.max_entries:
+                break
+            try:
+                os.unlink(self._path(clave))
+            except OSError:
+                pass
+            total -= entrada['size']
+            del self._index[clave]
+
+    def stats(self):
+        with self._lock:
+            self._cargar_indice()
+            return {'entries': len(self._index), 'bytes': sum(e['size'] for e in self._index.values())}
+
+
+# Instancia unica
+track_cache = TrackCache()
@@ -0,0 +1,97 @@
+import base64
+import gzip
+import json
+import numpy as np
+
+# Escala de cuantización de coordenadas normalizadas (int16: ±3.27 con resolución 1e-4)
+ESCALA_LANDMARKS = 10000
+SIN_DATO = -32768
+
+
+class ConstructorTrack:
+    """
+    Acumula, frame a frame, lo mínimo para que el cliente dibuje esqueleto y panel sobre
+    el video original: landmarks cuantizados, ángulos, score, feedback, estado y repeticiones.
+    """
+
+    def __init__(self, fps, width, height):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self._landmarks = []
+        self._score = []
+        self._feedback = []
+        self._estado = []
+        self._reps = []
+        self._angulos = {}
+        self._tablas = {'feedback': {}, 'estado': {}}
+
+    def _id(self, tabla, valor):
+        ids = self._tablas[tabla]
+        if valor not in ids:
+            ids[valor] = len(ids)
+        return ids[valor]
+
+    def agregar(self, puntos, resultado):
+        n = len(self._score)
+        self._landmarks.append(puntos)
+        if resultado is None:
+            self._score.append(None)
+            self._feedback.append(None)
+            self._estado.append(None)
+            self._reps.append(self._reps[-1] if self._reps else 0)
+            for serie in self._angulos.values():
+                serie.append(None)
+            return
+        feedback_data = resultado['feedback_data']
+        self._score.append(int(feedback_data['score']))
+        self._feedback.append(self._id('feedback', feedback_data.get('feedback') or ''))
+        self._estado.append(self._id('estado', resultado['estado']))
+        self._reps.append(int(resultado['repeticiones']))
+        for nombre, valor in (feedback_data.get('angulos') or {}).items():
+            serie = self._angulos.setdefault(nombre, [None] * n)
+            serie.append(None if valor is None else round(float(valor), 1))
+        for nombre, serie in self._angulos.items():
+            if len(serie) < n + 1:
+                serie.append(None)
+
+    def _landmarks_cuantizados(self):
+        q = np.full((len(self._landmarks), 33, 3), SIN_DATO, dtype='<i2')
+        for i, puntos in enumerate(self._landmarks):
+            if puntos is None:
+                continue
+            xy = np.clip(np.rint(puntos[:, :2] * ESCALA_LANDMARKS), -32767, 32767)
+            vis = np.clip(np.rint(puntos[:, 3] * ESCALA_LANDMARKS), 0, ESCALA_LANDMARKS)
+            q[i, :, :2] = xy
+            q[i, :, 2] = vis
+        return q
+
+    def construir(self):
+        q = self._landmarks_cuantizados()
+        return {
+            'version': 1,
+            'fps': self.fps,
+            'width': self.width,
+            'height': self.height,
+            'frames': len(self._score),
+            'landmarks': {
+                'encoding': 'int16-le-base64',
+                'shape': list(q.shape),          # frames x 33 x [x, y, visibility]
+                'escala': ESCALA_LANDMARKS,
+                'sin_dato': SIN_DATO,
+                'data': base64.b64encode(q.tobytes()).decode('ascii'),
+            },
+            'score': self._score,
+            'feedback': self._feedback,
+            'feedback_tabla': list(self._tablas['feedback']),
+            'estado': self._estado,
+            'estado_tabla': list(self._tablas['estado']),
+            'repeticiones': self._reps,
+            'angulos': self._angulos,
+        }
+
+
+def serializar_track(payload):
+    """JSON compacto comprimido con gzip (servir con Content-Encoding: gzip)."""
+    data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return gzip.compress(data, compresslevel=6)
@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+
+
+class UploadError(Exception):
+    """Petición de subida inválida (rango fuera de límites, subida incompleta...)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Upload:
+    """Subida reanudable: archivo de trabajo preasignado + rangos de bytes ya recibidos."""
+
+    def __init__(self, path, size, filename=None):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.size = int(size)
+        self.filename = filename
+        self.rangos = []  # [[inicio, fin_exclusivo], ...] ordenados y fusionados
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.lock = threading.Lock()
+        self.escribiendo = 0   # PUT en curso (finalize/discard esperan a que terminen)
+        self.cerrada = False   # finalizada o descartada: no admite más trozos
+
+    def registrar(self, inicio, fin):
+        """Fusiona [inicio, fin) con los rangos recibidos."""
+        nuevos = []
+        for a, b in self.rangos:
+            if b < inicio or a > fin:
+                nuevos.append([a, b])
+            else:
+                inicio, fin = min(a, inicio), max(b, fin)
+        nuevos.append([inicio, fin])
+        nuevos.sort()
+        self.rangos = nuevos
+        self.updated_at = time.time()
+
+    @property
+    def recibidos(self):
+        return sum(b - a for a, b in self.rangos)
+
+    @property
+    def completa(self):
+        return self.rangos == [[0, self.size]]
+
+    def faltantes(self):
+        """Huecos [inicio, fin) aún no recibidos (para reanudar)."""
+        huecos, pos = [], 0
+        for a, b in self.rangos:
+            if a > pos:
+                huecos.append([pos, a])
+            pos = max(pos, b)
+        if pos < self.size:
+            huecos.append([pos, self.size])
+        return huecos
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'upload_id': self.id,
+                'size': self.size,
+                'received': self.recibidos,
+                'complete': self.completa,
+                'missing': self.faltantes(),
+            }
+
+
+class UploadManager:
+    """
+    Subidas por trozos: create -> PUT de rangos (escritos con pwrite directamente en el
+    archivo final) -> finalize, que entrega el archivo tal cual al análisis (sin copiarlo).
+    """
+
+    def __init__(self, directory=None, max_bytes=None, ttl=None):
+        self.directory = directory or os.environ.get(
+            'UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'posturepro_uploads'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('UPLOAD_MAX_BYTES', str(1024 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else int(os.environ.get('UPLOAD_TTL', '3600'))
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def create(self, size, filename=None):
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError('size debe ser un entero (bytes)')
+        if size <= 0:
+            raise UploadError('size debe ser mayor que 0')
+        if size > self.max_bytes:
+            raise UploadError(f'El video supera el máximo de {self.max_bytes} bytes', status=413)
+        self.purge_expired()
+        os.makedirs(self.directory, exist_ok=True)
+        ext = os.path.splitext(filename or '')[1].lower() or '.mp4'
+        fd, path = tempfile.mkstemp(suffix=ext, dir=self.directory)
+        try:
+            # Reservar el tamaño final: cada trozo se escribe en su offset
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        upload = Upload(path, size, filename)
+        with self._lock:
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id):
+        with self._lock:
+            return self._uploads.get(upload_id)
+
+    def write(self, upload, inicio, stream, length, chunk_size=1024 * 1024):
+        """Copia `length` bytes del stream de la petición al archivo en `inicio` (pwrite)."""
+        if inicio < 0 or length <= 0 or inicio + length > upload.size:
+            raise UploadError(f'Rango fuera del archivo (0-{upload.size - 1})', status=416)
+        with upload.lock:
+            if upload.cerrada:
+                raise UploadError('La subida ya fue finalizada o cancelada', status=410)
+            upload.escribiendo += 1
+        escritos = 0
+        try:
+            try:
+                fd = os.open(upload.path, os.O_WRONLY)
+            except OSError:
+                # Descartada o expirada entre get() y la escritura
+                raise UploadError('La subida ya no existe', status=410)
+            try:
+                while escritos < length:
+                    try:
+                        bloque = stream.read(min(chunk_size, length - escritos))
+                    except Exception:
+                        bloque = b''  # cliente desconectado a mitad del trozo
+                    if not bloque:
+                        break
+                    try:
+                        os.pwrite(fd, bloque, inicio + escritos)
+                    except OSError as e:
+                        raise UploadError(f'No se pudo escribir el trozo: {e}', status=500)
+                    escritos += len(bloque)
+            finally:
+                os.close(fd)
+        finally:
+            with upload.lock:
+                upload.escribiendo -= 1
+                # Solo se marca lo realmente escrito: si la conexión se corta, el cliente reanuda desde ahí
+                if escritos:
+                    upload.registrar(inicio, inicio + escritos)
+        if escritos < length:
+            raise UploadError('Trozo incompleto: la conexión se cortó antes de recibir todos los bytes')
+        return escritos
+
+    def finalize(self, upload):
+        """Saca la subida del registro y devuelve la ruta del archivo (pasa a ser del análisis)."""
+        self._cerrar(upload, completa=True)
+        with self._lock:
+            if self._uploads.pop(upload.id, None) is None:
+                raise UploadError('La subida ya fue finalizada', status=409)
+        return upload.path
+
+    def discard(self, upload):
+        """Cancela la subida y borra su archivo. UploadError (409) si hay un trozo escribiéndose."""
+        self._cerrar(upload)
+        with self._lock:
+            self._uploads.pop(upload.id, None)
+        try:
+            os.unlink(upload.path)
+        except OSError:
+            pass
+
+    def _cerrar(self, upload, completa=False):
+        """Marca la subida como cerrada (ningún PUT nuevo empieza) si no hay escrituras en curso."""
+        with upload.lock:
+            if upload.escribiendo:
+                raise UploadError('Hay un trozo subiéndose; reintenta cuando termine', status=409)
+            if completa and not upload.completa:
+                raise UploadError('La subida no está completa', status=409)
+            upload.cerrada = True
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expirados = [u for u in self._uploads.values() if now - u.updated_at > self.ttl]
+        for upload in expirados:
+            try:
+                self.discard(upload)
+            except UploadError:
+                pass  # con un PUT en curso no está abandonada
+
+
+# Instancia unica
+uploads = UploadManager()
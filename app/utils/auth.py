@@ -1,9 +1,13 @@
 import time
 import secrets
 from flask import request
+from sqlalchemy.orm import joinedload
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.extensions import db
 from app.models import User, SessionToken, PasswordResetToken
+from app.services.auth_cache import token_cache
+from app.services.maintenance import reset_token_ttl
+from app.services.metrics import tiempo_consulta_auth
 
 def hash_password(pw: str) -> str:
     return generate_password_hash(pw)
@@ -27,12 +31,24 @@ def generate_token(user_id: str, ttl_seconds: int = 24 * 3600) -> str:
     db.session.commit()
     return token
 
-def get_current_user():
+def get_bearer_token():
     auth = request.headers.get('Authorization', '')
     if not auth.startswith('Bearer '):
         return None
-    token = auth.split(' ', 1)[1].strip()
-    st = SessionToken.query.filter_by(token=token).first()
+    return auth.split(' ', 1)[1].strip() or None
+
+def get_current_user():
+    token = get_bearer_token()
+    if not token:
+        return None
+    # Caché token -> usuario: sin consultas a la BD en la mayoría de peticiones
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    # Sesión y usuario en una sola consulta (JOIN) en vez de cargar st.user aparte
+    t0 = time.perf_counter()
+    st = SessionToken.query.options(joinedload(SessionToken.user)).filter_by(token=token).first()
+    tiempo_consulta_auth.observe(time.perf_counter() - t0)
     if not st:
         return None
     if st.exp < int(time.time()):
@@ -40,7 +56,15 @@ def get_current_user():
         db.session.commit()
         return None
     u = st.user
-    return {'id': u.id, 'email': u.email, 'name': u.name}
+    user = {'id': u.id, 'email': u.email, 'name': u.name}
+    token_cache.put(token, user, st.exp)
+    return user
+
+def revoke_token(token: str) -> None:
+    """Cierra una sesión (logout): borra el token y su entrada en la caché."""
+    SessionToken.query.filter_by(token=token).delete()
+    db.session.commit()
+    token_cache.invalidate(token)
 
 def create_reset_token(user_id: str) -> str:
     token = secrets.token_urlsafe(24)
@@ -53,10 +77,12 @@ def pop_reset_token(token: str):
     if not rt:
         return None
     user_id = rt.user_id
+    expirado = rt.created_at < int(time.time()) - reset_token_ttl()
     db.session.delete(rt)
     db.session.commit()
-    return user_id
+    return None if expirado else user_id
 
 def invalidate_user_sessions(user_id: str) -> None:
     SessionToken.query.filter_by(user_id=user_id).delete()
-    db.session.commit()
\ No newline at end of file
+    db.session.commit()
+    token_cache.invalidate_user(user_id)
\ No newline at end of file
@@ -1,10 +1,7 @@
-import os, smtplib, ssl
+import os
 from email.message import EmailMessage
+from app.services.mail_dispatcher import mail_dispatcher, MailQueueFullError
 
-SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER")  # solo ENV
-SMTP_PASS = os.getenv("SMTP_PASS")  # solo ENV
 FRONTEND_URL = os.getenv("FRONTEND_URL")  # opcional
 
 def build_reset_link(reset_token: str) -> str:
@@ -19,13 +16,13 @@ def send_reset_email(to_email: str, reset_token: str):
     link = build_reset_link(reset_token)
 
     # Si no hay credenciales, solo loguea el enlace (dev)
-    if not (SMTP_USER and SMTP_PASS):
+    if not mail_dispatcher.configurado:
         print(f"[MAIL][DEBUG] Reset link: {link} (configura SMTP_USER/SMTP_PASS)")
         return
 
     msg = EmailMessage()
     msg["Subject"] = "Recuperación de contraseña"
-    msg["From"] = SMTP_USER
+    msg["From"] = mail_dispatcher.user
     msg["To"] = to_email
     msg.set_content(f"""
 Hola,
@@ -36,11 +33,8 @@ Enlace: {link}
 Si no solicitaste esto, ignora el correo.
 """.strip())
 
-    context = ssl.create_default_context()
+    # Se encola y vuelve de inmediato: el envío (y sus reintentos) corre en segundo plano
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as s:
-            s.starttls(context=context)
-            s.login(SMTP_USER, SMTP_PASS)
-            s.send_message(msg)
-    except Exception as e:
-        print(f"[MAIL][ERROR] {e}")
\ No newline at end of file
+        mail_dispatcher.enviar(msg)
+    except MailQueueFullError as e:
+        print(f"[MAIL][ERROR] {e}")
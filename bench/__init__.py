@@ -0,0 +1 @@
+"""Benchmark del analizador por etapas (python -m bench)."""
@@ -0,0 +1,181 @@
+"""
+Benchmark del analizador: frames/s y ms/frame por etapa sobre el video de ejemplo y clips
+sintéticos de varias resoluciones, fps y duraciones. Solo CPU y sin red.
+
+    python -m bench                      # mide y compara con bench/baseline.json (si existe)
+    python -m bench --guardar            # mide y guarda el resultado como nuevo baseline
+    python -m bench --rapido             # un solo clip sintético pequeño + el de ejemplo
+
+Sale con código 1 si alguna etapa es más lenta que el baseline por encima de su umbral.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import warnings
+
+# Ejecutable desde la raíz del repo sin instalar el paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Avisos de deprecación de protobuf que MediaPipe emite en cada análisis
+warnings.filterwarnings('ignore', category=UserWarning, module='google.protobuf')
+
+import cv2
+import numpy as np
+import mediapipe as mp
+from app.services.analyzer import AnalizadorEjercicios
+from bench.sintetico import clip_en_cache
+from bench.etapas import medir_clip
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+VIDEO_EJEMPLO = os.path.join(DIR_BENCH, '..', 'docs', 'video-ejemplo', 'video.mp4')
+BASELINE = os.path.join(DIR_BENCH, 'baseline.json')
+
+# (ancho, alto, fps, segundos)
+CLIPS = {
+    'rapido': [(640, 360, 30, 3)],
+    'completo': [
+        (640, 360, 30, 5),
+        (1280, 720, 30, 5),
+        (1920, 1080, 30, 5),
+        (1280, 720, 60, 5),
+        (1280, 720, 30, 20),
+    ],
+}
+
+UMBRAL_REGRESION = 0.25  # +25% de ms/frame
+RUIDO_MS = 0.05          # diferencias menores no cuentan (etapas de microsegundos)
+
+
+def maquina(calidad):
+    return {
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'mediapipe': mp.__version__,
+        'numpy': np.__version__,
+        'calidad': calidad,
+    }
+
+
+def ejecutar(args):
+    cache = os.environ.get('BENCH_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'posturepro-bench')
+    clips = [('ejemplo', os.path.abspath(VIDEO_EJEMPLO))]
+    for w, h, fps, seg in CLIPS['rapido' if args.rapido else 'completo']:
+        t = time.perf_counter()
+        ruta = clip_en_cache(cache, w, h, fps, seg)
+        print(f"[BENCH] Clip {os.path.basename(ruta)} listo ({time.perf_counter() - t:.1f}s)")
+        clips.append((f'sintetico_{h}p{fps}_{seg}s', ruta))
+
+    analizador = AnalizadorEjercicios(calidad=args.calidad)
+    analizador.calentar()
+    resultados = {}
+    respaldo = None
+    for nombre, ruta in clips:
+        t = time.perf_counter()
+        meta, etapas, detectados = medir_clip(analizador, ruta, max_frames=args.max_frames,
+                                              landmarks_respaldo=respaldo, completo=not args.sin_completo)
+        # Los landmarks del video real alimentan a los analizadores en los clips sin persona detectada
+        if respaldo is None and detectados:
+            respaldo = detectados
+        resultados[nombre] = {'clip': meta, 'etapas': etapas}
+        print(f"[BENCH] {nombre}: {meta['frames_medidos']} frames en {time.perf_counter() - t:.1f}s "
+              f"(persona en {meta['persona_detectada']:.0%})")
+    analizador.close()
+    return resultados
+
+
+def comparar(resultados, baseline):
+    """Filas (clip, etapa, ms, ms_base, variación, regresión) para las etapas presentes en ambos."""
+    umbral_general = baseline.get('umbral_regresion', UMBRAL_REGRESION)
+    umbrales = baseline.get('umbrales', {})
+    filas = []
+    for clip, datos in resultados.items():
+        base_clip = baseline.get('resultados', {}).get(clip, {}).get('etapas', {})
+        for etapa, fila in datos['etapas'].items():
+            base = base_clip.get(etapa)
+            if not base or not base.get('ms_por_frame'):
+                filas.append((clip, etapa, fila['ms_por_frame'], None, None, False))
+                continue
+            ms, ms_base = fila['ms_por_frame'], base['ms_por_frame']
+            variacion = ms / ms_base - 1.0
+            regresion = variacion > umbrales.get(etapa, umbral_general) and ms - ms_base > RUIDO_MS
+            filas.append((clip, etapa, ms, ms_base, variacion, regresion))
+    return filas
+
+
+def imprimir(resultados, filas_comparacion=None):
+    comparacion = {(c, e): (b, v, r) for c, e, _, b, v, r in (filas_comparacion or [])}
+    print(f"\n{'clip':<26} {'etapa':<26} {'frames':>6} {'ms/frame':>10} {'p95 ms':>9} {'fps':>9} {'vs base':>9}")
+    for clip, datos in resultados.items():
+        for etapa, fila in datos['etapas'].items():
+            base, variacion, regresion = comparacion.get((clip, etapa), (None, None, False))
+            delta = '' if variacion is None else f'{variacion:+.0%}' + (' !' if regresion else '')
+            p95 = '' if fila['p95_ms'] is None else f"{fila['p95_ms']:.2f}"
+            fps = '' if fila['fps'] is None else f"{fila['fps']:.1f}"
+            print(f"{clip:<26} {etapa:<26} {fila['frames']:>6} {fila['ms_por_frame']:>10.3f} {p95:>9} {fps:>9} {delta:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark por etapas del analizador')
+    parser.add_argument('--rapido', action='store_true', help='solo el video de ejemplo y un clip sintético pequeño')
+    parser.add_argument('--calidad', default=None, help='fast | balanced | accurate (por defecto POSE_QUALITY)')
+    parser.add_argument('--max-frames', type=int, default=300, help='frames medidos por clip (etapas individuales)')
+    parser.add_argument('--sin-completo', action='store_true', help='no medir analizar_video_completo')
+    parser.add_argument('--baseline', default=BASELINE, help='archivo de baseline (JSON)')
+    parser.add_argument('--guardar', action='store_true', help='guardar esta ejecución como baseline')
+    parser.add_argument('--umbral', type=float, default=None,
+                        help=f'regresión máxima tolerada en ms/frame (por defecto la del baseline o {UMBRAL_REGRESION})')
+    parser.add_argument('--salida', default=None, help='guardar también los resultados en este JSON')
+    args = parser.parse_args(argv)
+
+    resultados = ejecutar(args)
+    datos = {'maquina': maquina(args.calidad or os.environ.get('POSE_QUALITY', 'accurate')), 'resultados': resultados}
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if args.umbral is not None:
+            baseline['umbral_regresion'] = args.umbral
+
+    filas = comparar(resultados, baseline) if baseline and not args.guardar else None
+    imprimir(resultados, filas)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+
+    if args.guardar:
+        # Conserva los umbrales por etapa ajustados a mano en el baseline anterior
+        nuevo = {
+            'umbral_regresion': args.umbral if args.umbral is not None else (baseline or {}).get('umbral_regresion', UMBRAL_REGRESION),
+            'umbrales': (baseline or {}).get('umbrales', {'pose.process': 0.30, '_ensure_h264_mp4': 0.40}),
+            **datos,
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(nuevo, f, indent=2, ensure_ascii=False)
+        print(f"\n[BENCH] Baseline guardado en {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\n[BENCH] Sin baseline en {args.baseline}; usa --guardar para crearlo")
+        return 0
+    if baseline.get('maquina') != datos['maquina']:
+        print("[BENCH][WARN] El baseline se midió en otra máquina o con otras versiones; "
+              "las diferencias pueden no deberse al código")
+    regresiones = [f for f in filas if f[5]]
+    for clip, etapa, ms, ms_base, variacion, _ in regresiones:
+        print(f"[BENCH][REGRESION] {clip} / {etapa}: {ms_base:.3f} -> {ms:.3f} ms/frame ({variacion:+.0%})")
+    if not regresiones:
+        print("\n[BENCH] Sin regresiones respecto al baseline")
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Medición por etapas del análisis de un clip: cada frame pasa por las mismas etapas que en
+analizar_video_completo, pero en serie y cronometrando cada una por separado.
+"""
+import os
+import time
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from app.services.analyzer import SesionAnalisis, umbrales_reps
+from app.services.encoder import FfmpegPipeWriter, ffmpeg_disponible
+from app.services.landmarks import landmarks_a_array
+
+EJERCICIOS = ('sentadilla', 'desplantes', 'press_banca')
+
+
+class Cronometro:
+    """Tiempos por frame de cada etapa (+ costes fijos como cerrar el encoder, repartidos por frame)."""
+
+    def __init__(self):
+        self.muestras = {}
+        self.extra = {}
+
+    def medir(self, etapa, inicio):
+        self.muestras.setdefault(etapa, []).append(time.perf_counter() - inicio)
+
+    def sumar_extra(self, etapa, segundos):
+        self.extra[etapa] = self.extra.get(etapa, 0.0) + segundos
+
+    def resumen(self, frames_por_etapa=None):
+        salida = {}
+        for etapa, muestras in self.muestras.items():
+            arr = np.asarray(muestras)
+            frames = (frames_por_etapa or {}).get(etapa, len(arr))
+            total = float(arr.sum()) + self.extra.get(etapa, 0.0)
+            salida[etapa] = _fila(frames, total, float(np.percentile(arr, 95)) * 1000.0)
+        return salida
+
+
+def _fila(frames, segundos, p95_ms=None):
+    ms = 1000.0 * segundos / frames if frames else 0.0
+    return {
+        'frames': int(frames),
+        'ms_por_frame': round(ms, 3),
+        'p95_ms': round(p95_ms, 3) if p95_ms is not None else None,
+        'fps': round(1000.0 / ms, 1) if ms > 0 else None,
+    }
+
+
+def medir_clip(analizador, ruta, max_frames=300, calentamiento=5, landmarks_respaldo=None, completo=True):
+    """
+    Recorre hasta `max_frames` frames del clip midiendo decode, resize (si POSE_INFERENCE_MAX_SIDE
+    lo pide), cvtColor, pose.process, los analizadores de cada ejercicio, agregar_overlay_feedback
+    y la escritura con cv2.VideoWriter y con ffmpeg; después _ensure_h264_mp4 sobre el MP4 escrito
+    y, si `completo`, analizar_video_completo sobre el clip entero.
+
+    Los primeros `calentamiento` frames no cuentan (carga del modelo, cachés). Si MediaPipe no
+    encuentra persona, los analizadores y el overlay usan `landmarks_respaldo` (track del video
+    de ejemplo) para que su coste se mida igualmente.
+    Devuelve (meta del clip, {etapa: {frames, ms_por_frame, p95_ms, fps}}, landmarks detectados).
+    """
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise RuntimeError(f'No se pudo abrir {ruta}')
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    tamano = analizador.resolver_tamano_inferencia(width, height)
+
+    analizador.nueva_sesion()
+    sesiones = {}
+    for tipo in EJERCICIOS:
+        sesiones[tipo] = SesionAnalisis()
+        sesiones[tipo].umbrales = umbrales_reps(tipo)
+
+    tmpdir = tempfile.mkdtemp(prefix='bench_')
+    ruta_cv = os.path.join(tmpdir, 'salida_cv.mp4')
+    writer_cv = cv2.VideoWriter(ruta_cv, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    writer_ff = FfmpegPipeWriter(os.path.join(tmpdir, 'salida_ff.mp4'), fps, (width, height)) if ffmpeg_disponible() else None
+
+    crono = Cronometro()
+    detectados = []
+    con_persona = 0
+    escritos = 0
+    try:
+        idx = 0
+        while idx < max_frames:
+            t = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            idx += 1
+            medir = idx > calentamiento
+            if medir:
+                crono.medir('decode', t)
+
+            entrada = frame
+            if tamano is not None:
+                t = time.perf_counter()
+                entrada = cv2.resize(frame, tamano, interpolation=cv2.INTER_AREA)
+                if medir:
+                    crono.medir('resize', t)
+            t = time.perf_counter()
+            rgb = cv2.cvtColor(entrada, cv2.COLOR_BGR2RGB)
+            if medir:
+                crono.medir('cvtColor', t)
+            t = time.perf_counter()
+            results = analizador.pose.process(rgb)
+            if medir:
+                crono.medir('pose.process', t)
+
+            puntos = landmarks_a_array(results.pose_landmarks)
+            if puntos is not None:
+                con_persona += 1
+                detectados.append(puntos)
+            elif landmarks_respaldo:
+                puntos = landmarks_respaldo[idx % len(landmarks_respaldo)]
+
+            timestamp = idx / fps
+            if puntos is not None:
+                resultado = None
+                for tipo in EJERCICIOS:
+                    t = time.perf_counter()
+                    r = analizador._analizar_frame(sesiones[tipo], tipo, puntos, frame.shape, timestamp)
+                    if medir:
+                        crono.medir(f'analisis.{tipo}', t)
+                    resultado = resultado or r
+                t = time.perf_counter()
+                frame = analizador.agregar_overlay_feedback(frame, resultado['feedback_data'], resultado['repeticiones'],
+                                                            timestamp, resultado['estado'])
+                if medir:
+                    crono.medir('agregar_overlay_feedback', t)
+
+            t = time.perf_counter()
+            writer_cv.write(frame)
+            if medir:
+                crono.medir('VideoWriter.write', t)
+            if writer_ff is not None:
+                t = time.perf_counter()
+                writer_ff.write(frame)
+                if medir:
+                    crono.medir('FfmpegPipeWriter.write', t)
+            escritos += 1
+        cap.release()
+
+        # Cerrar los encoders vacía sus buffers: parte del coste de escribir
+        t = time.perf_counter()
+        writer_cv.release()
+        crono.sumar_extra('VideoWriter.write', time.perf_counter() - t)
+        if writer_ff is not None:
+            t = time.perf_counter()
+            writer_ff.release()
+            crono.sumar_extra('FfmpegPipeWriter.write', time.perf_counter() - t)
+
+        etapas = crono.resumen()
+        if ffmpeg_disponible() and escritos:
+            t = time.perf_counter()
+            salida = analizador._ensure_h264_mp4(ruta_cv, fps)
+            if salida:
+                etapas['_ensure_h264_mp4'] = _fila(escritos, time.perf_counter() - t)
+
+        if completo:
+            t = time.perf_counter()
+            ruta_out, _ = analizador.analizar_video_completo(ruta, 'sentadilla')
+            segundos = time.perf_counter() - t
+            try:
+                os.unlink(ruta_out)
+            except OSError:
+                pass
+            etapas['analizar_video_completo'] = _fila(total_frames or escritos, segundos)
+    finally:
+        cap.release()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    meta = {
+        'width': width,
+        'height': height,
+        'fps': round(fps, 2),
+        'frames_medidos': max(0, min(escritos, max_frames) - calentamiento),
+        'frames_totales': total_frames,
+        'persona_detectada': round(con_persona / escritos, 3) if escritos else 0.0,
+        'inferencia': list(tamano or (width, height)),
+    }
+    return meta, etapas, detectados
@@ -0,0 +1,126 @@
+"""
+Cliente de prueba del modo en vivo: reproduce un video como si fuera una webcam (JPEG al
+ritmo del video), lee el feedback por SSE e informa la latencia extremo a extremo.
+
+    python scripts/live_client.py --url http://localhost:5000 --exercise sentadilla
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+import cv2
+import numpy as np
+
+VIDEO_EJEMPLO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'video-ejemplo', 'video.mp4')
+
+
+def conectar(url):
+    partes = urlsplit(url)
+    clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+    return clase(partes.hostname, partes.port, timeout=30)
+
+
+def pedir(conn, metodo, ruta, body=None, headers=None):
+    conn.request(metodo, ruta, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read() or b'{}')
+
+
+def leer_eventos(url, ruta, resultados, fin):
+    """Hilo lector del stream SSE: guarda (recibido, evento) por cada 'feedback'."""
+    conn = conectar(url)
+    conn.request('GET', ruta, headers={'Accept': 'text/event-stream'})
+    resp = conn.getresponse()
+    evento = None
+    for linea in resp:
+        linea = linea.decode('utf-8').rstrip('\n')
+        if linea.startswith('event: '):
+            evento = linea[7:]
+        elif linea.startswith('data: '):
+            data = json.loads(linea[6:])
+            if evento == 'feedback':
+                resultados.append((time.perf_counter(), data))
+            elif evento == 'closed':
+                fin['stats'] = data
+                break
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--video', default=VIDEO_EJEMPLO)
+    parser.add_argument('--exercise', default='sentadilla')
+    parser.add_argument('--quality', default=None)
+    parser.add_argument('--fps', type=float, default=0, help='ritmo de envío (0 = fps del video)')
+    parser.add_argument('--max-side', type=int, default=640, help='lado mayor del JPEG enviado')
+    parser.add_argument('--jpeg-quality', type=int, default=80)
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        sys.exit(f'No se pudo abrir {args.video}')
+    fps = args.fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    conn = conectar(args.url)
+    body = {'exercise_type': args.exercise}
+    if args.quality:
+        body['quality'] = args.quality
+    status, sesion = pedir(conn, 'POST', '/api/live/sessions', json.dumps(body), {'Content-Type': 'application/json'})
+    if status != 201:
+        sys.exit(f'No se pudo abrir la sesión ({status}): {sesion}')
+    print(f"Sesión {sesion['session_id']} (objetivo {sesion['objetivo_latencia_ms']} ms)")
+
+    resultados, fin = [], {}
+    lector = threading.Thread(target=leer_eventos, args=(args.url, sesion['events_url'], resultados, fin), daemon=True)
+    lector.start()
+
+    enviados = 0
+    inicio = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        lado = max(frame.shape[:2])
+        if args.max_side and lado > args.max_side:
+            escala = args.max_side / lado
+            frame = cv2.resize(frame, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+        # Ritmo de cámara: el frame n sale en inicio + n / fps
+        espera = inicio + enviados / fps - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        status, _ = pedir(conn, 'POST', sesion['frames_url'], jpeg.tobytes(), {
+            'Content-Type': 'image/jpeg',
+            'X-Frame-Timestamp': f'{enviados / fps:.4f}',
+            'X-Client-Timestamp': f'{time.perf_counter() * 1000:.3f}',
+        })
+        if status != 202:
+            print(f'Frame rechazado ({status})')
+        enviados += 1
+    cap.release()
+
+    time.sleep(0.5)  # últimos resultados en vuelo
+    pedir(conn, 'DELETE', f"/api/live/sessions/{sesion['session_id']}")
+    lector.join(timeout=5)
+    conn.close()
+
+    e2e = np.array([recibido * 1000 - float(r['client_ts']) for recibido, r in resultados if 'client_ts' in r])
+    stats = fin.get('stats', {})
+    print(f"Frames enviados: {enviados} a {fps:.1f} fps | resultados: {len(resultados)} | "
+          f"descartados: {stats.get('frames_descartados')}")
+    if e2e.size:
+        p50, p95 = np.percentile(e2e, [50, 95])
+        objetivo = sesion['objetivo_latencia_ms']
+        print(f"Latencia extremo a extremo: p50 {p50:.1f} ms, p95 {p95:.1f} ms "
+              f"({np.mean(e2e <= objetivo) * 100:.0f}% dentro de {objetivo:.0f} ms)")
+    print(f"Latencia servidor: p50 {stats.get('latencia_p50_ms')} ms, p95 {stats.get('latencia_p95_ms')} ms")
+    print(f"Repeticiones: {stats.get('repeticiones')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import zlib
+
+import pytest
+
+from app.services.history import (
+    empaquetar_timeline, desempaquetar_timeline, empaquetar_intervalos, desempaquetar_intervalos,
+)
+
+
+def test_timeline_ida_y_vuelta():
+    timeline = {'segundos_por_punto': 0.25, 'score_medio': [100, 87, None, 0, 55, None]}
+    assert desempaquetar_timeline(empaquetar_timeline(timeline)) == timeline
+
+
+def test_timeline_redondea_y_acota_scores():
+    timeline = {'segundos_por_punto': 0.1, 'score_medio': [99.6, 101.0, -3.0, 12.4]}
+    datos = desempaquetar_timeline(empaquetar_timeline(timeline))
+    assert datos['score_medio'] == [100, 100, 0, 12]
+    assert datos['segundos_por_punto'] == pytest.approx(0.1)
+
+
+def test_timeline_vacia():
+    datos = desempaquetar_timeline(empaquetar_timeline({}))
+    assert datos == {'segundos_por_punto': 0.0, 'score_medio': []}
+
+
+def test_intervalos_ida_y_vuelta():
+    intervalos = [
+        {'error': 'Espalda muy inclinada!', 'inicio': 0.5, 'fin': 1.25, 'frames': 23},
+        {'error': 'Rodilla delantera muy adelante', 'inicio': 2.0, 'fin': 2.4, 'frames': 12},
+        {'error': 'Espalda muy inclinada!', 'inicio': 3.1, 'fin': 4.0, 'frames': 27},
+        {'error': 'Mantén el torso más erguido', 'inicio': 75.33, 'fin': 80.0, 'frames': 140},
+    ]
+    assert desempaquetar_intervalos(empaquetar_intervalos(intervalos)) == intervalos
+
+
+def test_intervalos_vacios():
+    assert desempaquetar_intervalos(empaquetar_intervalos([])) == []
+
+
+def test_intervalos_mensajes_repetidos_se_guardan_una_vez():
+    intervalos = [{'error': 'Manten rodillas niveladas', 'inicio': i, 'fin': i + 0.5, 'frames': 15} for i in range(200)]
+    blob = empaquetar_intervalos(intervalos)
+    assert zlib.decompress(blob).count('Manten rodillas niveladas'.encode('utf-8')) == 1
+    assert desempaquetar_intervalos(blob) == intervalos
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.services.kinematics import calcular_cinematica, cinematica_frame, cinematica_frame_rapida
+
+
+def _track(frames, semilla=0):
+    rng = np.random.default_rng(semilla)
+    track = np.empty((frames, 33, 4))
+    track[..., :2] = rng.uniform(0.0, 1.0, (frames, 33, 2))
+    track[..., 2] = rng.uniform(-0.5, 0.5, (frames, 33))
+    track[..., 3] = 1.0
+    return track
+
+
+def test_ruta_escalar_identica_a_la_vectorizada():
+    track = _track(500)
+    cinematica = calcular_cinematica(track)
+    for i, puntos in enumerate(track):
+        assert cinematica_frame_rapida(puntos) == cinematica_frame(cinematica, i)
+
+
+def test_angulos_conocidos():
+    puntos = np.zeros((33, 4))
+    puntos[:, 3] = 1.0
+    # Pierna derecha en ángulo recto: cadera (24) sobre la rodilla (26), tobillo (28) delante
+    puntos[24, :2] = (0.5, 0.4)
+    puntos[26, :2] = (0.5, 0.6)
+    puntos[28, :2] = (0.7, 0.6)
+    # Hombro derecho (12) justo encima de la cadera: torso vertical
+    puntos[12, :2] = (0.5, 0.1)
+    cin = cinematica_frame_rapida(puntos)
+    assert cin['rodilla_der'] == pytest.approx(90.0)
+    assert cin['torso'] == pytest.approx(0.0)
+
+
+def test_puntos_coincidentes_sin_angulo():
+    puntos = np.zeros((33, 4))
+    cin = cinematica_frame_rapida(puntos)
+    assert cin['rodilla_izq'] is None and cin['torso'] is None
+    assert cin == cinematica_frame(calcular_cinematica(puntos))
+
+
+def test_flexion_solo_bajo_demanda():
+    track = _track(4)
+    assert 'flexion' not in calcular_cinematica(track)
+    assert calcular_cinematica(track, flexion=True)['flexion'].shape == (4,)
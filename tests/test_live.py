@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from app.services import live
+from app.services.analyzer import SesionAnalisis
+from app.services.live import LiveSessionManager, LiveSessionError
+
+
+class AnalizadorFalso:
+    calidad = 'fast'
+
+    def nueva_sesion(self):
+        return SesionAnalisis()
+
+
+class PoolFalso:
+    """Pool de `libres` analizadores; adquirir tarda `espera` segundos (como crear un grafo)."""
+
+    def __init__(self, libres, espera=0.0):
+        self.libres = libres
+        self.espera = espera
+        self.prestados = 0
+        self._lock = threading.Lock()
+
+    def adquirir(self, calidad=None, timeout=None):
+        time.sleep(self.espera)
+        with self._lock:
+            if self.prestados >= self.libres:
+                raise TimeoutError('No hay analizadores disponibles en el pool')
+            self.prestados += 1
+        return AnalizadorFalso()
+
+    def liberar(self, analizador):
+        with self._lock:
+            self.prestados -= 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = PoolFalso(libres=10)
+    monkeypatch.setattr(live, 'analyzer_pool', pool)
+    return pool
+
+
+def _cerrar_todas(manager, sesiones):
+    for session in sesiones:
+        session.close()
+    limite = time.monotonic() + 2
+    while manager.count() and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_limite_de_sesiones(pool):
+    manager = LiveSessionManager(max_sessions=2, idle_timeout=30)
+    sesiones = [manager.create('sentadilla'), manager.create('sentadilla')]
+    with pytest.raises(LiveSessionError) as e:
+        manager.create('sentadilla')
+    assert e.value.status == 503
+    assert manager.count() == 2 and pool.prestados == 2
+    _cerrar_todas(manager, sesiones)
+    assert manager.count() == 0 and pool.prestados == 0
+
+
+def test_creaciones_simultaneas_no_superan_el_limite(pool):
+    pool.espera = 0.1  # la plaza debe quedar reservada mientras se espera al pool
+    manager = LiveSessionManager(max_sessions=2, idle_timeout=30)
+    creadas, rechazadas = [], []
+
+    def crear():
+        try:
+            creadas.append(manager.create('sentadilla'))
+        except LiveSessionError as e:
+            rechazadas.append(e.status)
+
+    hilos = [threading.Thread(target=crear) for _ in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(creadas) == 2 and rechazadas == [503] * 4
+    assert manager.count() == 2 and manager._reservadas == 0
+    _cerrar_todas(manager, creadas)
+
+
+def test_timeout_del_pool_libera_la_plaza(pool):
+    pool.libres = 0
+    manager = LiveSessionManager(max_sessions=1, idle_timeout=30)
+    with pytest.raises(LiveSessionError) as e:
+        manager.create('sentadilla')
+    assert e.value.status == 503
+    assert manager._reservadas == 0
+    pool.libres = 1
+    session = manager.create('sentadilla')
+    assert manager.get(session.id) is session
+    _cerrar_todas(manager, [session])
+
+
+def test_parametros_invalidos(pool):
+    manager = LiveSessionManager(max_sessions=1)
+    with pytest.raises(LiveSessionError) as e:
+        manager.create('sentadilla', calidad='ultra')
+    assert e.value.status == 400
+    with pytest.raises(LiveSessionError):
+        manager.create('sentadilla', umbrales={'desconocido': 1})
+    assert manager.count() == 0 and pool.prestados == 0
+
+
+def test_sesion_inactiva_se_cierra(pool):
+    manager = LiveSessionManager(max_sessions=1, idle_timeout=0.05)
+    session = manager.create('sentadilla')
+    limite = time.monotonic() + 2
+    while manager.count() and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert session.cerrada and manager.count() == 0 and pool.prestados == 0
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from app.services.reps import (
+    SerieReps, rellenar_huecos, suavizar_serie, segmentar_repeticiones, segmentar_serie,
+)
+
+FPS = 30
+
+
+def _serie(reps, alto=170.0, bajo=85.0, segundos_rep=2.0, pausa=0.5, ruido=0.0, semilla=0):
+    """Ángulo sintético: `reps` ciclos alto -> bajo -> alto (coseno) separados por pausas arriba."""
+    pausa = np.full(int(pausa * FPS), alto)
+    t = np.linspace(0, 2 * np.pi, int(segundos_rep * FPS))
+    ciclo = bajo + (alto - bajo) * (1 + np.cos(t)) / 2
+    serie = np.concatenate([pausa] + [np.concatenate((ciclo, pausa)) for _ in range(reps)])
+    if ruido:
+        serie = serie + np.random.default_rng(semilla).normal(0, ruido, len(serie))
+    return serie
+
+
+def test_cuenta_repeticiones_y_tiempos():
+    reps = segmentar_repeticiones(_serie(4), FPS, bajo=100, alto=160)
+    assert len(reps) == 4
+    for rep in reps:
+        inicio, fondo, fin = rep['frames']
+        assert inicio < fondo < fin
+        assert rep['angulo_min'] == pytest.approx(85.0, abs=0.5)
+        assert 1.0 <= rep['duracion_s'] <= 2.1
+    # Fondos separados por un ciclo completo (rep + pausa)
+    fondos = [r['fondo'] for r in reps]
+    assert np.diff(fondos) == pytest.approx(2.5, abs=0.1)
+
+
+def test_ruido_de_landmarks_no_crea_repeticiones():
+    assert len(segmentar_repeticiones(_serie(3, ruido=3.0), FPS, bajo=100, alto=160)) == 3
+
+
+def test_repeticion_poco_profunda_no_cuenta():
+    assert segmentar_repeticiones(_serie(3, bajo=120.0), FPS, bajo=100, alto=160) == []
+
+
+def test_repeticion_demasiado_corta_no_cuenta():
+    serie = _serie(3, segundos_rep=0.3)
+    assert segmentar_repeticiones(serie, FPS, bajo=100, alto=160) == []
+    assert len(segmentar_repeticiones(serie, FPS, bajo=100, alto=160, duracion_min=0.1)) == 3
+
+
+def test_huecos_sin_persona_se_interpolan():
+    serie = _serie(3)
+    serie[40:50] = np.nan
+    assert len(segmentar_repeticiones(serie, FPS, bajo=100, alto=160)) == 3
+    rellena = rellenar_huecos([np.nan, 10.0, np.nan, 30.0, 40.0, np.nan])
+    assert rellena.tolist() == [10.0, 10.0, 20.0, 30.0, 40.0, 40.0]
+    assert rellenar_huecos([np.nan, 1.0, 2.0, np.nan]) is None
+    assert segmentar_repeticiones(np.full(10, np.nan), FPS, bajo=100, alto=160) == []
+
+
+def test_suavizar_serie_es_mediana_centrada():
+    serie = np.array([1.0, 1.0, 50.0, 1.0, 1.0, 2.0, 3.0])
+    suave = suavizar_serie(serie, ventana=3)
+    assert suave.tolist() == [1.0, 1.0, 1.0, 1.0, 1.0, 2.0, 3.0]
+    assert len(suave) == len(serie)
+
+
+def test_serie_reps_pierna_delantera():
+    serie = SerieReps('desplantes')
+    serie.agregar({'rodilla_izq': 120.0, 'rodilla_der': 150.0})
+    serie.agregar({'rodilla_izq': None, 'rodilla_der': 140.0})
+    serie.agregar({'rodilla_izq': None, 'rodilla_der': None})
+    serie.agregar(None)
+    valores = serie.serie()
+    assert valores[:2].tolist() == [120.0, 140.0]
+    assert np.isnan(valores[2:]).all()
+
+
+def test_segmentar_serie_resumen():
+    umbrales = {'bajo': 100, 'alto': 160}
+    resumen = segmentar_serie(_serie(2), 'sentadilla', FPS, umbrales)
+    assert resumen['serie'] == 'rodilla_der'
+    assert resumen['repeticiones'] == 2
+    assert resumen['angulo_min_medio'] == pytest.approx(85.0, abs=0.5)
+    assert segmentar_serie(_serie(2), 'otro', FPS, umbrales) is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from app.services.smoothing import MedianaMovil, OneEuro, SuavizadorSesion
+
+
+def test_mediana_movil_igual_a_np_median():
+    valores = np.random.default_rng(1).normal(120, 15, 300)
+    mediana = MedianaMovil(7)
+    for i, v in enumerate(valores):
+        assert mediana.agregar(v) == np.median(valores[max(0, i - 6):i + 1])
+
+
+def test_one_euro_primera_muestra_y_reposo():
+    filtro = OneEuro()
+    assert filtro.filtrar(90.0, 0.0) == 90.0
+    for i in range(1, 60):
+        assert filtro.filtrar(90.0, i / 30) == pytest.approx(90.0)
+
+
+def test_one_euro_suaviza_temblor():
+    rng = np.random.default_rng(2)
+    crudos = 150 + rng.normal(0, 2.0, 300)
+    filtro = OneEuro()
+    filtrados = np.array([filtro.filtrar(v, i / 30) for i, v in enumerate(crudos)])
+    assert np.std(np.diff(filtrados)) < np.std(np.diff(crudos)) / 3
+
+
+def test_one_euro_desactivado_por_defecto(monkeypatch):
+    monkeypatch.delenv('SMOOTHING_ONE_EURO', raising=False)
+    assert SuavizadorSesion().one_euro == {}
+    monkeypatch.setenv('SMOOTHING_ONE_EURO', '1')
+    assert set(SuavizadorSesion().one_euro) == {'rodilla_delantera', 'rodilla_izq', 'rodilla_der'}
+
+
+def test_suavizador_senales_sin_dato():
+    suavizador = SuavizadorSesion(one_euro=True)
+    suave = suavizador.actualizar({'torso': 10.0, 'rodilla_izq': 100.0}, 0.0)
+    assert suave == {'torso': 10.0, 'rodilla_delantera': None, 'rodilla_izq': 100.0, 'rodilla_der': None}
+    suavizador.actualizar({'torso': 20.0}, 1 / 30)
+    assert suavizador.mediana('torso') == 15.0
+    assert suavizador.mediana('rodilla_izq') == 100.0
+    suavizador.reset()
+    assert suavizador.mediana('torso') is None
@@ -0,0 +1,142 @@
+import io
+import os
+
+import pytest
+from flask import Flask
+
+from app.routes import api
+from app.services.uploads import UploadManager, UploadError
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return UploadManager(directory=str(tmp_path), max_bytes=1000, ttl=3600)
+
+
+@pytest.fixture
+def client(manager, monkeypatch):
+    monkeypatch.setattr(api, 'uploads', manager)
+    app = Flask(__name__)
+    app.register_blueprint(api.api_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def _put(client, upload_id, datos, inicio, total):
+    return client.put(f'/api/uploads/{upload_id}', data=datos,
+                      headers={'Content-Range': f'bytes {inicio}-{inicio + len(datos) - 1}/{total}'})
+
+
+# --- Content-Range ---------------------------------------------------------------------------
+
+def test_content_range_valido():
+    assert api._parse_content_range('bytes 0-99/1000', 1000) == (0, 100)
+    assert api._parse_content_range('bytes 900-999/*', 1000) == (900, 100)
+
+
+@pytest.mark.parametrize('cabecera', [
+    'items 0-9/1000',      # unidad
+    'bytes 0-9/999',       # total distinto del tamaño de la subida
+    'bytes 10-9/1000',     # rango vacío
+    'bytes a-9/1000',
+    'bytes 0-9',
+])
+def test_content_range_invalido(cabecera):
+    with pytest.raises(ValueError):
+        api._parse_content_range(cabecera, 1000)
+
+
+# --- UploadManager ---------------------------------------------------------------------------
+
+def test_trozos_desordenados_y_solapados(manager):
+    upload = manager.create(10)
+    manager.write(upload, 6, io.BytesIO(b'ghij'), 4)
+    manager.write(upload, 0, io.BytesIO(b'abc'), 3)
+    assert upload.faltantes() == [[3, 6]]
+    assert upload.recibidos == 7
+    manager.write(upload, 2, io.BytesIO(b'cdef'), 4)
+    assert upload.rangos == [[0, 10]] and upload.completa
+    path = manager.finalize(upload)
+    with open(path, 'rb') as f:
+        assert f.read() == b'abcdefghij'
+    assert manager.get(upload.id) is None
+
+
+def test_trozo_cortado_solo_registra_lo_escrito(manager):
+    upload = manager.create(10)
+    with pytest.raises(UploadError) as e:
+        manager.write(upload, 0, io.BytesIO(b'abcd'), 8)
+    assert e.value.status == 400
+    assert upload.rangos == [[0, 4]]
+    assert upload.faltantes() == [[4, 10]]
+
+
+def test_rango_fuera_del_archivo(manager):
+    upload = manager.create(10)
+    with pytest.raises(UploadError) as e:
+        manager.write(upload, 8, io.BytesIO(b'abcd'), 4)
+    assert e.value.status == 416
+
+
+def test_finalize_incompleta_y_repetida(manager):
+    upload = manager.create(4)
+    manager.write(upload, 0, io.BytesIO(b'ab'), 2)
+    with pytest.raises(UploadError) as e:
+        manager.finalize(upload)
+    assert e.value.status == 409
+    manager.write(upload, 2, io.BytesIO(b'cd'), 2)
+    manager.finalize(upload)
+    with pytest.raises(UploadError) as e:
+        manager.write(upload, 0, io.BytesIO(b'ab'), 2)
+    assert e.value.status == 410
+
+
+def test_discard_borra_el_archivo(manager):
+    upload = manager.create(4)
+    manager.discard(upload)
+    assert not os.path.exists(upload.path)
+    with pytest.raises(UploadError) as e:
+        manager.write(upload, 0, io.BytesIO(b'ab'), 2)
+    assert e.value.status == 410
+
+
+def test_tamano_maximo(manager):
+    with pytest.raises(UploadError) as e:
+        manager.create(1001)
+    assert e.value.status == 413
+
+
+# --- rutas -----------------------------------------------------------------------------------
+
+def test_subida_por_trozos(client):
+    r = client.post('/api/uploads', json={'size': 8, 'filename': 'v.mp4'})
+    assert r.status_code == 201
+    upload_id = r.get_json()['upload_id']
+
+    r = _put(client, upload_id, b'efgh', 4, 8)
+    assert r.status_code == 200
+    assert r.get_json()['missing'] == [[0, 4]]
+
+    # Reanudar: el estado indica qué falta
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['missing'] == [[0, 4]]
+    r = _put(client, upload_id, b'abcd', 0, 8)
+    assert r.get_json()['complete'] is True
+
+
+def test_put_sin_content_range_o_con_longitud_distinta(client):
+    upload_id = client.post('/api/uploads', json={'size': 8}).get_json()['upload_id']
+    assert client.put(f'/api/uploads/{upload_id}', data=b'abcd').status_code == 400
+    r = client.put(f'/api/uploads/{upload_id}', data=b'abcd', headers={'Content-Range': 'bytes 0-5/8'})
+    assert r.status_code == 400
+
+
+def test_finalize_borra_el_archivo_si_no_se_encola(client, manager, monkeypatch):
+    upload_id = client.post('/api/uploads', json={'size': 4}).get_json()['upload_id']
+    _put(client, upload_id, b'abcd', 0, 4)
+    path = manager.get(upload_id).path
+
+    def falla(video_path, params):
+        raise RuntimeError('cola rota')
+    monkeypatch.setattr(api, '_submit_analysis', falla)
+    r = client.post(f'/api/uploads/{upload_id}/finalize', json={'exercise_type': 'sentadilla'})
+    assert r.status_code == 500
+    assert not os.path.exists(path)